@@ -0,0 +1,285 @@
+import bisect
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .store import SLOT_TRACKED_STATUSES, Store, get_store
+from .util import jittered_interval
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADAPTIVE: Dict[str, Any] = {
+    "enabled": False,
+    # History mined for the hours and weekdays in which slots appeared.
+    "lookback_days": 28,
+    # Windows are local hours of the calendar's timezone.
+    "timezone": "Europe/Berlin",
+    # Longest gap between checks in windows where nothing ever appeared.
+    "max_interval_seconds": 1800,
+    "refresh_hours": 6,
+}
+
+WEEK_HOURS = 7 * 24
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+# Flips added to every window before allocating, so a window that never saw
+# one keeps some budget and an empty history gives the fixed interval.
+PRIOR_FLIPS = 0.5
+
+FLIP_QUERY = (
+    "SELECT checked_at_epoch, status FROM checks "
+    "WHERE COALESCE(target, '') = ? AND checked_at_epoch >= ? AND checked_at_epoch < ? "
+    "UNION ALL "
+    "SELECT first_seen_epoch, status FROM check_spans "
+    "WHERE COALESCE(target, '') = ? AND first_seen_epoch >= ? AND first_seen_epoch < ? "
+    "ORDER BY 1"
+)
+
+
+# (appeared, ended) epochs of every period in which the target was available:
+# appeared is the first available check after an unavailable one, ended the
+# next unavailable check (None while still available). Compacted spans count
+# like the check that opened them; errors and blocks say nothing either way.
+def availability_periods(
+    store: Store,
+    target: Optional[str],
+    since_epoch: float,
+    until_epoch: float,
+) -> Iterator[Tuple[int, Optional[int]]]:
+    bounds = (target or "", int(since_epoch), int(until_epoch))
+    last_status = None
+    appeared = None
+    for epoch, status in store.stream(FLIP_QUERY, bounds + bounds):
+        if status not in SLOT_TRACKED_STATUSES:
+            continue
+        if status == "available" and last_status == "unavailable":
+            appeared = int(epoch)
+        elif status == "unavailable" and appeared is not None:
+            yield appeared, int(epoch)
+            appeared = None
+        last_status = status
+    if appeared is not None:
+        yield appeared, None
+
+
+def flip_counts(periods: Sequence[Tuple[int, Optional[int]]], tz: ZoneInfo) -> List[float]:
+    counts = [0.0] * WEEK_HOURS
+    for appeared, _ in periods:
+        counts[_window(appeared, tz)] += 1
+    return counts
+
+
+def _window(epoch: float, tz: ZoneInfo) -> int:
+    local = datetime.fromtimestamp(epoch, tz)
+    return local.weekday() * 24 + local.hour
+
+
+# Spends the fixed interval's weekly budget where slots appear. With flip rate
+# f per window, checking at rate r leaves an expected detection delay of
+# 1/(2r) per flip, so the total delay sum(f / 2r) at a fixed number of checks
+# is smallest for r proportional to sqrt(f). Rates are clipped to
+# [3600 / max_interval_seconds, max_checks_per_hour] with the remainder spread
+# over the other windows, so no window is ever planned above the hourly limit.
+class AdaptiveSchedule:
+    def __init__(
+        self,
+        counts: Sequence[float],
+        interval_seconds: float,
+        max_checks_per_hour: int,
+        max_interval_seconds: float,
+        tz: ZoneInfo,
+    ):
+        self.tz = tz
+        self.counts = list(counts)
+        self.min_interval = 3600 / max_checks_per_hour if max_checks_per_hour else 0.0
+        base_rate = 3600 / interval_seconds
+        high = max_checks_per_hour or 4 * base_rate
+        low = min(3600 / max(max_interval_seconds, 1), high)
+        smoothed = [
+            0.5 * counts[index] + 0.25 * (counts[index - 1] + counts[(index + 1) % WEEK_HOURS])
+            for index in range(WEEK_HOURS)
+        ]
+        weights = [math.sqrt(value + PRIOR_FLIPS) for value in smoothed]
+        rates = allocate_rates(weights, base_rate * WEEK_HOURS, low, high)
+        self.intervals = [3600 / rate for rate in rates]
+
+    @classmethod
+    def from_history(
+        cls,
+        config: Dict[str, Any],
+        store: Store,
+        until_epoch: float,
+    ) -> "AdaptiveSchedule":
+        settings = adaptive_settings(config)
+        tz = _timezone(settings)
+        since_epoch = until_epoch - float(settings["lookback_days"]) * 86400
+        periods = list(availability_periods(store, config["target"].get("name"), since_epoch, until_epoch))
+        return cls(
+            flip_counts(periods, tz),
+            config["schedule"]["interval_seconds"],
+            config["limits"]["max_checks_per_hour"],
+            settings["max_interval_seconds"],
+            tz,
+        )
+
+    # Seconds until the next check. When the next hour is hotter and starts
+    # first, the check moves to its start (never below the hourly limit).
+    def delay_at(self, epoch: float) -> float:
+        local = datetime.fromtimestamp(epoch, self.tz)
+        index = local.weekday() * 24 + local.hour
+        interval = self.intervals[index]
+        to_boundary = 3600 - (local.minute * 60 + local.second + local.microsecond / 1e6)
+        if to_boundary < interval and self.intervals[(index + 1) % WEEK_HOURS] < interval:
+            interval = to_boundary
+        return max(interval, self.min_interval)
+
+    def hot_windows(self, limit: int = 10) -> List[Dict[str, Any]]:
+        ranked = sorted(range(WEEK_HOURS), key=lambda index: (-self.counts[index], index))
+        return [
+            {
+                "window": f"{WEEKDAYS[index // 24]} {index % 24:02d}:00",
+                "flips": int(self.counts[index]),
+                "interval_seconds": round(self.intervals[index]),
+            }
+            for index in ranked[:limit]
+            if self.counts[index]
+        ]
+
+
+# Rates c * weight clipped to [low, high], with c found by bisection so that
+# they add up to total (every window gets low or high when total is outside
+# what the bounds allow).
+def allocate_rates(weights: Sequence[float], total: float, low: float, high: float) -> List[float]:
+    def clipped(scale: float) -> List[float]:
+        return [min(high, max(low, scale * weight)) for weight in weights]
+
+    if total <= low * len(weights):
+        return [low] * len(weights)
+    if total >= high * len(weights):
+        return [high] * len(weights)
+    lower, upper = 0.0, high / min(weights)
+    for _ in range(100):
+        scale = (lower + upper) / 2
+        if sum(clipped(scale)) < total:
+            lower = scale
+        else:
+            upper = scale
+    return clipped(upper)
+
+
+def adaptive_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {**DEFAULT_ADAPTIVE, **(config["schedule"].get("adaptive") or {})}
+
+
+def _timezone(settings: Dict[str, Any]) -> ZoneInfo:
+    try:
+        return ZoneInfo(settings["timezone"])
+    except ZoneInfoNotFoundError as exc:
+        raise ValueError(f"Unknown schedule.adaptive.timezone: {settings['timezone']}") from exc
+
+
+# Per-target holder used by the run loops: rebuilds the schedule from history
+# every refresh_hours and turns it into the next (jittered) delay.
+class AdaptivePlanner:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.settings = adaptive_settings(config)
+        self.schedule: Optional[AdaptiveSchedule] = None
+        self._built_at = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["AdaptivePlanner"]:
+        if not adaptive_settings(config).get("enabled"):
+            return None
+        return cls(config)
+
+    def refresh_if_due(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        refresh_seconds = float(self.settings["refresh_hours"]) * 3600
+        if self.schedule is not None and now - self._built_at < refresh_seconds:
+            return
+        store = get_store(self.config["storage"])
+        try:
+            self.schedule = AdaptiveSchedule.from_history(self.config, store, now)
+        except Exception as exc:
+            logger.error("Failed to build adaptive schedule: %s", exc)
+            if self.schedule is None:
+                return
+        self._built_at = now
+
+    def next_delay(self, now: Optional[float] = None) -> Optional[int]:
+        if self.schedule is None:
+            return None
+        now = time.time() if now is None else now
+        delay = self.schedule.delay_at(now)
+        jittered = jittered_interval(max(1, round(delay)), self.config["schedule"]["jitter_percent"])
+        return max(jittered, math.ceil(self.schedule.min_interval))
+
+
+# Replays stored history: the schedule is trained on lookback_days before the
+# last test_days, and both it and the fixed interval (without jitter) are
+# simulated over those test days. Latency is the time from the first check
+# that saw a period's slots to the simulated policy's next check; a period that
+# ended before that check counts as missed.
+def evaluate(
+    config: Dict[str, Any],
+    store: Store,
+    now: Optional[float] = None,
+    test_days: float = 7,
+) -> Dict[str, Any]:
+    now = time.time() if now is None else now
+    test_start = now - test_days * 86400
+    schedule = AdaptiveSchedule.from_history(config, store, test_start)
+    periods = list(availability_periods(store, config["target"].get("name"), test_start, now))
+    interval = float(config["schedule"]["interval_seconds"])
+    return {
+        "test_days": test_days,
+        "periods": len(periods),
+        "hot_windows": schedule.hot_windows(5),
+        "fixed": _summarize(_simulate(lambda epoch: interval, test_start, now), periods),
+        "adaptive": _summarize(_simulate(schedule.delay_at, test_start, now), periods),
+    }
+
+
+def _simulate(delay_at: Callable[[float], float], start: float, end: float) -> List[float]:
+    checks = []
+    epoch = start
+    while epoch < end:
+        checks.append(epoch)
+        epoch += delay_at(epoch)
+    return checks
+
+
+def _summarize(checks: List[float], periods: Sequence[Tuple[int, Optional[int]]]) -> Dict[str, Any]:
+    latencies = []
+    missed = 0
+    for appeared, ended in periods:
+        index = bisect.bisect_left(checks, appeared)
+        if index == len(checks) or (ended is not None and checks[index] >= ended):
+            missed += 1
+            continue
+        latencies.append(checks[index] - appeared)
+    latencies.sort()
+    return {
+        "checks": len(checks),
+        "max_checks_per_hour": _max_per_hour(checks),
+        "detected": len(latencies),
+        "missed": missed,
+        "mean_latency_s": round(sum(latencies) / len(latencies), 1) if latencies else None,
+        "median_latency_s": round(latencies[len(latencies) // 2], 1) if latencies else None,
+        "p90_latency_s": round(latencies[int(len(latencies) * 0.9)], 1) if latencies else None,
+    }
+
+
+def _max_per_hour(checks: Sequence[float]) -> int:
+    window: deque = deque()
+    most = 0
+    for epoch in checks:
+        window.append(epoch)
+        while window[0] <= epoch - 3600:
+            window.popleft()
+        most = max(most, len(window))
+    return most
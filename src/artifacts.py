@@ -0,0 +1,167 @@
+import atexit
+import gzip
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .util import ensure_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACTS: Dict[str, Any] = {
+    "full_page_screenshot": False,
+    "max_files": 200,
+    "max_age_days": 14,
+    "max_total_mb": 200,
+    "queue_size": 16,
+}
+
+_writers: Dict[Tuple[str, str], "ArtifactWriter"] = {}
+_writers_lock = threading.Lock()
+
+
+def get_artifact_writer(runtime: Dict[str, Any]) -> "ArtifactWriter":
+    key = (runtime["html_dir"], runtime["screenshots_dir"])
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = ArtifactWriter(
+                runtime["html_dir"],
+                runtime["screenshots_dir"],
+                runtime.get("artifacts") or {},
+            )
+            _writers[key] = writer
+        return writer
+
+
+def close_artifact_writers(timeout: float = 10) -> None:
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close(timeout)
+
+
+atexit.register(close_artifact_writers)
+
+
+# Writes debug artifacts on a background thread. HTML is gzip-compressed and
+# named by content hash, so identical dumps are stored once; every write is
+# followed by a retention pass (count, age and total bytes per directory).
+class ArtifactWriter:
+    def __init__(self, html_dir: str, screenshots_dir: str, settings: Dict[str, Any]):
+        settings = {**DEFAULT_ARTIFACTS, **settings}
+        self.html_dir = html_dir
+        self.screenshots_dir = screenshots_dir
+        self.max_files = int(settings["max_files"])
+        self.max_age_seconds = float(settings["max_age_days"]) * 86400
+        self.max_total_bytes = int(float(settings["max_total_mb"]) * 1024 * 1024)
+        self.written = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Tuple[str, Optional[str], Optional[bytes]]]]" = (
+            queue.Queue(maxsize=int(settings["queue_size"]))
+        )
+        self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, prefix: str, html: Optional[str], screenshot: Optional[bytes]) -> None:
+        try:
+            self._queue.put_nowait((prefix, html, screenshot))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Artifact queue full, dropping %s artifacts", prefix)
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self, timeout: float = 10) -> None:
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as exc:
+                logger.warning("Failed to write artifacts: %s", exc)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, prefix: str, html: Optional[str], screenshot: Optional[bytes]) -> None:
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        if html is not None:
+            data = html.encode("utf-8")
+            self._store(self.html_dir, prefix, timestamp, data, ".html.gz", compress=True)
+        if screenshot is not None:
+            self._store(self.screenshots_dir, prefix, timestamp, screenshot, ".png", compress=False)
+
+    def _store(
+        self,
+        directory: str,
+        prefix: str,
+        timestamp: str,
+        data: bytes,
+        suffix: str,
+        compress: bool,
+    ) -> None:
+        ensure_dir(directory)
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        marker = f"-{digest}{suffix}"
+        existing = [name for name in os.listdir(directory) if name.endswith(marker)]
+        if existing:
+            # Same content already on disk: refresh its mtime so retention keeps it.
+            os.utime(os.path.join(directory, existing[0]))
+            self.deduplicated += 1
+            return
+
+        path = os.path.join(directory, f"{prefix}-{timestamp}{marker}")
+        tmp_path = f"{path}.tmp"
+        payload = gzip.compress(data, compresslevel=6) if compress else data
+        with open(tmp_path, "wb") as handle:
+            handle.write(payload)
+        os.replace(tmp_path, path)
+        self.written += 1
+        self._enforce_retention(directory)
+
+    def _enforce_retention(self, directory: str) -> None:
+        now = time.time()
+        files = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        count = len(files)
+        for mtime, size, path in files:
+            expired = self.max_age_seconds and now - mtime > self.max_age_seconds
+            if not expired and count <= self.max_files and total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            count -= 1
+            total -= size
+
+
+def read_html_dump(path: str) -> str:
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            return handle.read()
+    with open(path, "r", encoding="utf-8") as handle:
+        return handle.read()
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_CHECKS_PER_BROWSER = 50
+
+
+class _SessionBase:
+    def __init__(self, runtime: Dict[str, Any]):
+        browser_cfg = runtime.get("browser") or {}
+        self.headless = runtime.get("headless", True)
+        self.user_agent = runtime.get("user_agent")
+        self.max_checks = int(
+            browser_cfg.get("max_checks_per_browser") or DEFAULT_MAX_CHECKS_PER_BROWSER
+        )
+        self.max_memory_mb = browser_cfg.get("max_memory_mb")
+        self.checks_on_browser = 0
+        self.launch_count = 0
+        self._playwright = None
+        self._browser = None
+
+    def _recycle_reason(self) -> Optional[str]:
+        if self._browser is None:
+            return None
+        if not self._browser.is_connected():
+            return "disconnected"
+        if self.checks_on_browser >= self.max_checks:
+            return "max_checks"
+        if self.max_memory_mb:
+            rss_mb = descendant_rss_mb()
+            if rss_mb is not None and rss_mb > float(self.max_memory_mb):
+                return "max_memory"
+        return None
+
+
+# Long-lived Chromium shared across checks. Every check gets a fresh context;
+# the browser is relaunched after max_checks_per_browser checks, when the
+# driver + browser processes exceed max_memory_mb, or after a crash.
+class BrowserSession(_SessionBase):
+    def new_context(self) -> Tuple[Any, Dict[str, Any]]:
+        info: Dict[str, Any] = {"launch_ms": 0, "reused": True}
+        recycle_reason = self._recycle_reason()
+        if recycle_reason:
+            logger.info("Recycling browser: %s", recycle_reason)
+            info["recycled"] = recycle_reason
+            self._close_browser()
+        if self._browser is None:
+            info["launch_ms"] = self._launch()
+            info["reused"] = False
+        info["checks_on_browser"] = self.checks_on_browser + 1
+        context = self._browser.new_context(user_agent=self.user_agent)
+        return context, info
+
+    def release(self, context) -> None:
+        self.checks_on_browser += 1
+        if context is not None:
+            try:
+                context.close()
+            except Exception:
+                pass
+        if self._browser is not None and not self._browser.is_connected():
+            logger.warning("Browser disconnected, it will be relaunched on the next check")
+            self._close_browser()
+
+    def close(self) -> None:
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    def _launch(self) -> int:
+        started = time.perf_counter()
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=self.headless)
+        self.checks_on_browser = 0
+        self.launch_count += 1
+        return int((time.perf_counter() - started) * 1000)
+
+    def _close_browser(self) -> None:
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+
+
+def descendant_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    # Sums VmRSS of every descendant process; None where /proc is unavailable.
+    root = pid or os.getpid()
+    try:
+        entries = [name for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return None
+
+    children: Dict[int, list] = {}
+    rss_kb: Dict[int, int] = {}
+    for name in entries:
+        try:
+            with open(f"/proc/{name}/status", "r", encoding="utf-8") as handle:
+                ppid = None
+                rss = 0
+                for line in handle:
+                    if line.startswith("PPid:"):
+                        ppid = int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss = int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid is None:
+            continue
+        children.setdefault(ppid, []).append(int(name))
+        rss_kb[int(name)] = rss
+
+    total = 0
+    stack = list(children.get(root, []))
+    while stack:
+        child = stack.pop()
+        total += rss_kb.get(child, 0)
+        stack.extend(children.get(child, []))
+    return total / 1024
+
+
+# asyncio counterpart of BrowserSession: contexts for concurrent checks share
+# one browser. A pending recycle waits until in-flight contexts are released.
+class AsyncBrowserSession(_SessionBase):
+    def __init__(self, runtime: Dict[str, Any]):
+        super().__init__(runtime)
+        self.active_contexts = 0
+        self._condition = asyncio.Condition()
+
+    async def new_context(self) -> Tuple[Any, Dict[str, Any]]:
+        info: Dict[str, Any] = {"launch_ms": 0, "reused": True}
+        async with self._condition:
+            recycle_reason = self._recycle_reason()
+            if recycle_reason:
+                await self._condition.wait_for(lambda: self.active_contexts == 0)
+                # Another waiter may have recycled the browser in the meantime.
+                recycle_reason = self._recycle_reason()
+                if recycle_reason:
+                    logger.info("Recycling browser: %s", recycle_reason)
+                    info["recycled"] = recycle_reason
+                    await self._close_browser()
+            if self._browser is None:
+                info["launch_ms"] = await self._launch()
+                info["reused"] = False
+            self.active_contexts += 1
+            info["checks_on_browser"] = self.checks_on_browser + self.active_contexts
+            browser = self._browser
+        try:
+            context = await browser.new_context(user_agent=self.user_agent)
+        except Exception:
+            await self.release(None)
+            raise
+        return context, info
+
+    async def release(self, context) -> None:
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        async with self._condition:
+            self.active_contexts -= 1
+            self.checks_on_browser += 1
+            if self._browser is not None and not self._browser.is_connected():
+                logger.warning("Browser disconnected, it will be relaunched on the next check")
+                if self.active_contexts == 0:
+                    await self._close_browser()
+            self._condition.notify_all()
+
+    async def close(self) -> None:
+        await self._close_browser()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    async def _launch(self) -> int:
+        started = time.perf_counter()
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        self.checks_on_browser = 0
+        self.launch_count += 1
+        return int((time.perf_counter() - started) * 1000)
+
+    async def _close_browser(self) -> None:
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
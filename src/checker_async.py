@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from .browser import AsyncBrowserSession
+from .checker_endpoint import (
+    EndpointCache,
+    EndpointRecorder,
+    EndpointSessionExpired,
+    finish_discovery,
+    max_session_age,
+    poll_endpoint,
+)
+from .checker_http import HttpPrecheck, check_with_http
+from .checker_playwright import PageCheck, classify_page, uses_dom_extractor
+from .crawl import LINKS_JS, Crawl, crawl_settings
+from .readiness import READY_JS, idle_timeout, readiness_wait
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+async def run_once_async(
+    config: Dict[str, Any],
+    session: AsyncBrowserSession,
+    precheck: Optional[HttpPrecheck] = None,
+    endpoints: Optional[EndpointCache] = None,
+) -> Dict[str, Any]:
+    mode = config["target"].get("mode", "playwright")
+    if mode == "endpoint":
+        try:
+            return await check_with_endpoint_async(config, session, endpoints or EndpointCache())
+        except Exception as exc:
+            logger.warning("Endpoint checker failed, falling back to Playwright: %s", exc)
+    if mode == "http" and precheck is not None:
+        try:
+            with span("precheck"):
+                result = await asyncio.to_thread(check_with_http, config, precheck)
+            if result is not None:
+                return result
+        except Exception as exc:
+            logger.warning("HTTP pre-check failed, falling back to Playwright: %s", exc)
+        result = await check_with_playwright_async(config, session)
+        precheck.remember(config, result)
+        return result
+    return await check_with_playwright_async(config, session)
+
+
+# Polls a known endpoint off the event loop; without one (or once its session
+# expired) a browser check records the XHR traffic to discover it.
+async def check_with_endpoint_async(
+    config: Dict[str, Any],
+    session: AsyncBrowserSession,
+    endpoints: EndpointCache,
+) -> Dict[str, Any]:
+    url = config["target"]["url"]
+    profile = endpoints.get(url, max_session_age(config))
+    if profile:
+        try:
+            return await asyncio.to_thread(poll_endpoint, config, profile, endpoints.pool)
+        except EndpointSessionExpired as exc:
+            logger.info("Endpoint session expired (%s), rediscovering", exc)
+            endpoints.forget(url)
+
+    recorder = EndpointRecorder()
+    result = await check_with_playwright_async(config, session, recorder=recorder)
+    return finish_discovery(config, endpoints, recorder, result)
+
+
+async def check_with_playwright_async(
+    config: Dict[str, Any],
+    session: AsyncBrowserSession,
+    recorder: Optional[EndpointRecorder] = None,
+) -> Dict[str, Any]:
+    check = PageCheck(config)
+    context = None
+    page = None
+    acquired = False
+
+    try:
+        check.begin()
+        context, browser_info = await session.new_context()
+        acquired = True
+        check.browser_ready(browser_info)
+
+        async def route_handler(route):
+            if check.block_reason(route.request):
+                return await route.abort()
+            return await route.continue_()
+
+        await context.route("**/*", route_handler)
+        context.on("response", check.on_response)
+        if recorder is not None:
+            recorder.attach(context)
+        page = await context.new_page()
+
+        check.navigating()
+        response = await page.goto(
+            check.url,
+            wait_until="domcontentloaded",
+            timeout=config["limits"]["navigation_timeout_ms"],
+        )
+        check.navigated(response)
+        await _wait_until_ready(page, config, check.evidence)
+        check.ready()
+        body_text = await page.inner_text("body")
+        html = await page.content() if uses_dom_extractor(config) else None
+        status, slots = check.extracted(body_text, html)
+        if status == "blocked":
+            await _save_debug_assets(page, check, "blocked", html)
+        else:
+            crawl_cfg = crawl_settings(config)
+            if crawl_cfg:
+                crawl = Crawl(check.url, crawl_cfg, page.url)
+                crawl.add_links(await page.eval_on_selector_all(crawl_cfg["link_selector"], LINKS_JS))
+                await _crawl_calendar(context, config, crawl)
+                status, slots = crawl.finish(status, slots, check.evidence)
+        if status != "blocked" and recorder is not None:
+            try:
+                await recorder.finish_async(context)
+            except Exception as exc:
+                check.evidence["endpoint_discovery_error"] = str(exc)
+        return check.result(status, slots)
+    except Exception as exc:
+        if page is not None:
+            await _save_debug_assets(page, check, "error")
+        return check.failed(exc)
+    finally:
+        if acquired:
+            await session.release(context)
+        check.finish()
+
+
+# Tabs of a wave load concurrently; their links join the frontier in wave
+# order, so the pages visited do not depend on which tab finished first.
+async def _crawl_calendar(context, config: Dict[str, Any], crawl: Crawl) -> None:
+    timeout = config["limits"]["navigation_timeout_ms"]
+
+    async def fetch(link: str) -> List[str]:
+        started = time.perf_counter()
+        tab = await context.new_page()
+        page_evidence: Dict[str, Any] = {}
+        try:
+            await tab.goto(link, wait_until="domcontentloaded", timeout=timeout)
+            await _wait_until_ready(tab, config, page_evidence)
+            body_text = await tab.inner_text("body")
+            html = await tab.content() if uses_dom_extractor(config) else None
+            hrefs = await tab.eval_on_selector_all(crawl.settings["link_selector"], LINKS_JS)
+            crawl.page_done(link, started, *classify_page(config, None, body_text, page_evidence, html))
+            return hrefs
+        except Exception as exc:
+            crawl.page_failed(link, started, exc)
+            return []
+        finally:
+            await tab.close()
+
+    batch = crawl.next_batch()
+    while batch:
+        for hrefs in await asyncio.gather(*(fetch(link) for link in batch)):
+            crawl.add_links(hrefs)
+        batch = crawl.next_batch()
+
+
+async def _wait_until_ready(page, config: Dict[str, Any], evidence: Dict[str, Any]) -> None:
+    wait = readiness_wait(config)
+    if wait is not None:
+        try:
+            handle = await page.wait_for_function(READY_JS, **wait)
+            evidence["readiness"] = {"reason": await handle.json_value()}
+            return
+        except PlaywrightTimeoutError:
+            evidence["readiness"] = {"reason": "timeout"}
+    try:
+        await page.wait_for_load_state("networkidle", timeout=idle_timeout(config, wait is not None))
+    except PlaywrightTimeoutError:
+        evidence["network_idle_timeout"] = True
+
+
+async def _save_debug_assets(page, check: PageCheck, prefix: str, html: Optional[str] = None) -> None:
+    screenshot = await _capture(page.screenshot(full_page=check.full_page_screenshot))
+    if html is None:
+        html = await _capture(page.content())
+    check.save_debug_assets(prefix, html, screenshot)
+
+
+async def _capture(awaitable) -> Any:
+    try:
+        return await awaitable
+    except Exception:
+        return None
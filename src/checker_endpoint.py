@@ -1,7 +1,337 @@
-from typing import Any, Dict
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from .browser import BrowserSession
+from .checker_http import HttpPool
+from .checker_playwright import check_with_playwright, record_phase
+from .parser import DATE_RE, TIME_RE, parse_availability
+from .util import iso_now, normalize_slots
 
-def check_with_endpoint(config: Dict[str, Any]) -> Dict[str, Any]:
-    raise RuntimeError(
-        "Endpoint checker not configured. Use target.mode=playwright or add endpoint settings."
+logger = logging.getLogger(__name__)
+
+ISO_DATE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2}))?")
+AVAILABILITY_KEYS = ("termin", "slot", "avail", "frei", "free", "date", "datum", "time", "zeit")
+# Words of a JSON key that mark it as metadata, never a slot ("updatedAt",
+# "timestamp"), even though they also match an availability key.
+METADATA_WORDS = {"updated", "created", "modified", "timestamp", "generated", "expires", "server"}
+# A false boolean under one of these keys rules the object (and everything
+# below it) out as a slot.
+SLOT_FLAG_KEYS = {"free", "frei", "available", "verfuegbar", "bookable", "buchbar"}
+SKIPPED_HEADERS = {
+    "cookie",
+    "content-length",
+    "host",
+    "connection",
+    "accept-encoding",
+    "transfer-encoding",
+}
+EXPIRED_STATUSES = {401, 403, 419, 440}
+DEFAULT_MAX_SESSION_AGE_SECONDS = 1800
+
+
+class EndpointSessionExpired(RuntimeError):
+    pass
+
+
+# Collects JSON responses of XHR/fetch requests during one browser check and
+# turns the most availability-like one into a replayable profile.
+class EndpointRecorder:
+    def __init__(self):
+        self.responses: List[Any] = []
+        self.profile: Optional[Dict[str, Any]] = None
+
+    def attach(self, context) -> None:
+        context.on("response", self._on_response)
+
+    def _on_response(self, response) -> None:
+        request = response.request
+        if request.resource_type not in {"xhr", "fetch"}:
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        self.responses.append(response)
+
+    def finish(self, context) -> None:
+        best: Optional[Tuple[int, Any, Any]] = None
+        for response in self.responses:
+            try:
+                payload = json.loads(response.body())
+            except Exception:
+                continue
+            score = score_payload(payload)
+            if score and (best is None or score > best[0]):
+                best = (score, response, payload)
+        if best is None:
+            return
+        _, response, _ = best
+        request = response.request
+        self.profile = build_profile(
+            request.url,
+            request.method,
+            request.post_data,
+            request.all_headers(),
+            context.cookies(request.url),
+        )
+
+    async def finish_async(self, context) -> None:
+        best: Optional[Tuple[int, Any, Any]] = None
+        for response in self.responses:
+            try:
+                payload = json.loads(await response.body())
+            except Exception:
+                continue
+            score = score_payload(payload)
+            if score and (best is None or score > best[0]):
+                best = (score, response, payload)
+        if best is None:
+            return
+        _, response, _ = best
+        request = response.request
+        self.profile = build_profile(
+            request.url,
+            request.method,
+            request.post_data,
+            await request.all_headers(),
+            await context.cookies(request.url),
+        )
+
+
+def build_profile(
+    url: str,
+    method: str,
+    post_data: Optional[str],
+    headers: Dict[str, str],
+    cookies: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    kept_headers = {
+        name: value
+        for name, value in headers.items()
+        if name.lower() not in SKIPPED_HEADERS and not name.startswith(":")
+    }
+    cookie_header = "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
+    if cookie_header:
+        kept_headers["Cookie"] = cookie_header
+    return {
+        "url": url,
+        "method": method,
+        "post_data": post_data,
+        "headers": kept_headers,
+        "discovered_at": time.time(),
+    }
+
+
+# Discovered endpoint profiles per target URL, polled through a shared pool.
+class EndpointCache:
+    def __init__(self, pool: Optional[HttpPool] = None):
+        self.pool = pool or HttpPool()
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, max_age_seconds: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            profile = self._profiles.get(url)
+        if profile and time.time() - profile["discovered_at"] > max_age_seconds:
+            self.forget(url)
+            return None
+        return profile
+
+    def put(self, url: str, profile: Dict[str, Any]) -> None:
+        with self._lock:
+            self._profiles[url] = profile
+
+    def forget(self, url: str) -> None:
+        with self._lock:
+            self._profiles.pop(url, None)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def check_with_endpoint(
+    config: Dict[str, Any],
+    endpoints: Optional[EndpointCache] = None,
+    session: Optional[BrowserSession] = None,
+) -> Dict[str, Any]:
+    endpoints = endpoints or EndpointCache()
+    url = config["target"]["url"]
+    max_age = max_session_age(config)
+
+    profile = endpoints.get(url, max_age)
+    if profile:
+        try:
+            return poll_endpoint(config, profile, endpoints.pool)
+        except EndpointSessionExpired as exc:
+            logger.info("Endpoint session expired (%s), rediscovering", exc)
+            endpoints.forget(url)
+
+    recorder = EndpointRecorder()
+    result = check_with_playwright(config, session, recorder=recorder)
+    return finish_discovery(config, endpoints, recorder, result)
+
+
+def finish_discovery(
+    config: Dict[str, Any],
+    endpoints: EndpointCache,
+    recorder: EndpointRecorder,
+    result: Dict[str, Any],
+) -> Dict[str, Any]:
+    url = config["target"]["url"]
+    if recorder.profile:
+        endpoints.put(url, recorder.profile)
+        result.setdefault("evidence", {})["endpoint"] = {
+            "source": "discovered",
+            "url": recorder.profile["url"],
+        }
+    elif result.get("status") != "error":
+        logger.warning("No availability endpoint found among %s JSON responses", len(recorder.responses))
+    return result
+
+
+def poll_endpoint(
+    config: Dict[str, Any],
+    profile: Dict[str, Any],
+    pool: HttpPool,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    body = profile["post_data"].encode("utf-8") if profile.get("post_data") else None
+    status_code, headers, payload = pool.request(
+        profile["method"],
+        profile["url"],
+        headers=profile["headers"],
+        body=body,
+        timeout=config["limits"]["navigation_timeout_ms"] / 1000,
+    )
+    if status_code in EXPIRED_STATUSES or 300 <= status_code < 400:
+        raise EndpointSessionExpired(f"HTTP {status_code}")
+
+    evidence: Dict[str, Any] = {
+        "url": config["target"]["url"],
+        "response_status": status_code,
+        "endpoint": {"source": "polled", "url": profile["url"]},
+        "timings": {"check_ms": 0},
+    }
+    record_phase(evidence["timings"], "request", started, status=status_code)
+    if config["target"].get("name"):
+        evidence["target"] = config["target"]["name"]
+
+    if status_code == 429:
+        evidence["blocked_reason"] = "status"
+        evidence["timings"]["check_ms"] = int((time.perf_counter() - started) * 1000)
+        return {"status": "blocked", "slots": [], "checked_at": iso_now(), "evidence": evidence}
+    if status_code != 200 or "json" not in headers.get("content-type", ""):
+        raise EndpointSessionExpired(f"unexpected response {status_code} {headers.get('content-type')}")
+
+    parse_started = time.perf_counter()
+    data = json.loads(payload)
+    slots, text = slots_from_json(data)
+    status, _, parse_evidence = parse_availability(
+        text,
+        config["target"]["url"],
+        config["matchers"]["unavailable_text_substrings"],
     )
+    evidence.update(parse_evidence)
+    # Available needs both: slots from the availability entries and text
+    # matchers that agree. Dates and times elsewhere in the payload (metadata,
+    # entries flagged as not free) alone do not make the page available.
+    if status != "available" or not slots:
+        status, slots = "unavailable", []
+    record_phase(evidence["timings"], "parse", parse_started, status=status, slots=len(slots))
+    evidence["timings"]["check_ms"] = int((time.perf_counter() - started) * 1000)
+    return {
+        "status": status,
+        "slots": normalize_slots(slots),
+        "checked_at": iso_now(),
+        "evidence": evidence,
+    }
+
+
+# Pairs dates with times inside each JSON object (including ISO datetimes)
+# and flattens every string for the text matchers. Only values whose key, or
+# an enclosing key, is an availability key take part in slots, and objects
+# flagged free/available/bookable = false are skipped with their children.
+def slots_from_json(data: Any) -> Tuple[List[Dict[str, str]], str]:
+    slots: List[Dict[str, str]] = []
+    strings: List[str] = []
+    stack: List[Tuple[Any, bool]] = [(data, False)]
+    while stack:
+        node, scoped = stack.pop()
+        if isinstance(node, dict):
+            closed = any(
+                value is False and _key_words(str(key)) & SLOT_FLAG_KEYS for key, value in node.items()
+            )
+            date = None
+            times = []
+            for key, value in node.items():
+                strings.append(str(key))
+                key_scoped = not closed and (scoped or _is_availability_key(str(key)))
+                if isinstance(value, (dict, list)):
+                    if not closed:
+                        stack.append((value, key_scoped))
+                    continue
+                text = "" if value is None else str(value)
+                strings.append(text)
+                if not key_scoped:
+                    continue
+                parsed_date, parsed_time = _date_time(text)
+                date = date or parsed_date
+                if parsed_time:
+                    times.append(parsed_time)
+            if date:
+                slots.extend({"date": date, "time": value} for value in times)
+        elif isinstance(node, list):
+            stack.extend((item, scoped) for item in node)
+        elif node is not None:
+            strings.append(str(node))
+    return slots, "\n".join(strings)
+
+
+def _key_words(key: str) -> Set[str]:
+    return set(re.findall(r"[a-z]+", re.sub(r"([a-z])([A-Z])", r"\1 \2", key).lower()))
+
+
+# Matches whole words of the key: "startDate", "freie_termine" and "uhrzeit"
+# are availability keys, "updated" is not.
+def _is_availability_key(key: str) -> bool:
+    words = _key_words(key)
+    if words & METADATA_WORDS:
+        return False
+    return any(word.startswith(name) or word.endswith(name) for word in words for name in AVAILABILITY_KEYS)
+
+
+def score_payload(payload: Any) -> int:
+    slots, text = slots_from_json(payload)
+    lowered = text.lower()
+    key_hits = sum(lowered.count(key) for key in AVAILABILITY_KEYS)
+    matches = len(TIME_RE.findall(text)) + len(DATE_RE.findall(text)) + len(slots)
+    return matches * 2 + key_hits
+
+
+def _date_time(text: str) -> Tuple[Optional[str], Optional[str]]:
+    iso = ISO_DATE_RE.match(text)
+    if iso:
+        year, month, day, hour, minute = iso.groups()
+        time_value = f"{hour}:{minute}" if hour else None
+        return f"{year}-{month}-{day}", time_value
+    date = None
+    date_match = DATE_RE.search(text)
+    if date_match:
+        day, month, year = date_match.groups()
+        try:
+            date = datetime(int(year), int(month), int(day)).strftime("%Y-%m-%d")
+        except ValueError:
+            date = None
+        # "14.10.2024 09:30" carries both parts in one value.
+        time_match = TIME_RE.search(text, date_match.end())
+    else:
+        time_match = TIME_RE.fullmatch(text.strip())
+    return date, (time_match.group(0).zfill(5) if time_match else None)
+
+
+def max_session_age(config: Dict[str, Any]) -> float:
+    endpoint_cfg = config["target"].get("endpoint") or {}
+    return float(endpoint_cfg.get("max_session_age_seconds") or DEFAULT_MAX_SESSION_AGE_SECONDS)
@@ -0,0 +1,252 @@
+import copy
+import gzip
+import hashlib
+import http.client
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .parser import detect_blocked, html_to_text
+from .util import iso_now
+
+RETRYABLE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+DECIDED_STATUSES = {"available", "unavailable"}
+
+# A cached browser result is reused for at most this long, even while the
+# page answers 304 or keeps its fingerprint; then the browser renders again.
+DEFAULT_MAX_REUSE_SECONDS = 900
+
+
+# Keep-alive HTTP(S) connections keyed by (scheme, host, port). Idle
+# connections are handed out to one caller at a time, so the pool can be
+# shared by threads (the async scheduler runs HTTP calls via to_thread).
+class HttpPool:
+    def __init__(self, max_idle_per_host: int = 4):
+        self.max_idle_per_host = max_idle_per_host
+        self.connections_opened = 0
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+        timeout: float = 30,
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        request_headers = {"Accept-Encoding": "gzip, deflate"}
+        request_headers.update(headers or {})
+
+        # A pooled connection may have been closed by the server while idle;
+        # retry exactly once on a fresh connection in that case.
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=request_headers)
+                response = conn.getresponse()
+                payload = response.read()
+            except RETRYABLE_ERRORS:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            response_headers = {name.lower(): value for name, value in response.getheaders()}
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return response.status, response_headers, _decode_body(payload, response_headers)
+        raise RuntimeError("unreachable")
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def _acquire(self, key: Tuple[str, str, int], timeout: float):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.connections_opened += 1
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _release(self, key: Tuple[str, str, int], conn) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+
+# Per-URL validators (ETag / Last-Modified), the fingerprint of the last body
+# and the browser result that was produced for that body.
+class HttpPrecheck:
+    def __init__(self, pool: Optional[HttpPool] = None):
+        self.pool = pool or HttpPool()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def entry(self, url: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._entries.get(url) or {})
+
+    def update(self, url: str, **values: Any) -> None:
+        with self._lock:
+            self._entries.setdefault(url, {}).update(values)
+
+    def remember(self, config: Dict[str, Any], result: Dict[str, Any]) -> None:
+        url = config["target"]["url"]
+        if result.get("status") not in DECIDED_STATUSES:
+            self.update(url, result=None)
+            return
+        self.update(url, result=copy.deepcopy(result), rendered_at=time.monotonic())
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+# Cheap first stage for mode "http". Returns a finished result when the page
+# is unchanged since the last browser render (304 or identical fingerprint)
+# and that render is younger than max_reuse_seconds, or when the server
+# answers 403/429; None when the browser has to decide.
+def check_with_http(
+    config: Dict[str, Any],
+    precheck: HttpPrecheck,
+) -> Optional[Dict[str, Any]]:
+    url = config["target"]["url"]
+    precheck_cfg = config["target"].get("http_precheck") or {}
+    timeout = config["limits"]["navigation_timeout_ms"] / 1000
+
+    entry = precheck.entry(url)
+    headers = {"User-Agent": config["runtime"].get("user_agent") or "terminland-watcher"}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    status_code, response_headers, body = precheck.pool.request(
+        "GET", url, headers=headers, timeout=timeout
+    )
+    info: Dict[str, Any] = {"http_status": status_code, "bytes": len(body)}
+
+    if status_code in {403, 429}:
+        return _blocked_result(config, info, "status")
+
+    if status_code == 304:
+        info["decision"] = "not_modified"
+        return _reuse(entry, info, max_reuse_age(config))
+
+    if status_code != 200:
+        return None
+
+    text = body.decode(_charset(response_headers), errors="replace")
+    # Raw HTML cannot tell whether block text is visible (a hidden "Access
+    # denied" is common), so only the browser's inner_text may decide blocked.
+    if detect_blocked(html_to_text(text)):
+        precheck.update(url, result=None)
+        return None
+
+    fingerprint = content_fingerprint(text, precheck_cfg.get("ignore_patterns") or [])
+    unchanged = fingerprint == entry.get("fingerprint")
+    precheck.update(
+        url,
+        etag=response_headers.get("etag"),
+        last_modified=response_headers.get("last-modified"),
+        fingerprint=fingerprint,
+    )
+    if unchanged:
+        info["decision"] = "fingerprint_match"
+        return _reuse(entry, info, max_reuse_age(config))
+
+    # Changed (or first seen): the cached result no longer applies.
+    precheck.update(url, result=None)
+    return None
+
+
+def content_fingerprint(html: str, ignore_patterns: List[str]) -> str:
+    for pattern in ignore_patterns:
+        html = re.sub(pattern, "", html)
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def max_reuse_age(config: Dict[str, Any]) -> float:
+    precheck_cfg = config["target"].get("http_precheck") or {}
+    return float(precheck_cfg.get("max_reuse_seconds") or DEFAULT_MAX_REUSE_SECONDS)
+
+
+def _reuse(entry: Dict[str, Any], info: Dict[str, Any], max_age: float) -> Optional[Dict[str, Any]]:
+    cached = entry.get("result")
+    if not cached or time.monotonic() - entry.get("rendered_at", 0) > max_age:
+        return None
+    result = copy.deepcopy(cached)
+    result["checked_at"] = iso_now()
+    info["result_age_seconds"] = int(time.monotonic() - entry["rendered_at"])
+    result.setdefault("evidence", {})["precheck"] = info
+    # Timings belong to the render that produced the cached result.
+    result["evidence"].pop("timings", None)
+    result["evidence"].pop("browser", None)
+    return result
+
+
+def _blocked_result(config: Dict[str, Any], info: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    info["decision"] = "blocked"
+    evidence: Dict[str, Any] = {
+        "url": config["target"]["url"],
+        "response_status": info["http_status"],
+        "blocked_reason": reason,
+        "precheck": info,
+    }
+    if config["target"].get("name"):
+        evidence["target"] = config["target"]["name"]
+    return {
+        "status": "blocked",
+        "slots": [],
+        "checked_at": iso_now(),
+        "evidence": evidence,
+    }
+
+
+def _charset(headers: Dict[str, str]) -> str:
+    match = re.search(r"charset=([\w-]+)", headers.get("content-type", ""))
+    return match.group(1) if match else "utf-8"
+
+
+def _decode_body(payload: bytes, headers: Dict[str, str]) -> bytes:
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding == "gzip":
+        return gzip.decompress(payload)
+    if encoding == "deflate":
+        return zlib.decompress(payload)
+    return payload
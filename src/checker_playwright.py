@@ -1,114 +1,287 @@
-import os
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
-from playwright.sync_api import sync_playwright
 
-from .parser import detect_blocked, parse_availability
-from .util import ensure_dir, iso_now
+from .artifacts import get_artifact_writer
+from .browser import BrowserSession
+from .crawl import LINKS_JS, Crawl, crawl_settings
+from .parser import parse_availability, scan_text
+from .readiness import READY_JS, idle_timeout, readiness_wait
+from .resource_policy import RequestStats, ResourcePolicy
+from .tracing import record_span
+from .util import elapsed_ms, iso_now
 
 
-def check_with_playwright(config: Dict[str, Any]) -> Dict[str, Any]:
-    url = config["target"]["url"]
-    timeouts = config["limits"]
-    runtime = config["runtime"]
-    screenshots_dir = runtime["screenshots_dir"]
-    html_dir = runtime["html_dir"]
+def check_with_playwright(
+    config: Dict[str, Any],
+    session: Optional[BrowserSession] = None,
+    recorder=None,
+) -> Dict[str, Any]:
+    check = PageCheck(config)
+    owns_session = session is None
+    if session is None:
+        session = BrowserSession(config["runtime"])
 
-    ensure_dir(screenshots_dir)
-    ensure_dir(html_dir)
-
-    checked_at = iso_now()
-    evidence: Dict[str, Any] = {"url": url}
-
-    browser = None
+    context = None
     page = None
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=runtime.get("headless", True))
-            context = browser.new_context(user_agent=runtime.get("user_agent"))
-
-            def route_handler(route):
-                if route.request.resource_type in {"image", "font"}:
-                    return route.abort()
-                return route.continue_()
-
-            context.route("**/*", route_handler)
-            page = context.new_page()
-
-            response = page.goto(
-                url,
-                wait_until="domcontentloaded",
-                timeout=timeouts["navigation_timeout_ms"],
-            )
-            status_code = response.status if response else None
-            evidence["response_status"] = status_code
+        check.begin()
+        context, browser_info = session.new_context()
+        check.browser_ready(browser_info)
+
+        def route_handler(route):
+            if check.block_reason(route.request):
+                return route.abort()
+            return route.continue_()
 
+        context.route("**/*", route_handler)
+        context.on("response", check.on_response)
+        if recorder is not None:
+            recorder.attach(context)
+        page = context.new_page()
+
+        check.navigating()
+        response = page.goto(
+            check.url,
+            wait_until="domcontentloaded",
+            timeout=config["limits"]["navigation_timeout_ms"],
+        )
+        check.navigated(response)
+        _wait_until_ready(page, config, check.evidence)
+        check.ready()
+        body_text = page.inner_text("body")
+        html = page.content() if uses_dom_extractor(config) else None
+        status, slots = check.extracted(body_text, html)
+        if status == "blocked":
+            _save_debug_assets(page, check, "blocked", html)
+        else:
+            crawl_cfg = crawl_settings(config)
+            if crawl_cfg:
+                crawl = Crawl(check.url, crawl_cfg, page.url)
+                crawl.add_links(page.eval_on_selector_all(crawl_cfg["link_selector"], LINKS_JS))
+                _crawl_calendar(context, config, crawl)
+                status, slots = crawl.finish(status, slots, check.evidence)
+        if status != "blocked" and recorder is not None:
             try:
-                page.wait_for_load_state(
-                    "networkidle", timeout=timeouts["selector_timeout_ms"]
-                )
-            except PlaywrightTimeoutError:
-                evidence["network_idle_timeout"] = True
-
-            body_text = page.inner_text("body")
-            blocked_text = detect_blocked(body_text)
-            if status_code in {403, 429} or blocked_text:
-                evidence["blocked_reason"] = "status" if status_code in {403, 429} else "text"
-                _save_debug_assets(page, html_dir, screenshots_dir, "blocked")
-                return {
-                    "status": "blocked",
-                    "slots": [],
-                    "checked_at": checked_at,
-                    "evidence": evidence,
-                }
-
-            status, slots, parse_evidence = parse_availability(
-                body_text,
-                url,
-                config["matchers"]["unavailable_text_substrings"],
-            )
-            evidence.update(parse_evidence)
-
-            return {
-                "status": status,
-                "slots": slots,
-                "checked_at": checked_at,
-                "evidence": evidence,
-            }
+                recorder.finish(context)
+            except Exception as exc:
+                check.evidence["endpoint_discovery_error"] = str(exc)
+        return check.result(status, slots)
     except Exception as exc:
-        error_message = str(exc)
-        evidence["error"] = error_message
         if page is not None:
-            _save_debug_assets(page, html_dir, screenshots_dir, "error")
-        return {
-            "status": "error",
-            "slots": [],
-            "checked_at": checked_at,
-            "evidence": evidence,
-            "error": error_message,
-        }
+            _save_debug_assets(page, check, "error")
+        return check.failed(exc)
     finally:
-        try:
-            if browser is not None:
-                browser.close()
-        except Exception:
-            pass
+        session.release(context)
+        if owns_session:
+            session.close()
+        check.finish()
+
 
+# Follows calendar pagination (next week/month links) up to horizon_pages.
+# Each wave opens up to `parallel` tabs in the same context and starts all
+# navigations before waiting on any of them, so the loads overlap.
+def _crawl_calendar(context, config: Dict[str, Any], crawl: Crawl) -> None:
+    timeout = config["limits"]["navigation_timeout_ms"]
+    batch = crawl.next_batch()
+    while batch:
+        opened = []
+        for link in batch:
+            started = time.perf_counter()
+            tab = context.new_page()
+            try:
+                tab.goto(link, wait_until="commit", timeout=timeout)
+                opened.append((link, tab, started))
+            except Exception as exc:
+                crawl.page_failed(link, started, exc)
+                tab.close()
+
+        for link, tab, started in opened:
+            page_evidence: Dict[str, Any] = {}
+            try:
+                tab.wait_for_load_state("domcontentloaded", timeout=timeout)
+                _wait_until_ready(tab, config, page_evidence)
+                body_text = tab.inner_text("body")
+                html = tab.content() if uses_dom_extractor(config) else None
+                hrefs = tab.eval_on_selector_all(crawl.settings["link_selector"], LINKS_JS)
+                crawl.page_done(link, started, *classify_page(config, None, body_text, page_evidence, html))
+                crawl.add_links(hrefs)
+            except Exception as exc:
+                crawl.page_failed(link, started, exc)
+            finally:
+                tab.close()
+        batch = crawl.next_batch()
 
-def _save_debug_assets(page, html_dir: str, screenshots_dir: str, prefix: str) -> None:
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    screenshot_path = os.path.join(screenshots_dir, f"{prefix}-{timestamp}.png")
-    html_path = os.path.join(html_dir, f"{prefix}-{timestamp}.html")
+
+# Waits for the first readiness predicate (selector, unavailable text, a time
+# slot or block text) and only falls back to networkidle when no predicate is
+# configured or none matched in time.
+def _wait_until_ready(page, config: Dict[str, Any], evidence: Dict[str, Any]) -> None:
+    wait = readiness_wait(config)
+    if wait is not None:
+        try:
+            handle = page.wait_for_function(READY_JS, **wait)
+            evidence["readiness"] = {"reason": handle.json_value()}
+            return
+        except PlaywrightTimeoutError:
+            evidence["readiness"] = {"reason": "timeout"}
     try:
-        page.screenshot(path=screenshot_path, full_page=True)
-    except Exception:
-        pass
+        page.wait_for_load_state("networkidle", timeout=idle_timeout(config, wait is not None))
+    except PlaywrightTimeoutError:
+        evidence["network_idle_timeout"] = True
+
+
+def _save_debug_assets(page, check: "PageCheck", prefix: str, html: Optional[str] = None) -> None:
+    # Only the capture happens here; compression and disk I/O run on the
+    # artifact writer thread. html the check already read is not read again.
+    screenshot = _capture(page.screenshot, full_page=check.full_page_screenshot)
+    if html is None:
+        html = _capture(page.content)
+    check.save_debug_assets(prefix, html, screenshot)
+
+
+def _capture(method, **kwargs: Any) -> Any:
     try:
-        html = page.content()
-        with open(html_path, "w", encoding="utf-8") as handle:
-            handle.write(html)
+        return method(**kwargs)
     except Exception:
-        pass
+        return None
+
+
+# Everything about one browser check that does not touch the page: evidence,
+# request stats, phase timings and spans, classification and the result. The
+# sync and async checkers drive Playwright and report each step here.
+class PageCheck:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.url = config["target"]["url"]
+        self.runtime = config["runtime"]
+        self.checked_at = iso_now()
+        self.evidence = base_evidence(config)
+        self.timings: Dict[str, Any] = self.evidence["timings"]
+        self.stats = RequestStats(ResourcePolicy.from_config(config))
+        self.full_page_screenshot = bool((self.runtime.get("artifacts") or {}).get("full_page_screenshot"))
+        self.started = time.perf_counter()
+        self.phase_started = self.started
+        self.navigation_started = self.started
+        self.browser_started: Optional[float] = None
+        self.status_code: Optional[int] = None
+
+    # Starts the browser span: context, navigate, wait and extract are its
+    # children; parse and crawl are siblings under the check.
+    def begin(self) -> None:
+        self.browser_started = self.phase_started = time.perf_counter()
+
+    def browser_ready(self, browser_info: Dict[str, Any]) -> None:
+        self.timings["launch_ms"] = browser_info.pop("launch_ms")
+        record_span("context", self.phase_started, "browser", launch_ms=self.timings["launch_ms"])
+        self.evidence["browser"] = browser_info
+
+    # Counts the request; returns why the resource policy blocks it, or None
+    # when it may load.
+    def block_reason(self, request) -> Optional[str]:
+        return self.stats.on_request(request.resource_type, request.url)
+
+    def on_response(self, response) -> None:
+        self.stats.on_response(response.headers)
+
+    def navigating(self) -> None:
+        self.navigation_started = time.perf_counter()
+
+    def navigated(self, response) -> None:
+        self.status_code = response.status if response else None
+        self.evidence["response_status"] = self.status_code
+        record_phase(self.timings, "navigate", self.navigation_started, "browser")
+        self.phase_started = time.perf_counter()
+
+    def ready(self) -> None:
+        record_phase(self.timings, "wait", self.phase_started, "browser")
+        self.timings["ready_ms"] = elapsed_ms(self.navigation_started)
+        self.phase_started = time.perf_counter()
+
+    def extracted(self, body_text: str, html: Optional[str]) -> Tuple[str, List[Dict[str, str]]]:
+        record_phase(self.timings, "extract", self.phase_started, "browser")
+        self._end_browser_span()
+        parse_started = time.perf_counter()
+        status, slots = classify_page(self.config, self.status_code, body_text, self.evidence, html)
+        record_phase(self.timings, "parse", parse_started, status=status, slots=len(slots))
+        self.timings["decision_ms"] = elapsed_ms(self.navigation_started)
+        return status, slots
+
+    def save_debug_assets(self, prefix: str, html: Optional[str], screenshot: Optional[bytes]) -> None:
+        get_artifact_writer(self.runtime).submit(prefix, html, screenshot)
+
+    def result(self, status: str, slots: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            "status": status,
+            "slots": slots,
+            "checked_at": self.checked_at,
+            "evidence": self.evidence,
+        }
+
+    def failed(self, exc: Exception) -> Dict[str, Any]:
+        error_message = str(exc)
+        self.evidence["error"] = error_message
+        return {**self.result("error", []), "error": error_message}
+
+    def finish(self) -> None:
+        self._end_browser_span()
+        self.evidence["network"] = self.stats.as_evidence()
+        # Total wall clock includes launch_ms on the checks that (re)launched.
+        self.timings["check_ms"] = elapsed_ms(self.started)
+
+    # Closes the browser span after extract, or wherever a failed check ended.
+    def _end_browser_span(self) -> None:
+        if self.browser_started is not None:
+            record_span("browser", self.browser_started)
+            self.browser_started = None
+
+
+# A phase of the check: its *_ms in evidence timings (and the metrics) and,
+# when the check is traced, a span under `parent`.
+def record_phase(
+    timings: Dict[str, Any],
+    phase: str,
+    started: float,
+    parent: str = "check",
+    **attrs: Any,
+) -> None:
+    timings[f"{phase}_ms"] = elapsed_ms(started)
+    record_span(phase, started, parent, **attrs)
+
+
+def base_evidence(config: Dict[str, Any]) -> Dict[str, Any]:
+    evidence: Dict[str, Any] = {"url": config["target"]["url"], "timings": {}}
+    if config["target"].get("name"):
+        evidence["target"] = config["target"]["name"]
+    return evidence
+
+
+def classify_page(
+    config: Dict[str, Any],
+    status_code: Optional[int],
+    body_text: str,
+    evidence: Dict[str, Any],
+    html: Optional[str] = None,
+) -> Tuple[str, List[Dict[str, str]]]:
+    unavailable = config["matchers"]["unavailable_text_substrings"]
+    matches = scan_text(body_text, unavailable)
+    if status_code in {403, 429} or matches.blocked:
+        evidence["blocked_reason"] = "status" if status_code in {403, 429} else "text"
+        evidence["matches"] = matches.evidence()
+        return "blocked", []
+
+    status, slots, parse_evidence = parse_availability(
+        body_text,
+        config["target"]["url"],
+        unavailable,
+        html=html,
+        matches=matches,
+    )
+    evidence.update(parse_evidence)
+    return status, slots
+
+
+def uses_dom_extractor(config: Dict[str, Any]) -> bool:
+    return config["matchers"].get("extractor", "dom") == "dom"
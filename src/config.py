@@ -1,8 +1,18 @@
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import yaml
 
+from .adaptive import DEFAULT_ADAPTIVE
+from .artifacts import DEFAULT_ARTIFACTS
+from .control import DEFAULT_CONTROL
+from .coordination import DEFAULT_COORDINATION
+from .crawl import DEFAULT_CRAWL
+from .metrics import DEFAULT_METRICS
+from .resource_policy import DEFAULT_BLOCK_HOSTS, DEFAULT_BLOCK_TYPES
+from .store import DEFAULT_RETENTION
+from .tracing import DEFAULT_TRACING
+
 try:
     from dotenv import load_dotenv
 except Exception:  # pragma: no cover - optional dependency
@@ -13,21 +23,32 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "target": {
         "url": "https://www.terminland.de/DAAMuenchenDeutschkurse/",
         "mode": "playwright",
+        "crawl": dict(DEFAULT_CRAWL),
     },
     "matchers": {
         "unavailable_text_substrings": [
             "keine freien Termine",
             "keine freien termine",
         ],
+        "extractor": "dom",
+        "readiness": {
+            "enabled": True,
+            "selector": None,
+            "unavailable_text": True,
+            "slot_pattern": True,
+            "poll_ms": 250,
+        },
     },
     "schedule": {
         "interval_seconds": 420,
         "jitter_percent": 20,
+        "adaptive": dict(DEFAULT_ADAPTIVE),
     },
     "limits": {
         "max_checks_per_hour": 12,
         "navigation_timeout_ms": 30000,
         "selector_timeout_ms": 15000,
+        "network_idle_fallback_ms": 2000,
         "backoff_base_seconds": 60,
         "max_backoff_seconds": 900,
         "blocked_cooldown_hours": 12,
@@ -45,10 +66,22 @@ DEFAULT_CONFIG: Dict[str, Any] = {
             "password_env": "SMTP_PASS",
             "max_slots_in_email": 10,
         },
+        # Checks only queue notifications; a background worker sends them.
+        "outbox": {
+            "poll_seconds": 5,
+            "backoff_base_seconds": 30,
+            "max_backoff_seconds": 1800,
+            "max_attempts": 12,
+            # SMTP session closed after this long without mail.
+            "idle_seconds": 60,
+            # Sent rows are deleted after this many days (0 keeps them).
+            "keep_sent_days": 30,
+        },
     },
     "storage": {
         "sqlite_path": "./data/state.db",
         "postgres_url_env": "DATABASE_URL",
+        "retention": dict(DEFAULT_RETENTION),
     },
     "runtime": {
         "headless": True,
@@ -59,6 +92,23 @@ DEFAULT_CONFIG: Dict[str, Any] = {
             "AppleWebKit/537.36 (KHTML, like Gecko) "
             "Chrome/119.0.0.0 Safari/537.36"
         ),
+        "browser": {
+            "max_checks_per_browser": 50,
+            "max_memory_mb": 1024,
+        },
+        "max_concurrent_checks": 2,
+        "artifacts": dict(DEFAULT_ARTIFACTS),
+        "coordination": dict(DEFAULT_COORDINATION),
+        "control": dict(DEFAULT_CONTROL),
+        "metrics": dict(DEFAULT_METRICS),
+        "tracing": dict(DEFAULT_TRACING),
+        "resource_policy": {
+            "block_types": list(DEFAULT_BLOCK_TYPES),
+            "allow_types": [],
+            "block_hosts": list(DEFAULT_BLOCK_HOSTS),
+            "allow_hosts": [],
+            "block_third_party": False,
+        },
     },
 }
 
@@ -87,6 +137,42 @@ def load_config(path: str) -> Dict[str, Any]:
     return deep_merge(DEFAULT_CONFIG, loaded)
 
 
+# Expands an optional `targets:` list into one full config per target. Each
+# entry needs a url and may override any target setting (mode, crawl, ...) as
+# well as matchers and schedule; state keys
+# are namespaced by target name so targets do not share last_status etc.
+def resolve_targets(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    targets = config.get("targets")
+    if not targets:
+        return [config]
+
+    resolved = []
+    seen = set()
+    for index, target in enumerate(targets):
+        if not target.get("url"):
+            raise ValueError(f"targets[{index}] is missing url")
+        name = target.get("name") or f"target-{index + 1}"
+        if name in seen:
+            raise ValueError(f"Duplicate target name: {name}")
+        seen.add(name)
+
+        target_overrides = {
+            key: value
+            for key, value in target.items()
+            if key not in ("matchers", "schedule")
+        }
+        target_overrides["name"] = name
+        overrides: Dict[str, Any] = {
+            "target": target_overrides,
+            "storage": {"state_prefix": f"{name}:"},
+        }
+        for section in ("matchers", "schedule"):
+            if target.get(section):
+                overrides[section] = target[section]
+        resolved.append(deep_merge(config, overrides))
+    return resolved
+
+
 def getenv_required(key: str) -> str:
     value = os.getenv(key)
     if not value:
@@ -0,0 +1,217 @@
+import asyncio
+import http.client
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTROL: Dict[str, Any] = {
+    # Local HTTP endpoint of `run`: status, check now, pause/resume, drain.
+    # It has no authentication, so keep it on a loopback address.
+    "enabled": False,
+    "host": "127.0.0.1",
+    "port": 8787,
+}
+
+COMMANDS = ("check", "pause", "resume", "drain")
+# Controller method behind each per-target command; drain always applies to
+# the whole process.
+ACTIONS = {"check": "trigger", "pause": "pause", "resume": "resume"}
+MAX_REQUEST_BYTES = 8192
+
+
+# Per-target scheduling state. Every wait of the target's loop goes through
+# Controller.sleep, which returns early when _wake is set (check now, resume,
+# drain), so nothing blocks for the length of a backoff or a block cooldown.
+class TargetControl:
+    def __init__(self, name: str):
+        self.name = name
+        self.paused = False
+        self.triggered = False
+        self.state = "starting"
+        self.next_check_at: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.last_checked_at: Optional[str] = None
+        self._wake = asyncio.Event()
+
+    def status(self) -> Dict[str, Any]:
+        next_in = None
+        if self.next_check_at is not None and self.state not in ("checking", "paused"):
+            next_in = max(0, round(self.next_check_at - time.time()))
+        return {
+            "state": "paused" if self.paused and self.state != "checking" else self.state,
+            "paused": self.paused,
+            "triggered": self.triggered,
+            "next_check_in_seconds": next_in,
+            "last_status": self.last_status,
+            "last_checked_at": self.last_checked_at,
+        }
+
+
+class Controller:
+    def __init__(self, names: List[str]):
+        self.targets = {name: TargetControl(name) for name in names}
+        self.draining = asyncio.Event()
+
+    def _select(self, name: Optional[str]) -> List[TargetControl]:
+        if name is None:
+            return list(self.targets.values())
+        if name not in self.targets:
+            raise KeyError(name)
+        return [self.targets[name]]
+
+    # Wakes the target from its interval wait. The check still takes a
+    # rate-limit reservation and still waits out a block cooldown.
+    def trigger(self, name: Optional[str] = None) -> List[str]:
+        selected = self._select(name)
+        for control in selected:
+            control.triggered = True
+            control._wake.set()
+        return [control.name for control in selected]
+
+    def pause(self, name: Optional[str] = None) -> List[str]:
+        selected = self._select(name)
+        for control in selected:
+            control.paused = True
+        return [control.name for control in selected]
+
+    def resume(self, name: Optional[str] = None) -> List[str]:
+        selected = self._select(name)
+        for control in selected:
+            control.paused = False
+            control._wake.set()
+        return [control.name for control in selected]
+
+    # Loops finish their in-flight check and return at the next wait.
+    def drain(self) -> List[str]:
+        if not self.draining.is_set():
+            logger.info("Draining: finishing in-flight checks, then exiting")
+        self.draining.set()
+        for control in self.targets.values():
+            control._wake.set()
+        return list(self.targets)
+
+    # Waits up to seconds; returns False once draining. A trigger only ends
+    # the wait when interruptible, i.e. for the regular interval.
+    async def sleep(self, control: TargetControl, seconds: float, state: str, interruptible: bool = True) -> bool:
+        control.state = state
+        control.next_check_at = time.time() + max(0.0, seconds)
+        deadline = control.next_check_at
+        while not self.draining.is_set():
+            if interruptible and control.triggered:
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            control._wake.clear()
+            try:
+                await asyncio.wait_for(control._wake.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return not self.draining.is_set()
+
+    # Holds a paused target until it is resumed, triggered (one check) or
+    # the process drains.
+    async def wait_while_paused(self, control: TargetControl) -> bool:
+        while control.paused and not control.triggered and not self.draining.is_set():
+            control.state = "paused"
+            control._wake.clear()
+            await control._wake.wait()
+        return not self.draining.is_set()
+
+    async def wait_drain(self, seconds: float) -> bool:
+        try:
+            await asyncio.wait_for(self.draining.wait(), seconds)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "draining": self.draining.is_set(),
+            "targets": {name: control.status() for name, control in self.targets.items()},
+        }
+
+    def handle(self, method: str, path: str, target: Optional[str]) -> Tuple[int, Dict[str, Any]]:
+        command = path.strip("/")
+        if method == "GET" and command in ("", "status"):
+            return 200, self.status()
+        if method != "POST" or command not in COMMANDS:
+            return 404, {"error": f"unknown command {method} {path}"}
+        if command == "drain":
+            if target:
+                return 400, {"error": "drain applies to the whole process, not to one target"}
+            return 202, {command: self.drain()}
+        try:
+            names = getattr(self, ACTIONS[command])(target)
+        except KeyError:
+            return 404, {"error": f"unknown target {target}"}
+        return 202, {command: names}
+
+
+# Minimal HTTP/1.0 server on the event loop, one request per connection, for
+# the local endpoints of `run`. handler(method, path, query) returns the
+# status, content type and body.
+async def serve_http(
+    handler: Callable[[str, str, Dict[str, List[str]]], Tuple[int, str, bytes]],
+    host: str,
+    port: int,
+) -> asyncio.AbstractServer:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            request_line = head[:MAX_REQUEST_BYTES].decode("latin-1").split("\r\n", 1)[0]
+            method, target_path, _ = request_line.split(" ", 2)
+            parts = urlsplit(target_path)
+            status, content_type, body = handler(method.upper(), parts.path, parse_qs(parts.query))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            status, content_type, body = 400, "text/plain", b"bad request\n"
+        writer.write(
+            f"HTTP/1.0 {status} {http.client.responses.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1")
+            + body
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port, limit=MAX_REQUEST_BYTES)
+
+
+async def serve_control(controller: Controller, settings: Dict[str, Any]) -> asyncio.AbstractServer:
+    def handler(method: str, path: str, query: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        target = (query.get("target") or [None])[0]
+        status, payload = controller.handle(method, path, target)
+        return status, "application/json", json.dumps(payload, sort_keys=True).encode("utf-8")
+
+    server = await serve_http(handler, settings["host"], int(settings["port"]))
+    logger.info("Control endpoint listening on http://%s:%s", settings["host"], settings["port"])
+    return server
+
+
+def control_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {**DEFAULT_CONTROL, **(config["runtime"].get("control") or {})}
+
+
+# Client side of the endpoint, used by the `ctl` command.
+def send_command(
+    config: Dict[str, Any],
+    command: str,
+    target: Optional[str] = None,
+    timeout: float = 10,
+) -> Tuple[int, Dict[str, Any]]:
+    settings = control_settings(config)
+    path = "/status" if command == "status" else f"/{command}"
+    if target:
+        path += "?" + urlencode({"target": target})
+    conn = http.client.HTTPConnection(settings["host"], int(settings["port"]), timeout=timeout)
+    try:
+        conn.request("GET" if command == "status" else "POST", path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
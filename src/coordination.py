@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .store import get_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COORDINATION: Dict[str, Any] = {
+    # Needed as soon as more than one `run` process shares the database.
+    "enabled": False,
+    # A worker (and its leases) counts as gone after this long without a
+    # heartbeat; its targets then move to the remaining workers.
+    "lease_seconds": 60,
+    "heartbeat_seconds": 15,
+    # Defaults to hostname-pid.
+    "worker_id": None,
+}
+
+LEADER_LEASE = "leader"
+
+
+def coordination_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {**DEFAULT_COORDINATION, **(config["runtime"].get("coordination") or {})}
+
+
+# Highest-random-weight hashing: every worker computes the same owner for a
+# target from the same live set, and a worker joining or leaving only moves
+# the targets it gains or held.
+def assign_owner(workers: List[str], target: str) -> str:
+    def weight(worker: str) -> int:
+        digest = hashlib.sha256(f"{worker}\0{target}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    return max(workers, key=weight)
+
+
+# Shares targets between replicas of `run` through the store (Postgres, or one
+# SQLite file for several processes on one host). A background thread
+# heartbeats and extends this worker's leases. Before each check a target loop
+# asks owns(): the target must hash to this worker among the live ones and its
+# lease must be free or ours. The lease makes a handover exclusive even while
+# workers briefly disagree on who is alive. The holder of the "leader" lease
+# runs the singleton jobs (compaction).
+class Coordinator:
+    def __init__(self, config: Dict[str, Any]):
+        settings = coordination_settings(config)
+        self.storage = config["storage"]
+        self.worker_id = settings["worker_id"] or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = float(settings["lease_seconds"])
+        self.heartbeat_seconds = float(settings["heartbeat_seconds"])
+        self.live_workers: List[str] = [self.worker_id]
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["Coordinator"]:
+        if not coordination_settings(config).get("enabled"):
+            return None
+        return cls(config)
+
+    def start(self) -> None:
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name="coordinator", daemon=True)
+        self._thread.start()
+        logger.info("Worker %s joined, live workers: %s", self.worker_id, self.live_workers)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except Exception as exc:
+                logger.error("Heartbeat failed: %s", exc)
+
+    def heartbeat(self, now: Optional[float] = None) -> List[str]:
+        live = get_store(self.storage).heartbeat(self.worker_id, self.lease_seconds, now)
+        if self.worker_id not in live:
+            live = sorted(live + [self.worker_id])
+        if live != self.live_workers:
+            logger.info("Live workers: %s", live)
+        self.live_workers = live
+        return live
+
+    def owns(self, target: Optional[str], now: Optional[float] = None) -> bool:
+        name = f"target:{target or ''}"
+        store = get_store(self.storage)
+        if assign_owner(self.live_workers, target or "") != self.worker_id:
+            store.release_lease(name, self.worker_id)
+            return False
+        return store.acquire_lease(name, self.worker_id, self.lease_seconds, now)
+
+    def is_leader(self, now: Optional[float] = None) -> bool:
+        return get_store(self.storage).acquire_lease(LEADER_LEASE, self.worker_id, self.lease_seconds, now)
+
+    # Leaves cleanly, so the other workers take over at once instead of
+    # waiting for the leases to expire.
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            get_store(self.storage).release_worker(self.worker_id)
+        except Exception as exc:
+            logger.warning("Failed to release leases of %s: %s", self.worker_id, exc)
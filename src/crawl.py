@@ -0,0 +1,100 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urlsplit
+
+from .tracing import record_span
+from .util import elapsed_ms, normalize_slots
+
+DEFAULT_CRAWL: Dict[str, Any] = {
+    "enabled": False,
+    "horizon_pages": 3,
+    "parallel": 3,
+    # Terminland renders "next week/month" as links or buttons with these hints.
+    "link_selector": (
+        "a[href*='woche'], a[href*='monat'], a[href*='week'], a[href*='month'], "
+        "a[title*='chste'], a[title*='Next'], a[rel='next']"
+    ),
+}
+
+LINKS_JS = "(elements) => elements.map((element) => element.href || '')"
+
+
+def crawl_settings(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    settings = {**DEFAULT_CRAWL, **(config["target"].get("crawl") or {})}
+    if not settings["enabled"] or int(settings["horizon_pages"]) <= 0:
+        return None
+    settings["horizon_pages"] = int(settings["horizon_pages"])
+    settings["parallel"] = max(1, int(settings["parallel"]))
+    return settings
+
+
+def next_links(base_url: str, hrefs: Iterable[str], seen: Set[str]) -> List[str]:
+    origin = urlsplit(base_url)[:2]
+    links = []
+    for href in hrefs:
+        if not href:
+            continue
+        url, _ = urldefrag(href)
+        if urlsplit(url)[:2] != origin or url in seen:
+            continue
+        seen.add(url)
+        links.append(url)
+    return links
+
+
+def merge_pages(
+    status: str,
+    slots: List[Dict[str, str]],
+    pages: List[Tuple[str, List[Dict[str, str]]]],
+) -> Tuple[str, List[Dict[str, str]]]:
+    merged = list(slots)
+    for page_status, page_slots in pages:
+        merged.extend(page_slots)
+        if page_status == "available":
+            status = "available"
+    unique = {(slot["date"], slot["time"]): slot for slot in normalize_slots(merged)}
+    return status, list(unique.values())
+
+
+# Frontier and results of one pagination crawl, shared by the sync and async
+# checkers, which only open the tabs. Pages are taken in waves of up to
+# `parallel` links until horizon_pages were visited or no links are left.
+class Crawl:
+    def __init__(self, url: str, settings: Dict[str, Any], start_url: str):
+        self.url = url
+        self.settings = settings
+        self.started = time.perf_counter()
+        self.seen = {url, start_url}
+        self.frontier: List[str] = []
+        self.pages: List[Tuple[str, List[Dict[str, str]]]] = []
+        self.page_timings: List[Dict[str, Any]] = []
+
+    def add_links(self, hrefs: Iterable[str]) -> None:
+        self.frontier.extend(next_links(self.url, hrefs, self.seen))
+
+    def next_batch(self) -> List[str]:
+        size = min(self.settings["parallel"], self.settings["horizon_pages"] - len(self.page_timings))
+        if size <= 0:
+            return []
+        batch, self.frontier = self.frontier[:size], self.frontier[size:]
+        return batch
+
+    def page_done(self, link: str, started: float, status: str, slots: List[Dict[str, str]]) -> None:
+        self.pages.append((status, slots))
+        self.page_timings.append({"url": link, "ms": elapsed_ms(started), "status": status, "slots": len(slots)})
+
+    def page_failed(self, link: str, started: float, exc: Exception) -> None:
+        self.page_timings.append({"url": link, "ms": elapsed_ms(started), "error": str(exc)})
+
+    # Records the crawl in evidence (and as a span) and merges its pages into
+    # the first page's result.
+    def finish(
+        self,
+        status: str,
+        slots: List[Dict[str, str]],
+        evidence: Dict[str, Any],
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        evidence["crawl"] = {"pages": len(self.pages), "failed": len(self.page_timings) - len(self.pages)}
+        evidence["timings"]["crawl_pages"] = self.page_timings
+        record_span("crawl", self.started, **evidence["crawl"])
+        return merge_pages(status, slots, self.pages)
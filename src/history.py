@@ -0,0 +1,206 @@
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from .store import Store
+
+BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+PERCENTILES = (50, 90, 99)
+STATS_COLUMNS = (
+    "bucket", "checks", "available", "failed", "available_uptime", "slots_appeared",
+    "mean_slot_lifetime_s", *(f"latency_p{percentile}_ms" for percentile in PERCENTILES),
+)
+
+# Exportable tables: columns in output order, the epoch column used for
+# --since/--until and ordering, and the JSON columns decoded for NDJSON.
+SOURCES: Dict[str, Tuple[Sequence[str], str, Sequence[str]]] = {
+    "checks": (
+        ("id", "checked_at", "target", "status", "duration_ms", "result_hash", "slots_json", "error"),
+        "checked_at_epoch",
+        ("slots_json",),
+    ),
+    "spans": (
+        ("id", "target", "status", "result_hash", "first_seen", "last_seen", "check_count", "slots_json", "error"),
+        "first_seen_epoch",
+        ("slots_json",),
+    ),
+    "slots": (
+        ("target", "slot_date", "slot_time", "first_seen", "last_seen", "appearances", "is_open"),
+        "first_seen_epoch",
+        (),
+    ),
+}
+SOURCE_TABLES = {"checks": "checks", "spans": "check_spans", "slots": "slots"}
+
+
+def _where(
+    epoch_column: str,
+    target: Optional[str],
+    since_epoch: Optional[float],
+    until_epoch: Optional[float],
+) -> Tuple[str, List[Any]]:
+    clauses = [f"{epoch_column} IS NOT NULL"]
+    params: List[Any] = []
+    if target is not None:
+        clauses.append("target = ?")
+        params.append(target)
+    if since_epoch is not None:
+        clauses.append(f"{epoch_column} >= ?")
+        params.append(int(since_epoch))
+    if until_epoch is not None:
+        clauses.append(f"{epoch_column} < ?")
+        params.append(int(until_epoch))
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def export_rows(
+    store: Store,
+    out: TextIO,
+    source: str = "checks",
+    fmt: str = "ndjson",
+    target: Optional[str] = None,
+    since_epoch: Optional[float] = None,
+    until_epoch: Optional[float] = None,
+) -> int:
+    columns, epoch_column, json_columns = SOURCES[source]
+    where, params = _where(epoch_column, target, since_epoch, until_epoch)
+    query = (
+        f"SELECT {', '.join(columns)} FROM {SOURCE_TABLES[source]}{where} "
+        f"ORDER BY {epoch_column}{', id' if 'id' in columns else ''}"
+    )
+    rows = store.stream(query, params)
+    if fmt == "csv":
+        return write_csv(out, columns, rows)
+    return write_ndjson(out, columns, rows, json_columns)
+
+
+def write_ndjson(
+    out: TextIO,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    json_columns: Sequence[str] = (),
+) -> int:
+    count = 0
+    for row in rows:
+        record = dict(zip(columns, row))
+        for column in json_columns:
+            if record.get(column):
+                record[column[: -len("_json")]] = json.loads(record.pop(column))
+        out.write(json.dumps(record, sort_keys=True) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(out: TextIO, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+# Aggregates per time bucket in SQL, so memory grows with the number of
+# buckets, not rows. Compacted spans count with their check_count in the
+# bucket where they started. Latency percentiles come from a histogram
+# (duration_ms / resolution_ms) grouped in SQL; duration_ms exists only for
+# raw checks, so they cover storage.retention.raw_hours.
+def history_stats(
+    store: Store,
+    bucket_seconds: int = 86400,
+    target: Optional[str] = None,
+    since_epoch: Optional[float] = None,
+    until_epoch: Optional[float] = None,
+    resolution_ms: int = 50,
+) -> Iterator[Dict[str, Any]]:
+    buckets: Dict[int, Dict[str, Any]] = {}
+
+    def bucket_row(bucket: int) -> Dict[str, Any]:
+        return buckets.setdefault(int(bucket), {"checks": 0, "available": 0, "failed": 0})
+
+    check_where, check_params = _where("checked_at_epoch", target, since_epoch, until_epoch)
+    span_where, span_params = _where("first_seen_epoch", target, since_epoch, until_epoch)
+    rows = store.fetchall(
+        "SELECT bucket, SUM(n), "
+        "SUM(CASE WHEN status = 'available' THEN n ELSE 0 END), "
+        "SUM(CASE WHEN status IN ('error', 'blocked') THEN n ELSE 0 END) FROM ("
+        f"SELECT (checked_at_epoch / ?) * ? AS bucket, status, 1 AS n FROM checks{check_where} "
+        "UNION ALL "
+        f"SELECT (first_seen_epoch / ?) * ? AS bucket, status, check_count AS n FROM check_spans{span_where}"
+        ") AS history GROUP BY bucket",
+        [bucket_seconds, bucket_seconds, *check_params, bucket_seconds, bucket_seconds, *span_params],
+    )
+    for bucket, checks, available, failed in rows:
+        bucket_row(bucket).update(checks=int(checks), available=int(available), failed=int(failed))
+
+    slot_where, slot_params = _where("first_seen_epoch", target, since_epoch, until_epoch)
+    rows = store.fetchall(
+        "SELECT (first_seen_epoch / ?) * ? AS bucket, COUNT(*), AVG(last_seen_epoch - first_seen_epoch) "
+        f"FROM slots{slot_where} GROUP BY bucket",
+        [bucket_seconds, bucket_seconds, *slot_params],
+    )
+    for bucket, appeared, mean_lifetime in rows:
+        bucket_row(bucket).update(slots_appeared=int(appeared), mean_slot_lifetime_s=round(float(mean_lifetime), 1))
+
+    latency_where, latency_params = _where("checked_at_epoch", target, since_epoch, until_epoch)
+    histogram_rows = store.stream(
+        "SELECT (checked_at_epoch / ?) * ? AS bucket, duration_ms / ? AS bin, COUNT(*) "
+        f"FROM checks{latency_where} AND duration_ms IS NOT NULL GROUP BY bucket, bin ORDER BY bucket, bin",
+        [bucket_seconds, bucket_seconds, resolution_ms, *latency_params],
+    )
+    total_histogram: Dict[int, int] = {}
+    current_bucket = None
+    histogram: List[Tuple[int, int]] = []
+    for bucket, latency_bin, count in histogram_rows:
+        if bucket != current_bucket and histogram:
+            bucket_row(current_bucket).update(latency_percentiles(histogram, resolution_ms))
+            histogram = []
+        current_bucket = bucket
+        histogram.append((int(latency_bin), int(count)))
+        total_histogram[int(latency_bin)] = total_histogram.get(int(latency_bin), 0) + int(count)
+    if histogram:
+        bucket_row(current_bucket).update(latency_percentiles(histogram, resolution_ms))
+
+    total = {"checks": 0, "available": 0, "failed": 0, "slots_appeared": 0}
+    lifetime_sum = 0.0
+    for bucket in sorted(buckets):
+        row = buckets[bucket]
+        for key in ("checks", "available", "failed", "slots_appeared"):
+            total[key] += row.get(key, 0)
+        lifetime_sum += row.get("mean_slot_lifetime_s", 0) * row.get("slots_appeared", 0)
+        yield {"bucket": _iso(bucket), **_with_uptime(row)}
+
+    if total["slots_appeared"]:
+        total["mean_slot_lifetime_s"] = round(lifetime_sum / total["slots_appeared"], 1)
+    total.update(latency_percentiles(sorted(total_histogram.items()), resolution_ms))
+    yield {"bucket": "total", **_with_uptime(total)}
+
+
+def _with_uptime(row: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(row)
+    row["available_uptime"] = round(row["available"] / row["checks"], 4) if row["checks"] else None
+    return row
+
+
+# Percentiles from sorted (bin, count) pairs, reported as the upper edge of
+# the bin that crosses each rank.
+def latency_percentiles(histogram: Sequence[Tuple[int, int]], resolution_ms: int) -> Dict[str, int]:
+    total = sum(count for _, count in histogram)
+    if not total:
+        return {}
+    result = {}
+    for percentile in PERCENTILES:
+        rank = total * percentile / 100
+        seen = 0
+        for latency_bin, count in histogram:
+            seen += count
+            if seen >= rank:
+                result[f"latency_p{percentile}_ms"] = (latency_bin + 1) * resolution_ms
+                break
+    return result
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
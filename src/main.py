@@ -1,11 +1,19 @@
 import argparse
+import csv
 import json
 import logging
 import os
+import sys
 
-from .config import load_config
+from .adaptive import evaluate
+from .artifacts import read_html_dump
+from .config import load_config, resolve_targets
+from .control import COMMANDS, send_command
+from .history import BUCKET_SECONDS, SOURCES, STATS_COLUMNS, export_rows, history_stats
 from .notifier_email import send_notification
-from .scheduler import run_loop, run_once, run_once_and_store
+from .parser import parse_availability_html
+from .scheduler import run_loop, run_once, run_once_and_store, run_targets_once
+from .store import compact_checks, get_store, init_db, to_epoch
 from .util import iso_now, normalize_slots
 
 
@@ -28,6 +36,39 @@ def main() -> int:
         help="Persist result and notifications",
     )
     subparsers.add_parser("run", help="Run forever with scheduling")
+    parse_parser = subparsers.add_parser(
+        "parse",
+        help="Parse saved HTML dumps (.html or .html.gz) without a browser",
+    )
+    parse_parser.add_argument("paths", nargs="+", help="HTML dump files")
+    history_parser = subparsers.add_parser(
+        "history",
+        help="Stream stored history as NDJSON/CSV, or print bucketed statistics",
+    )
+    history_parser.add_argument("--source", choices=sorted(SOURCES), default="checks")
+    history_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    history_parser.add_argument("--target", help="Only this target name")
+    history_parser.add_argument("--since", help="ISO date/time (inclusive)")
+    history_parser.add_argument("--until", help="ISO date/time (exclusive)")
+    history_parser.add_argument("--stats", action="store_true", help="Print statistics instead of rows")
+    history_parser.add_argument("--bucket", choices=sorted(BUCKET_SECONDS), default="day")
+    adaptive_parser = subparsers.add_parser(
+        "adaptive",
+        help="Compare adaptive polling with the fixed interval on stored history",
+    )
+    adaptive_parser.add_argument("--target", help="Target name (default: the first target)")
+    adaptive_parser.add_argument("--test-days", type=float, default=7, help="Replay the last N days")
+    adaptive_parser.add_argument("--lookback-days", type=float, help="Override schedule.adaptive.lookback_days")
+    ctl_parser = subparsers.add_parser("ctl", help="Control a running `run` process")
+    ctl_parser.add_argument("command_name", metavar="command", choices=["status", *COMMANDS])
+    ctl_parser.add_argument("--target", help="Only this target (default: all)")
+    compact_parser = subparsers.add_parser(
+        "compact",
+        help="Collapse old checks into spans and apply storage.retention",
+    )
+    compact_parser.add_argument("--raw-hours", type=float, help="Override storage.retention.raw_hours")
+    compact_parser.add_argument("--span-days", type=float, help="Override storage.retention.span_days")
+    compact_parser.add_argument("--vacuum", action="store_true", help="Reclaim disk space afterwards")
 
     args = parser.parse_args()
     config = load_config(args.config)
@@ -45,6 +86,108 @@ def main() -> int:
         logging.getLogger(__name__).info("Sent test email")
         return 0
 
+    if args.command == "parse":
+        unavailable = config["matchers"]["unavailable_text_substrings"]
+        for path in args.paths:
+            status, slots, evidence = parse_availability_html(
+                read_html_dump(path), path, unavailable
+            )
+            output = {"file": path, "status": status, "slots": slots, "evidence": evidence}
+            print(json.dumps(output, sort_keys=True))
+        return 0
+
+    if args.command == "history":
+        since_epoch = to_epoch(args.since) if args.since else None
+        until_epoch = to_epoch(args.until) if args.until else None
+        if args.since and since_epoch is None:
+            parser.error(f"--since: invalid ISO date/time {args.since!r}")
+        if args.until and until_epoch is None:
+            parser.error(f"--until: invalid ISO date/time {args.until!r}")
+        storage_cfg = config["storage"]
+        init_db(storage_cfg)
+        store = get_store(storage_cfg)
+        if args.stats:
+            rows = history_stats(
+                store,
+                BUCKET_SECONDS[args.bucket],
+                target=args.target,
+                since_epoch=since_epoch,
+                until_epoch=until_epoch,
+            )
+            if args.format == "csv":
+                writer = csv.DictWriter(sys.stdout, fieldnames=STATS_COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    print(json.dumps(row, sort_keys=True))
+            return 0
+        export_rows(
+            store,
+            sys.stdout,
+            source=args.source,
+            fmt=args.format,
+            target=args.target,
+            since_epoch=since_epoch,
+            until_epoch=until_epoch,
+        )
+        return 0
+
+    if args.command == "adaptive":
+        targets = resolve_targets(config)
+        target_cfg = next(
+            (target for target in targets if target["target"].get("name") == args.target),
+            None,
+        ) if args.target else targets[0]
+        if target_cfg is None:
+            raise ValueError(f"Unknown target: {args.target}")
+        if args.lookback_days is not None:
+            schedule = target_cfg["schedule"]
+            adaptive = {**(schedule.get("adaptive") or {}), "lookback_days": args.lookback_days}
+            target_cfg = {**target_cfg, "schedule": {**schedule, "adaptive": adaptive}}
+        init_db(target_cfg["storage"])
+        report = evaluate(target_cfg, get_store(target_cfg["storage"]), test_days=args.test_days)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return 0
+
+    if args.command == "ctl":
+        try:
+            status, payload = send_command(config, args.command_name, args.target)
+        except OSError as exc:
+            logging.getLogger(__name__).error(
+                "No scheduler reachable (is runtime.control.enabled set for run?): %s", exc
+            )
+            return 1
+        print(json.dumps(payload, indent=2, sort_keys=True))
+        return 0 if status < 400 else 1
+
+    if args.command == "compact":
+        storage_cfg = config["storage"]
+        retention = dict(storage_cfg.get("retention") or {})
+        if args.raw_hours is not None:
+            retention["raw_hours"] = args.raw_hours
+        if args.span_days is not None:
+            retention["span_days"] = args.span_days
+        storage_cfg = {**storage_cfg, "retention": retention}
+        init_db(storage_cfg)
+        stats = compact_checks(storage_cfg)
+        if args.vacuum:
+            get_store(storage_cfg).vacuum()
+        print(json.dumps(stats, sort_keys=True))
+        return 0
+
+    if args.command == "check-once" and config.get("targets"):
+        results = run_targets_once(config, store=args.store)
+        for result in results:
+            result["slots"] = normalize_slots(result.get("slots") or [])
+            print(json.dumps(result, sort_keys=True))
+        statuses = {result["status"] for result in results}
+        if "blocked" in statuses:
+            return 2
+        if "error" in statuses:
+            return 1
+        return 0
+
     if args.command == "check-once":
         if args.store:
             result = run_once_and_store(config)
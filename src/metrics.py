@@ -0,0 +1,199 @@
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .control import serve_http
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS: Dict[str, Any] = {
+    # Prometheus text format on http://host:port/metrics while `run` runs.
+    "enabled": False,
+    "host": "127.0.0.1",
+    "port": 8788,
+}
+
+# Seconds; page loads take seconds, store round-trips milliseconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+METRICS: Dict[str, Tuple[str, str]] = {
+    "daa_phase_duration_seconds": ("histogram", "Time spent per phase of a check."),
+    "daa_checks_total": ("counter", "Checks by resulting status."),
+    "daa_consecutive_failures": ("gauge", "Consecutive error/blocked checks (drives the backoff)."),
+    "daa_next_check_delay_seconds": ("gauge", "Delay planned before the next check, backoff included."),
+    "daa_blocked_until_timestamp_seconds": ("gauge", "End of the block cooldown as a Unix time, 0 when not blocked."),
+}
+
+# Phases the checkers record in evidence["timings"].
+TIMING_PHASES = {
+    "launch_ms": "launch",
+    "navigate_ms": "navigate",
+    "wait_ms": "wait",
+    "extract_ms": "extract",
+    "parse_ms": "parse",
+    "request_ms": "request",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+# In-process registry. Observations come from the event loop and from worker
+# threads (notifications, coordination), hence the lock; rendering copies
+# nothing but the numbers.
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def render(self) -> str:
+        with self._lock:
+            samples: Dict[str, List[str]] = {}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                lines = samples.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format(labels)} {histogram.sum!r}")
+                lines.append(f"{name}_count{_format(labels)} {cumulative}")
+            for values in (self.counters, self.gauges):
+                for (name, labels), value in sorted(values.items()):
+                    samples.setdefault(name, []).append(f"{name}{_format(labels)} {value!r}")
+        out = []
+        for name in sorted(samples):
+            kind, help_text = METRICS.get(name, ("untyped", name))
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(samples[name])
+        return "\n".join(out) + "\n"
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+# The process-wide registry, None unless metrics are enabled. Every helper
+# below checks it first, so instrumentation costs one global lookup when off.
+_registry: Optional[Registry] = None
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def enable_metrics() -> Registry:
+    global _registry
+    if _registry is None:
+        _registry = Registry()
+    return _registry
+
+
+def disable_metrics() -> None:
+    global _registry
+    _registry = None
+
+
+def get_registry() -> Optional[Registry]:
+    return _registry
+
+
+def observe_phase(phase: str, seconds: float, target: str) -> None:
+    if _registry is not None:
+        _registry.observe("daa_phase_duration_seconds", seconds, phase=phase, target=target)
+
+
+class _PhaseTimer:
+    __slots__ = ("phase", "target", "started")
+
+    def __init__(self, phase: str, target: str):
+        self.phase = phase
+        self.target = target
+
+    def __enter__(self) -> "_PhaseTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        observe_phase(self.phase, time.perf_counter() - self.started, self.target)
+
+
+def timed(phase: str, target: str):
+    if _registry is None:
+        return _NOT_TIMED
+    return _PhaseTimer(phase, target)
+
+
+# Counts the result and turns the checker's evidence timings into phase
+# observations (the check phase itself is timed by the caller).
+def observe_check(result: Dict[str, Any], target: str) -> None:
+    if _registry is None:
+        return
+    _registry.inc("daa_checks_total", status=result["status"], target=target)
+    timings = (result.get("evidence") or {}).get("timings") or {}
+    for key, phase in TIMING_PHASES.items():
+        value = timings.get(key)
+        if value is not None:
+            _registry.observe("daa_phase_duration_seconds", value / 1000, phase=phase, target=target)
+
+
+def set_gauge(name: str, value: float, target: str) -> None:
+    if _registry is not None:
+        _registry.set(name, value, target=target)
+
+
+def metrics_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {**DEFAULT_METRICS, **(config["runtime"].get("metrics") or {})}
+
+
+async def serve_metrics(settings: Dict[str, Any]):
+    registry = enable_metrics()
+
+    def handler(method: str, path: str, query: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        if method != "GET" or path != "/metrics":
+            return 404, "text/plain", b"not found\n"
+        return 200, "text/plain; version=0.0.4", registry.render().encode("utf-8")
+
+    server = await serve_http(handler, settings["host"], int(settings["port"]))
+    logger.info("Metrics endpoint listening on http://%s:%s/metrics", settings["host"], settings["port"])
+    return server
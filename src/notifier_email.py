@@ -1,44 +1,100 @@
+import logging
 import smtplib
 import time
 from email.message import EmailMessage
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 from .config import getenv_required
 
+logger = logging.getLogger(__name__)
 
+
+# Sends the notification right away over a fresh session (TEST_EMAIL). Checks
+# do not call this: they queue render_notification() in the outbox.
 def send_notification(config: Dict[str, Any], result: Dict[str, Any]) -> None:
     email_cfg = config["notify"]["email"]
-    smtp_host = email_cfg["smtp_host"]
-    smtp_port = email_cfg["smtp_port"]
-    use_tls = email_cfg.get("use_tls", True)
+    session = SmtpSession(email_cfg)
+    try:
+        session.send(build_message(email_cfg, *render_notification(config, result)))
+    except Exception as exc:
+        raise RuntimeError(f"Failed to send email: {exc}") from exc
+    finally:
+        session.close()
 
-    username = getenv_required(email_cfg["username_env"])
-    password = getenv_required(email_cfg["password_env"])
 
-    msg = EmailMessage()
+# (subject, body) of the notification for a result; stored in the outbox.
+def render_notification(config: Dict[str, Any], result: Dict[str, Any]) -> Tuple[str, str]:
+    email_cfg = config["notify"]["email"]
     status = result["status"].upper()
-    msg["Subject"] = f"[Terminland Watcher] Appointments {status}"
+    subject = f"[Terminland Watcher] Appointments {status}"
+    return subject, _render_body(result, email_cfg.get("max_slots_in_email", 10))
+
+
+def build_message(email_cfg: Dict[str, Any], subject: str, body: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = subject
     msg["From"] = email_cfg["from"]
     msg["To"] = email_cfg["to"]
+    msg.set_content(body)
+    return msg
 
-    msg.set_content(_render_body(result, email_cfg.get("max_slots_in_email", 10)))
 
-    attempts = 3
-    delay = 2
-    last_exc = None
-    for _ in range(attempts):
+# One authenticated SMTP connection, opened on first use and kept for the
+# following messages (STARTTLS and login once per session rather than per
+# mail). A send that fails on a reused connection (typically dropped by the
+# server while idle) is retried once on a new one; errors on a fresh
+# connection go to the caller.
+class SmtpSession:
+    def __init__(self, email_cfg: Dict[str, Any], timeout: float = 15):
+        self.email_cfg = email_cfg
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        username = getenv_required(self.email_cfg["username_env"])
+        password = getenv_required(self.email_cfg["password_env"])
+        smtp = smtplib.SMTP(self.email_cfg["smtp_host"], self.email_cfg["smtp_port"], timeout=self.timeout)
+        try:
+            if self.email_cfg.get("use_tls", True):
+                smtp.starttls()
+            smtp.login(username, password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connections_opened += 1
+        return smtp
+
+    def send(self, msg: EmailMessage) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.send_message(msg)
+                self._last_used = time.monotonic()
+                return
+            except Exception as exc:
+                logger.info("SMTP session lost (%s), reconnecting", exc)
+                self.close()
+        self._smtp = self._connect()
         try:
-            with smtplib.SMTP(smtp_host, smtp_port, timeout=15) as server:
-                if use_tls:
-                    server.starttls()
-                server.login(username, password)
-                server.send_message(msg)
+            self._smtp.send_message(msg)
+        except Exception:
+            self.close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self, idle_seconds: float) -> None:
+        if self._smtp is not None and time.monotonic() - self._last_used >= idle_seconds:
+            self.close()
+
+    def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
             return
-        except Exception as exc:  # pragma: no cover - network
-            last_exc = exc
-            time.sleep(delay)
-            delay *= 2
-    raise RuntimeError(f"Failed to send email: {last_exc}")
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
 
 
 def _render_body(result: Dict[str, Any], max_slots: int) -> str:
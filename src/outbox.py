@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import timed
+from .notifier_email import SmtpSession, build_message
+from .store import get_store
+
+logger = logging.getLogger(__name__)
+
+# A claimed notification that is neither sent nor failed after this long
+# (worker crashed mid-send) becomes due again.
+CLAIM_SECONDS = 300
+BATCH_SIZE = 20
+
+# Set after a check queued a notification, so the worker does not wait out
+# poll_seconds.
+_wakeup = threading.Event()
+
+
+def wake_outbox() -> None:
+    _wakeup.set()
+
+
+# Sends the notifications checks leave in the outbox table. Runs as a thread
+# next to `run` (and once at the end of `check-once`), so SMTP latency and
+# retries never hold up a check. Messages go out over one SmtpSession that
+# stays open while mail keeps coming and is closed after idle_seconds. A
+# failed send is retried with exponential backoff up to max_attempts; the row
+# then stays in the table with status "failed" and its last error.
+class OutboxWorker:
+    def __init__(self, config: Dict[str, Any]):
+        self.storage = config["storage"]
+        self.settings = config["notify"]["outbox"]
+        self.email_cfg = config["notify"]["email"]
+        self.session = SmtpSession(self.email_cfg)
+        self.sent = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pruned_at = 0.0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        poll_seconds = float(self.settings["poll_seconds"])
+        while not self._stop.is_set():
+            _wakeup.clear()
+            try:
+                self.drain()
+            except Exception as exc:
+                logger.error("Outbox delivery failed: %s", exc)
+            self.session.close_if_idle(float(self.settings["idle_seconds"]))
+            _wakeup.wait(poll_seconds)
+
+    # Sends every notification that is due now; returns how many went out.
+    def drain(self, now: Optional[float] = None) -> int:
+        store = get_store(self.storage)
+        sent = 0
+        while not self._stop.is_set():
+            rows = store.claim_notifications(BATCH_SIZE, CLAIM_SECONDS, now)
+            for row in rows:
+                sent += self._deliver(row, now)
+            if len(rows) < BATCH_SIZE:
+                break
+        self._prune_if_due(now)
+        return sent
+
+    def _deliver(self, row: Tuple[Any, ...], now: Optional[float] = None) -> int:
+        row_id, target, subject, body, attempts = row
+        store = get_store(self.storage)
+        try:
+            with timed("notify", target or "default"):
+                self.session.send(build_message(self.email_cfg, subject, body))
+        except Exception as exc:
+            now = time.time() if now is None else now
+            self.failed += 1
+            if attempts >= int(self.settings["max_attempts"]):
+                logger.error("Giving up on notification %s after %s attempts: %s", row_id, attempts, exc)
+                store.mark_notification_failed(row_id, str(exc), None)
+                return 0
+            backoff = float(self.settings["backoff_base_seconds"]) * 2 ** (attempts - 1)
+            backoff = min(backoff, float(self.settings["max_backoff_seconds"]))
+            logger.warning(
+                "Failed to send notification %s (attempt %s), retrying in %.0f s: %s",
+                row_id,
+                attempts,
+                backoff,
+                exc,
+            )
+            store.mark_notification_failed(row_id, str(exc), now + backoff)
+            return 0
+        store.mark_notification_sent(row_id, now)
+        self.sent += 1
+        logger.info("Sent notification %s: %s", row_id, subject)
+        return 1
+
+    def _prune_if_due(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        if now - self._pruned_at < 3600:
+            return
+        self._pruned_at = now
+        keep_days = float(self.settings["keep_sent_days"])
+        if keep_days:
+            get_store(self.storage).prune_outbox(now - keep_days * 86400)
+
+    # Finishes the message being sent, then closes the session.
+    def stop(self) -> None:
+        self._stop.set()
+        _wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.session.close()
+
+
+def start_outbox(config: Dict[str, Any]) -> OutboxWorker:
+    worker = OutboxWorker(config)
+    worker.start()
+    return worker
+
+
+# One delivery pass without a thread, for `check-once`: whatever fails stays
+# queued for the next run.
+def drain_outbox(config: Dict[str, Any]) -> int:
+    worker = OutboxWorker(config)
+    try:
+        return worker.drain()
+    except Exception as exc:
+        logger.error("Outbox delivery failed: %s", exc)
+        return 0
+    finally:
+        worker.session.close()
@@ -1,11 +1,25 @@
 import re
 from datetime import datetime
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from html import unescape
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from .util import normalize_slots
 
 TIME_RE = re.compile(r"\b([01]?\d|2[0-3]):[0-5]\d\b")
 DATE_RE = re.compile(r"\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b")
+INVISIBLE_RE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+TAG_RE = re.compile(r"<[^>]+>")
+SLOT_TOKEN_RE = re.compile(
+    r"\b(?:(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})"
+    r"|(?P<time>(?:[01]?\d|2[0-3]):[0-5]\d))\b"
+)
+INVISIBLE_TAGS = {"script", "style", "noscript", "template"}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
 
 
 BLOCKED_SUBSTRINGS = [
@@ -37,47 +51,253 @@ def _normalize_date(day: str, month: str, year: str) -> str:
     return parsed.strftime("%Y-%m-%d")
 
 
+def html_to_text(html: str) -> str:
+    text = INVISIBLE_RE.sub(" ", html or "")
+    text = TAG_RE.sub(" ", text)
+    return unescape(text)
+
+
+class TextMatches:
+    __slots__ = ("blocked", "unavailable", "times", "dates", "positions")
+
+    def __init__(self):
+        self.blocked = False
+        self.unavailable = False
+        self.times: Set[str] = set()
+        self.dates: Set[str] = set()
+        self.positions: Dict[str, List[int]] = {}
+
+    def evidence(self) -> Dict[str, List[int]]:
+        return {kind: list(values) for kind, values in sorted(self.positions.items())}
+
+
+# One precompiled alternation of the blocked and unavailable substrings plus the
+# date and time patterns, so a single pass yields both verdicts and the slot
+# tokens. The text is lowercased once instead of compiling with IGNORECASE, and
+# the leading lookahead lets the engine skip positions that cannot start a match.
+# Word boundaries around dates and times are checked in Python for the same
+# reason; a rejected candidate resumes the search one character later, exactly
+# where a leading \b would have, and a time resumes at its minutes because a
+# date may start there. Tokens are tried longest first; a token that
+# contains a shorter one (e.g. "robot check" and "robot") counts for both.
+class TextMatcher:
+    def __init__(self, unavailable_substrings: Iterable[str]):
+        kinds: Dict[str, Set[str]] = {}
+        for token in BLOCKED_SUBSTRINGS:
+            kinds.setdefault(token.lower(), set()).add("blocked")
+        for token in unavailable_substrings:
+            if token:
+                kinds.setdefault(token.lower(), set()).add("unavailable")
+        tokens = sorted(kinds, key=len, reverse=True)
+        self._kinds = {
+            token: frozenset().union(*(kinds[other] for other in tokens if other in token))
+            for token in tokens
+        }
+        first_chars = "".join(re.escape(char) for char in sorted({token[0] for token in tokens}))
+        alternation = "|".join(re.escape(token) for token in tokens)
+        self._pattern = re.compile(
+            rf"(?=[{first_chars}\d])(?:(?P<token>{alternation})"
+            r"|(?P<lead>\d{1,2})(?:\.(?P<month>\d{1,2})\.(?P<year>\d{4})|:(?P<minute>[0-5]\d)))"
+        )
+
+    def scan(self, text: str, max_positions: int = 20) -> TextMatches:
+        matches = TextMatches()
+        positions = matches.positions
+        text = (text or "").lower()
+        search = self._pattern.search
+        time_end = 0
+        match = search(text)
+        while match:
+            start, end = match.span()
+            token = match.group("token")
+            if token is not None:
+                for kind in self._kinds[token]:
+                    setattr(matches, kind, True)
+                    _add_position(positions, kind, start, max_positions)
+                match = search(text, end)
+                continue
+            if _is_word_char(text, start - 1) or _is_word_char(text, end):
+                match = search(text, start + 1)
+                continue
+            lead = match.group("lead")
+            if match.group("year") is not None:
+                date = _normalize_date(lead, match.group("month"), match.group("year"))
+                if date:
+                    matches.dates.add(date)
+                    _add_position(positions, "date", start, max_positions)
+            elif int(lead) <= 23 and start >= time_end:
+                matches.times.add(_normalize_time(f"{lead}:{match.group('minute')}"))
+                _add_position(positions, "time", start, max_positions)
+                time_end = end
+                match = search(text, match.start("minute"))
+                continue
+            else:
+                match = search(text, start + 1)
+                continue
+            match = search(text, end)
+        return matches
+
+
+def _is_word_char(text: str, index: int) -> bool:
+    if index < 0 or index >= len(text):
+        return False
+    char = text[index]
+    return char.isalnum() or char == "_"
+
+
+def _add_position(positions: Dict[str, List[int]], kind: str, start: int, max_positions: int) -> None:
+    kind_positions = positions.setdefault(kind, [])
+    if len(kind_positions) < max_positions:
+        kind_positions.append(start)
+
+
+@lru_cache(maxsize=32)
+def _matcher(unavailable_substrings: Tuple[str, ...]) -> TextMatcher:
+    return TextMatcher(unavailable_substrings)
+
+
+def scan_text(body_text: str, unavailable_substrings: Iterable[str] = ()) -> TextMatches:
+    return _matcher(tuple(unavailable_substrings)).scan(body_text)
+
+
 def detect_blocked(body_text: str) -> bool:
-    lower = (body_text or "").lower()
-    return any(token in lower for token in BLOCKED_SUBSTRINGS)
+    return scan_text(body_text).blocked
+
+
+def _slots_from_matches(matches: TextMatches) -> List[Dict[str, str]]:
+    if matches.times and len(matches.dates) == 1:
+        date = next(iter(matches.dates))
+        return normalize_slots({"date": date, "time": time} for time in matches.times)
+    return []
 
 
 def extract_slots(body_text: str) -> Tuple[List[Dict[str, str]], int, int]:
-    times = sorted({_normalize_time(match) for match in TIME_RE.findall(body_text or "")})
-    dates = []
-    for day, month, year in DATE_RE.findall(body_text or ""):
-        normalized = _normalize_date(day, month, year)
-        if normalized:
-            dates.append(normalized)
-    dates = sorted(set(dates))
+    matches = scan_text(body_text)
+    return _slots_from_matches(matches), len(matches.times), len(matches.dates)
+
+
+# Single streaming pass over the HTML. A date is recorded on the element that
+# contains it and on that element's parent; a time pairs with the innermost
+# open element that carries a date. Later dates overwrite earlier ones in the
+# same scope, which covers grid cells, table rows and "heading + list" layouts.
+class _SlotExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[List[Optional[str]]] = [[None, None]]
+        self.skip_depth = 0
+        self.text_parts: List[str] = []
+        self.pairs: List[Tuple[str, str]] = []
+        self.times: Set[str] = set()
+        self.dates: Set[str] = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        if tag in INVISIBLE_TAGS:
+            self.skip_depth += 1
+        self.stack.append([tag, None])
 
-    slots: List[Dict[str, str]] = []
-    if times and len(dates) == 1:
-        slots = [{"date": dates[0], "time": time} for time in times]
-    return normalize_slots(slots), len(times), len(dates)
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, 0, -1):
+            if self.stack[index][0] == tag:
+                for frame in self.stack[index:]:
+                    if frame[0] in INVISIBLE_TAGS:
+                        self.skip_depth -= 1
+                del self.stack[index:]
+                return
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self.text_parts.append(data)
+        for match in SLOT_TOKEN_RE.finditer(data):
+            if match.group("day"):
+                date = _normalize_date(match.group("day"), match.group("month"), match.group("year"))
+                if not date:
+                    continue
+                self.dates.add(date)
+                self.stack[-1][1] = date
+                if len(self.stack) > 1:
+                    self.stack[-2][1] = date
+                continue
+            time = _normalize_time(match.group("time"))
+            self.times.add(time)
+            for frame in reversed(self.stack):
+                if frame[1]:
+                    self.pairs.append((frame[1], time))
+                    break
+
+
+def extract_slots_html(html: str) -> Tuple[List[Dict[str, str]], int, int, str]:
+    extractor = _SlotExtractor()
+    extractor.feed(html or "")
+    extractor.close()
+    slots = normalize_slots({"date": date, "time": time} for date, time in set(extractor.pairs))
+    text = " ".join(extractor.text_parts)
+    return slots, len(extractor.times), len(extractor.dates), text
 
 
 def parse_availability(
     body_text: str,
     url: str,
     unavailable_substrings: List[str],
+    html: Optional[str] = None,
+    matches: Optional[TextMatches] = None,
 ) -> Tuple[str, List[Dict[str, str]], Dict[str, object]]:
-    lowered = (body_text or "").lower()
-    found_unavailable = any(token.lower() in lowered for token in unavailable_substrings)
+    if matches is None:
+        matches = scan_text(body_text, unavailable_substrings)
+    found_unavailable = matches.unavailable
+    slots = _slots_from_matches(matches)
+    time_count = len(matches.times)
+    date_count = len(matches.dates)
+    slot_source = "text"
+    if html is not None:
+        dom_slots = extract_slots_html(html)[0]
+        if dom_slots:
+            slots = dom_slots
+            slot_source = "dom"
 
-    slots, time_count, date_count = extract_slots(body_text or "")
-
-    if found_unavailable and not time_count:
-        status = "unavailable"
-    elif time_count or date_count:
-        status = "available"
-    else:
-        status = "unavailable"
+    status = _availability_status(found_unavailable, time_count, date_count)
 
     evidence: Dict[str, object] = {
         "url": url,
         "found_unavailable_text": found_unavailable,
         "slot_time_count": time_count,
         "date_count": date_count,
+        "matches": matches.evidence(),
     }
+    if html is not None:
+        evidence["slot_source"] = slot_source
     return status, slots, evidence
+
+
+# Parser-only path for saved dumps: text, verdict and slots all come from the
+# one pass of the DOM extractor.
+def parse_availability_html(
+    html: str,
+    url: str,
+    unavailable_substrings: List[str],
+) -> Tuple[str, List[Dict[str, str]], Dict[str, object]]:
+    slots, time_count, date_count, text = extract_slots_html(html)
+    matches = scan_text(text, unavailable_substrings)
+    if matches.blocked:
+        status = "blocked"
+    else:
+        status = _availability_status(matches.unavailable, time_count, date_count)
+    evidence: Dict[str, object] = {
+        "url": url,
+        "found_unavailable_text": matches.unavailable,
+        "slot_time_count": time_count,
+        "date_count": date_count,
+        "matches": matches.evidence(),
+        "slot_source": "dom",
+    }
+    return status, slots, evidence
+
+
+def _availability_status(found_unavailable: bool, time_count: int, date_count: int) -> str:
+    if found_unavailable and not time_count:
+        return "unavailable"
+    if time_count or date_count:
+        return "available"
+    return "unavailable"
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Union
+
+from .coordination import coordination_settings
+from .store import check_epochs_since, get_store
+
+WINDOW_SECONDS = 3600
+
+
+# Sliding log of check start times, shared by every target of the process.
+# It is seeded once from the checks table, so a restart (or a cron-style
+# check-once) still honours checks made by earlier processes; after that it
+# lives in memory. reserve() books the slot when it grants one, so concurrent
+# targets cannot both take the last check of the window.
+class RateLimiter:
+    def __init__(self, max_checks: int, window_seconds: float = WINDOW_SECONDS):
+        self.max_checks = max(0, int(max_checks or 0))
+        self.window_seconds = window_seconds
+        self._starts: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, config: Dict[str, Any], storage: Dict[str, Any]) -> "RateLimiter":
+        limiter = cls(config["limits"]["max_checks_per_hour"])
+        if limiter.max_checks:
+            limiter.seed(check_epochs_since(storage, time.time() - limiter.window_seconds))
+        return limiter
+
+    def seed(self, timestamps: Iterable[float]) -> None:
+        with self._lock:
+            self._starts.extend(sorted(timestamps))
+
+    def wait_seconds(self, now: Optional[float] = None) -> float:
+        if not self.max_checks:
+            return 0.0
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._wait_locked(now)
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        if not self.max_checks:
+            return 0.0
+        now = time.time() if now is None else now
+        with self._lock:
+            wait = self._wait_locked(now)
+            if wait <= 0:
+                self._starts.append(now)
+            return wait
+
+    def _wait_locked(self, now: float) -> float:
+        window_start = now - self.window_seconds
+        while self._starts and self._starts[0] < window_start:
+            self._starts.popleft()
+        if len(self._starts) < self.max_checks:
+            return 0.0
+        return max(0.0, self._starts[-self.max_checks] + self.window_seconds - now)
+
+
+# The same budget enforced across replicas: every reservation is a row in
+# rate_reservations, booked under one lock, so max_checks_per_hour holds for
+# the whole deployment rather than per process.
+class SharedRateLimiter:
+    def __init__(
+        self,
+        storage: Dict[str, Any],
+        max_checks: int,
+        window_seconds: float = WINDOW_SECONDS,
+        worker_id: Optional[str] = None,
+    ):
+        self.storage = storage
+        self.max_checks = max(0, int(max_checks or 0))
+        self.window_seconds = window_seconds
+        self.worker_id = worker_id
+
+    def wait_seconds(self, now: Optional[float] = None) -> float:
+        if not self.max_checks:
+            return 0.0
+        store = get_store(self.storage)
+        return store.reserve_check(self.max_checks, self.window_seconds, now, self.worker_id, book=False)
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        if not self.max_checks:
+            return 0.0
+        return get_store(self.storage).reserve_check(self.max_checks, self.window_seconds, now, self.worker_id)
+
+
+Limiter = Union[RateLimiter, SharedRateLimiter]
+
+
+def make_limiter(
+    config: Dict[str, Any],
+    storage: Dict[str, Any],
+    worker_id: Optional[str] = None,
+) -> Limiter:
+    if coordination_settings(config).get("enabled"):
+        return SharedRateLimiter(storage, config["limits"]["max_checks_per_hour"], worker_id=worker_id)
+    return RateLimiter.from_store(config, storage)
@@ -0,0 +1,70 @@
+from typing import Any, Dict, Optional
+
+from .parser import BLOCKED_SUBSTRINGS, TIME_RE
+
+# Evaluated in the page by wait_for_function; returns the name of the first
+# predicate that decides the page, or false to keep polling.
+READY_JS = """
+(arg) => {
+    if (arg.selector && document.querySelector(arg.selector)) {
+        return "selector";
+    }
+    const body = document.body ? document.body.innerText : "";
+    if (!body) {
+        return false;
+    }
+    const lower = body.toLowerCase();
+    if (arg.blocked.some((token) => lower.includes(token))) {
+        return "blocked_text";
+    }
+    if (arg.texts.some((token) => lower.includes(token))) {
+        return "unavailable_text";
+    }
+    if (arg.slotPattern && new RegExp(arg.slotPattern).test(body)) {
+        return "slot_pattern";
+    }
+    return false;
+}
+"""
+
+
+def readiness_arg(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    readiness = config["matchers"].get("readiness") or {}
+    if not readiness.get("enabled", True):
+        return None
+
+    texts = []
+    if readiness.get("unavailable_text", True):
+        texts = [token.lower() for token in config["matchers"]["unavailable_text_substrings"]]
+    slot_pattern = TIME_RE.pattern if readiness.get("slot_pattern", True) else None
+    selector = readiness.get("selector")
+    if not (selector or texts or slot_pattern):
+        return None
+    return {
+        "selector": selector,
+        "texts": texts,
+        "slotPattern": slot_pattern,
+        "blocked": list(BLOCKED_SUBSTRINGS),
+    }
+
+
+# Keyword arguments for page.wait_for_function(READY_JS, ...), or None when
+# no predicate is configured.
+def readiness_wait(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    arg = readiness_arg(config)
+    if arg is None:
+        return None
+    return {
+        "arg": arg,
+        "timeout": config["limits"]["selector_timeout_ms"],
+        "polling": (config["matchers"].get("readiness") or {}).get("poll_ms", 250),
+    }
+
+
+# networkidle timeout: the whole selector timeout when nothing else was
+# awaited, the shorter fallback once the predicates timed out.
+def idle_timeout(config: Dict[str, Any], predicates_timed_out: bool) -> int:
+    limits = config["limits"]
+    if predicates_timed_out:
+        return limits.get("network_idle_fallback_ms", 2000)
+    return limits["selector_timeout_ms"]
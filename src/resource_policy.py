@@ -0,0 +1,117 @@
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_BLOCK_TYPES = ["image", "font", "media"]
+
+DEFAULT_BLOCK_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "matomo.cloud",
+    "etracker.com",
+]
+
+
+def _host_matches(host: str, patterns: Iterable[str]) -> bool:
+    for pattern in patterns:
+        pattern = pattern.lower().lstrip(".")
+        if host == pattern or host.endswith("." + pattern):
+            return True
+    return False
+
+
+def _site(host: str) -> str:
+    labels = host.split(".")
+    return ".".join(labels[-2:]) if len(labels) >= 2 else host
+
+
+# Decides per request whether to abort it. Order: allow_hosts always load,
+# then block_hosts, then third-party blocking, then resource types (either an
+# allow-list via allow_types or a deny-list via block_types).
+class ResourcePolicy:
+    def __init__(
+        self,
+        first_party_host: str,
+        block_types: Optional[List[str]] = None,
+        allow_types: Optional[List[str]] = None,
+        block_hosts: Optional[List[str]] = None,
+        allow_hosts: Optional[List[str]] = None,
+        block_third_party: bool = False,
+    ):
+        self.first_party_site = _site(first_party_host.lower())
+        self.block_types = set(DEFAULT_BLOCK_TYPES if block_types is None else block_types)
+        self.allow_types = set(allow_types or [])
+        self.block_hosts = list(DEFAULT_BLOCK_HOSTS if block_hosts is None else block_hosts)
+        self.allow_hosts = list(allow_hosts or [])
+        self.block_third_party = block_third_party
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResourcePolicy":
+        policy_cfg = config["runtime"].get("resource_policy") or {}
+        return cls(
+            urlsplit(config["target"]["url"]).hostname or "",
+            block_types=policy_cfg.get("block_types"),
+            allow_types=policy_cfg.get("allow_types"),
+            block_hosts=policy_cfg.get("block_hosts"),
+            allow_hosts=policy_cfg.get("allow_hosts"),
+            block_third_party=bool(policy_cfg.get("block_third_party", False)),
+        )
+
+    def block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        if resource_type == "document":
+            return None
+        host = (urlsplit(url).hostname or "").lower()
+        if not host:
+            return None
+        if _host_matches(host, self.allow_hosts):
+            return None
+        if _host_matches(host, self.block_hosts):
+            return "host"
+        if self.block_third_party and _site(host) != self.first_party_site:
+            return "third_party"
+        if self.allow_types:
+            return None if resource_type in self.allow_types else "type"
+        if resource_type in self.block_types:
+            return "type"
+        return None
+
+
+# Per-check request accounting, reported as evidence["network"]. Bytes come
+# from Content-Length, so chunked responses are counted in unknown_size.
+class RequestStats:
+    def __init__(self, policy: ResourcePolicy):
+        self.policy = policy
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_by: Dict[str, int] = {}
+        self.responses = 0
+        self.bytes = 0
+        self.unknown_size = 0
+
+    def on_request(self, resource_type: str, url: str) -> Optional[str]:
+        self.requests += 1
+        reason = self.policy.block_reason(resource_type, url)
+        if reason:
+            self.blocked += 1
+            self.blocked_by[reason] = self.blocked_by.get(reason, 0) + 1
+        return reason
+
+    def on_response(self, headers: Dict[str, str]) -> None:
+        self.responses += 1
+        length = headers.get("content-length")
+        if length is None or not length.isdigit():
+            self.unknown_size += 1
+            return
+        self.bytes += int(length)
+
+    def as_evidence(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "blocked_by": dict(sorted(self.blocked_by.items())),
+            "responses": self.responses,
+            "bytes": self.bytes,
+            "unknown_size": self.unknown_size,
+        }
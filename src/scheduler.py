@@ -1,139 +1,529 @@
+import asyncio
 import logging
-import time
+import math
+import signal
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
-
-from .checker_endpoint import check_with_endpoint
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import store_async
+from .adaptive import AdaptivePlanner
+from .browser import AsyncBrowserSession, BrowserSession
+from .checker_async import run_once_async
+from .checker_endpoint import EndpointCache, check_with_endpoint
+from .checker_http import HttpPool, HttpPrecheck, check_with_http
 from .checker_playwright import check_with_playwright
-from .notifier_email import send_notification
+from .config import resolve_targets
+from .control import Controller, control_settings, serve_control
+from .coordination import Coordinator
+from .metrics import (
+    disable_metrics,
+    metrics_settings,
+    observe_check,
+    serve_metrics,
+    set_gauge,
+    timed,
+)
+from .notifier_email import render_notification
+from .outbox import drain_outbox, start_outbox, wake_outbox
+from .rate_limit import Limiter, make_limiter
 from .store import (
-    count_checks_since,
-    get_state,
+    close_stores,
+    compact_checks,
     init_db,
-    insert_check,
-    oldest_check_since,
+    load_state,
+    record_check,
     serialize_evidence,
     serialize_slots,
-    set_state,
+    to_epoch,
 )
+from .tracing import annotate, span, start_trace, write_trace
 from .util import hash_json, iso_now, jittered_interval, normalize_slots
 
 logger = logging.getLogger(__name__)
 
+# Evidence keys that differ on every check (timings, counters) and must not
+# feed into result_hash, otherwise every check would look like a change.
+VOLATILE_EVIDENCE_KEYS = {
+    "timings",
+    "browser",
+    "precheck",
+    "network",
+    "readiness",
+    "endpoint",
+    "matches",
+    # Pages crawled/failed vary with pagination timeouts; the slots say what
+    # the crawl found.
+    "crawl",
+}
+
+STATE_KEYS = (
+    "last_status",
+    "last_hash",
+    "last_notified_hash",
+    "consecutive_failures",
+    "blocked_until",
+)
+
 
-def run_once(config: Dict[str, Any]) -> Dict[str, Any]:
+# Mode "http" only uses the pre-check with a precheck cache that outlives the
+# call: a fresh one has no validators or result to reuse, so the extra GET
+# could never save the render (one-shot check-once and cron runs).
+def run_once(
+    config: Dict[str, Any],
+    session: Optional[BrowserSession] = None,
+    precheck: Optional[HttpPrecheck] = None,
+    endpoints: Optional[EndpointCache] = None,
+) -> Dict[str, Any]:
     mode = config["target"].get("mode", "playwright")
     if mode == "endpoint":
         try:
-            return check_with_endpoint(config)
+            return check_with_endpoint(config, endpoints, session)
         except Exception as exc:
             logger.warning("Endpoint checker failed, falling back to Playwright: %s", exc)
-    return check_with_playwright(config)
+    if mode == "http" and precheck is not None:
+        try:
+            with span("precheck"):
+                result = check_with_http(config, precheck)
+            if result is not None:
+                return result
+        except Exception as exc:
+            logger.warning("HTTP pre-check failed, falling back to Playwright: %s", exc)
+        result = check_with_playwright(config, session)
+        precheck.remember(config, result)
+        return result
+    return check_with_playwright(config, session)
+
+
+def _result_hash(result: Dict[str, Any]) -> str:
+    evidence = {
+        key: value
+        for key, value in (result.get("evidence") or {}).items()
+        if key not in VOLATILE_EVIDENCE_KEYS
+    }
+    hash_payload = {
+        "status": result["status"],
+        "slots": result["slots"],
+        "evidence": evidence,
+    }
+    return hash_json(hash_payload)
+
 
-def run_once_and_store(config: Dict[str, Any]) -> Dict[str, Any]:
+def run_once_and_store(
+    config: Dict[str, Any],
+    limiter: Optional[Limiter] = None,
+) -> Dict[str, Any]:
     storage_cfg = config["storage"]
     init_db(storage_cfg)
 
-    blocked_until = get_state(storage_cfg, "blocked_until")
-    if blocked_until:
-        try:
-            until_dt = datetime.fromisoformat(blocked_until)
-        except ValueError:
-            until_dt = None
-        if until_dt and datetime.now(timezone.utc) < until_dt:
-            blocked_payload = {
-                "status": "blocked",
-                "slots": [],
-                "evidence": {
-                    "url": config["target"]["url"],
-                    "blocked_until": blocked_until,
-                    "cooldown_active": True,
-                },
-            }
-            result = {
-                "status": "blocked",
-                "slots": [],
-                "checked_at": iso_now(),
-                "evidence": blocked_payload["evidence"],
-            }
-            result_hash = hash_json(blocked_payload)
-            insert_check(
-                storage_cfg,
-                result["checked_at"],
-                result["status"],
-                serialize_slots([]),
-                result_hash,
-                serialize_evidence(result["evidence"]),
-                None,
-            )
-            _handle_state_and_notifications(config, storage_cfg, result, result_hash)
-            return result
+    cooldown_result = _record_cooldown(config, storage_cfg)
+    if cooldown_result:
+        return cooldown_result
 
-    result = run_once(config)
-    normalized_slots = normalize_slots(result.get("slots") or [])
-    result["slots"] = normalized_slots
+    limiter = limiter or make_limiter(config, storage_cfg)
+    wait_seconds = limiter.reserve()
+    if wait_seconds > 0:
+        return _rate_limited_result(config, wait_seconds)
 
-    hash_payload = {
-        "status": result["status"],
-        "slots": normalized_slots,
-        "evidence": result.get("evidence", {}),
-    }
-    result_hash = hash_json(hash_payload)
-
-    insert_check(
-        storage_cfg,
-        result["checked_at"],
-        result["status"],
-        serialize_slots(normalized_slots),
-        result_hash,
-        serialize_evidence(result.get("evidence", {})),
-        result.get("error"),
-    )
-    _handle_state_and_notifications(config, storage_cfg, result, result_hash)
+    with start_trace(config, _target_name(config)) as trace:
+        result = run_once(config)
+        annotate(status=result["status"], slots=len(result.get("slots") or []))
+        _record_result(config, storage_cfg, result)
+    if trace is not None:
+        write_trace(trace)
+    drain_outbox(config)
+    return result
+
+
+def _record_cooldown(
+    config: Dict[str, Any],
+    storage_cfg: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    state = load_state(storage_cfg, STATE_KEYS)
+    cooldown = _cooldown_result(config, state)
+    if cooldown is None:
+        return None
+    result, result_hash = cooldown
+    _store_check(config, storage_cfg, result, result_hash, state)
+    return result
+
+
+async def _record_cooldown_async(
+    config: Dict[str, Any],
+    storage_cfg: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    state = await store_async.load_state(storage_cfg, STATE_KEYS)
+    cooldown = _cooldown_result(config, state)
+    if cooldown is None:
+        return None
+    result, result_hash = cooldown
+    await _store_check_async(config, storage_cfg, result, result_hash, state)
     return result
 
+
+# The blocked result (and its hash) while blocked_until lies in the future.
+def _cooldown_result(
+    config: Dict[str, Any],
+    state: Dict[str, str],
+) -> Optional[Tuple[Dict[str, Any], str]]:
+    blocked_until = state.get("blocked_until")
+    if not blocked_until:
+        return None
+    try:
+        until_dt = datetime.fromisoformat(blocked_until)
+    except ValueError:
+        return None
+    if datetime.now(timezone.utc) >= until_dt:
+        return None
+    blocked_payload = {
+        "status": "blocked",
+        "slots": [],
+        "evidence": {
+            "url": config["target"]["url"],
+            "blocked_until": blocked_until,
+            "cooldown_active": True,
+        },
+    }
+    result = {
+        "status": "blocked",
+        "slots": [],
+        "checked_at": iso_now(),
+        "evidence": blocked_payload["evidence"],
+    }
+    return result, hash_json(blocked_payload)
+
+
+def run_targets_once(config: Dict[str, Any], store: bool) -> List[Dict[str, Any]]:
+    targets = resolve_targets(config)
+    limiter = None
+    if store:
+        init_db(config["storage"])
+        limiter = make_limiter(config, config["storage"])
+    results = asyncio.run(_run_targets_once_async(targets, limiter))
+    if store:
+        drain_outbox(config)
+    return results
+
+
 def run_loop(config: Dict[str, Any]) -> None:
+    init_db(config["storage"])
+    asyncio.run(run_loop_async(config))
+
+
+# Every target runs its own schedule as an asyncio task. Checks share one
+# browser, and at most runtime.max_concurrent_checks of them run at a time,
+# so a slow page.goto for one target only occupies one slot. All waits go
+# through the Controller, so SIGTERM/SIGINT (or the control endpoint) can
+# trigger, pause or drain targets at any time; a drain lets in-flight checks
+# finish and record their result before the process exits.
+async def run_loop_async(config: Dict[str, Any]) -> None:
+    targets = resolve_targets(config)
+    controller = Controller([_target_name(target) for target in targets])
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, controller.drain)
+    session = AsyncBrowserSession(config["runtime"])
+    pool = HttpPool()
+    precheck = HttpPrecheck(pool)
+    endpoints = EndpointCache(pool)
+    semaphore = asyncio.Semaphore(_max_concurrency(config))
+    coordinator = await asyncio.to_thread(_start_coordinator, config)
+    outbox = start_outbox(config)
+    worker_id = coordinator and coordinator.worker_id
+    limiter = await asyncio.to_thread(make_limiter, config, config["storage"], worker_id)
+    control_cfg = control_settings(config)
+    server = await serve_control(controller, control_cfg) if control_cfg.get("enabled") else None
+    metrics_cfg = metrics_settings(config)
+    metrics_server = await serve_metrics(metrics_cfg) if metrics_cfg.get("enabled") else None
+    try:
+        await asyncio.gather(
+            _compaction_loop(config["storage"], controller, coordinator),
+            *(
+                _target_loop(target, session, precheck, endpoints, semaphore, limiter, controller, coordinator)
+                for target in targets
+            ),
+        )
+    finally:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(signum)
+        for endpoint in (server, metrics_server):
+            if endpoint is not None:
+                endpoint.close()
+                await endpoint.wait_closed()
+        disable_metrics()
+        await session.close()
+        pool.close()
+        await store_async.close_async_stores()
+        await asyncio.to_thread(outbox.stop)
+        if coordinator:
+            await asyncio.to_thread(coordinator.stop)
+        close_stores()
+        logger.info("Scheduler stopped")
+
+
+def _start_coordinator(config: Dict[str, Any]) -> Optional[Coordinator]:
+    coordinator = Coordinator.from_config(config)
+    if coordinator:
+        coordinator.start()
+    return coordinator
+
+
+def _target_name(config: Dict[str, Any]) -> str:
+    return config["target"].get("name") or "default"
+
+
+async def _target_loop(
+    config: Dict[str, Any],
+    session: AsyncBrowserSession,
+    precheck: HttpPrecheck,
+    endpoints: EndpointCache,
+    semaphore: asyncio.Semaphore,
+    limiter: Limiter,
+    controller: Controller,
+    coordinator: Optional[Coordinator] = None,
+) -> None:
     storage_cfg = config["storage"]
-    init_db(storage_cfg)
+    name = _target_name(config)
+    control = controller.targets[name]
+    planner = AdaptivePlanner.from_config(config)
+    while await controller.wait_while_paused(control):
+        if coordinator and not await asyncio.to_thread(coordinator.owns, config["target"].get("name")):
+            await controller.sleep(control, coordinator.heartbeat_seconds, "standby", interruptible=False)
+            continue
+
+        blocked_until = await store_async.get_state(storage_cfg, "blocked_until")
+        wait_seconds = _seconds_until(blocked_until)
+        set_gauge("daa_blocked_until_timestamp_seconds", to_epoch(blocked_until) if wait_seconds else 0, name)
+        if wait_seconds > 0:
+            logger.warning("[%s] Blocked, sleeping for %s seconds", name, wait_seconds)
+            await controller.sleep(control, wait_seconds, "blocked", interruptible=False)
+            continue
+
+        wait_seconds = await asyncio.to_thread(limiter.reserve)
+        if wait_seconds > 0:
+            logger.warning("[%s] Rate limit reached, sleeping for %.0f seconds", name, wait_seconds)
+            await controller.sleep(control, wait_seconds, "rate_limited", interruptible=False)
+            continue
+
+        if control.triggered:
+            logger.info("[%s] Check triggered", name)
+        control.triggered = False
+        control.state = "checking"
+        with start_trace(config, name) as trace:
+            result = await _check_and_record(config, name, session, precheck, endpoints, semaphore)
+        if trace is not None:
+            await asyncio.to_thread(write_trace, trace)
+        control.last_status = result["status"]
+        control.last_checked_at = result.get("checked_at")
+
+        if planner:
+            await asyncio.to_thread(planner.refresh_if_due)
+        failures = await store_async.get_state(storage_cfg, "consecutive_failures")
+        delay = _next_delay(config, result, failures, planner)
+        set_gauge("daa_consecutive_failures", int(failures or 0), name)
+        set_gauge("daa_next_check_delay_seconds", delay, name)
+        logger.info(
+            "[%s] %s in %s ms, sleeping for %s seconds",
+            name,
+            result["status"],
+            (result.get("evidence") or {}).get("timings", {}).get("check_ms"),
+            delay,
+        )
+        await controller.sleep(control, delay, "waiting")
+
+
+# Runs one check under the concurrency limit and records it. A trace of the
+# check covers all of it, including the wait for a free slot.
+async def _check_and_record(
+    config: Dict[str, Any],
+    name: str,
+    session: AsyncBrowserSession,
+    precheck: Optional[HttpPrecheck],
+    endpoints: EndpointCache,
+    semaphore: asyncio.Semaphore,
+    store: bool = True,
+) -> Dict[str, Any]:
+    with span("queued"):
+        await semaphore.acquire()
+    try:
+        with timed("check", name):
+            result = await run_once_async(config, session, precheck, endpoints)
+    finally:
+        semaphore.release()
+    annotate(status=result["status"], slots=len(result.get("slots") or []))
+    observe_check(result, name)
+    if store:
+        await _record_result_async(config, config["storage"], result)
+    return result
+
 
+# With a limiter the results are stored; without one (check-once without
+# --store) nothing touches the database.
+async def _run_targets_once_async(
+    targets: List[Dict[str, Any]],
+    limiter: Optional[Limiter],
+) -> List[Dict[str, Any]]:
+    session = AsyncBrowserSession(targets[0]["runtime"])
+    pool = HttpPool()
+    endpoints = EndpointCache(pool)
+    semaphore = asyncio.Semaphore(_max_concurrency(targets[0]))
+
+    async def check(config: Dict[str, Any]) -> Dict[str, Any]:
+        if limiter:
+            cooldown_result = await _record_cooldown_async(config, config["storage"])
+            if cooldown_result:
+                return cooldown_result
+            wait_seconds = await asyncio.to_thread(limiter.reserve)
+            if wait_seconds > 0:
+                return _rate_limited_result(config, wait_seconds)
+        name = _target_name(config)
+        with start_trace(config, name) as trace:
+            # No HTTP pre-check: its cache would not outlive this invocation.
+            result = await _check_and_record(
+                config, name, session, None, endpoints, semaphore, store=limiter is not None
+            )
+        if trace is not None:
+            await asyncio.to_thread(write_trace, trace)
+        return result
+
+    try:
+        return await asyncio.gather(*(check(target) for target in targets))
+    finally:
+        await session.close()
+        pool.close()
+        await store_async.close_async_stores()
+
+
+# With replicas only the leader compacts; the others retry at the next
+# interval in case leadership moved to them.
+async def _compaction_loop(
+    storage_cfg: Dict[str, Any],
+    controller: Controller,
+    coordinator: Optional[Coordinator] = None,
+) -> None:
+    interval = _compact_interval_seconds(storage_cfg)
+    if not interval:
+        return
     while True:
-        _maybe_sleep_for_block(storage_cfg)
-        _enforce_rate_limit(config, storage_cfg)
+        if not coordinator or await asyncio.to_thread(coordinator.is_leader):
+            await asyncio.to_thread(_safe_compact, storage_cfg)
+        if not await controller.wait_drain(interval):
+            return
 
-        result = run_once(config)
-        normalized_slots = normalize_slots(result.get("slots") or [])
-        result["slots"] = normalized_slots
-
-        hash_payload = {
-            "status": result["status"],
-            "slots": normalized_slots,
-            "evidence": result.get("evidence", {}),
-        }
-        result_hash = hash_json(hash_payload)
-
-        insert_check(
-            storage_cfg,
-            result["checked_at"],
-            result["status"],
-            serialize_slots(normalized_slots),
-            result_hash,
-            serialize_evidence(result.get("evidence", {})),
-            result.get("error"),
+
+def _compact_interval_seconds(storage_cfg: Dict[str, Any]) -> float:
+    retention = storage_cfg.get("retention") or {}
+    return float(retention.get("compact_interval_hours") or 0) * 3600
+
+
+def _safe_compact(storage_cfg: Dict[str, Any]) -> None:
+    try:
+        stats = compact_checks(storage_cfg)
+    except Exception as exc:
+        logger.error("Failed to compact check history: %s", exc)
+        return
+    if stats["checks_compacted"] or stats["spans_deleted"]:
+        logger.info("Compacted check history: %s", stats)
+
+
+def _max_concurrency(config: Dict[str, Any]) -> int:
+    return max(1, int(config["runtime"].get("max_concurrent_checks") or 1))
+
+
+def _record_result(
+    config: Dict[str, Any],
+    storage_cfg: Dict[str, Any],
+    result: Dict[str, Any],
+) -> str:
+    normalized_slots = normalize_slots(result.get("slots") or [])
+    result["slots"] = normalized_slots
+    result_hash = _result_hash(result)
+    _store_check(config, storage_cfg, result, result_hash)
+    return result_hash
+
+
+async def _record_result_async(
+    config: Dict[str, Any],
+    storage_cfg: Dict[str, Any],
+    result: Dict[str, Any],
+) -> str:
+    result["slots"] = normalize_slots(result.get("slots") or [])
+    result_hash = _result_hash(result)
+    await _store_check_async(config, storage_cfg, result, result_hash)
+    return result_hash
+
+
+# Post-check bookkeeping costs one state read and one transaction (check row
+# plus a single multi-row upsert of the changed keys), instead of an insert,
+# three reads and up to five writes that each committed on their own.
+def _store_check(
+    config: Dict[str, Any],
+    storage_cfg: Dict[str, Any],
+    result: Dict[str, Any],
+    result_hash: str,
+    state: Optional[Dict[str, str]] = None,
+) -> None:
+    if state is None:
+        with span("load_state"):
+            state = load_state(storage_cfg, STATE_KEYS)
+    with span("notify") as notify:
+        changes, messages = _handle_state_and_notifications(config, state, result, result_hash)
+        notify.attrs["queued"] = len(messages)
+    with span("persist"):
+        record_check(storage_cfg, state=changes, outbox=messages, **_check_fields(config, result, result_hash))
+
+
+# Same as _store_check on the async store, where concurrent targets share
+# group commits.
+async def _store_check_async(
+    config: Dict[str, Any],
+    storage_cfg: Dict[str, Any],
+    result: Dict[str, Any],
+    result_hash: str,
+    state: Optional[Dict[str, str]] = None,
+) -> None:
+    name = _target_name(config)
+    if state is None:
+        with timed("load_state", name), span("load_state"):
+            state = await store_async.load_state(storage_cfg, STATE_KEYS)
+    with span("notify") as notify:
+        changes, messages = _handle_state_and_notifications(config, state, result, result_hash)
+        notify.attrs["queued"] = len(messages)
+    with timed("persist", name), span("persist"):
+        await store_async.record_check(
+            storage_cfg, state=changes, outbox=messages, **_check_fields(config, result, result_hash)
         )
+    if messages:
+        wake_outbox()
 
-        _handle_state_and_notifications(config, storage_cfg, result, result_hash)
 
-        delay = _compute_next_delay(config, storage_cfg, result)
-        logger.info("Sleeping for %s seconds", delay)
-        time.sleep(delay)
+def _check_fields(config: Dict[str, Any], result: Dict[str, Any], result_hash: str) -> Dict[str, Any]:
+    return {
+        "checked_at": result["checked_at"],
+        "status": result["status"],
+        "slots_json": serialize_slots(result["slots"]),
+        "result_hash": result_hash,
+        "evidence_json": serialize_evidence(result.get("evidence", {})),
+        "error": result.get("error"),
+        "target": config["target"].get("name"),
+        "duration_ms": (result.get("evidence") or {}).get("timings", {}).get("check_ms"),
+    }
 
 
-def _compute_next_delay(config: Dict[str, Any], storage_cfg: Dict[str, Any], result: Dict[str, Any]) -> int:
+# With schedule.adaptive the base interval comes from the planner (hot windows
+# shorter, cold ones longer); failure backoff applies on top either way.
+def _next_delay(
+    config: Dict[str, Any],
+    result: Dict[str, Any],
+    consecutive_failures: Optional[str],
+    planner: Optional[AdaptivePlanner] = None,
+) -> int:
     schedule = config["schedule"]
     limits = config["limits"]
-    base_interval = jittered_interval(schedule["interval_seconds"], schedule["jitter_percent"])
+    base_interval = planner.next_delay() if planner else None
+    if base_interval is None:
+        base_interval = jittered_interval(schedule["interval_seconds"], schedule["jitter_percent"])
 
-    failures = int(get_state(storage_cfg, "consecutive_failures") or 0)
+    failures = int(consecutive_failures or 0)
     if result["status"] in {"error", "blocked"} and failures:
         backoff = limits["backoff_base_seconds"] * (2 ** max(failures - 1, 0))
         backoff = min(backoff, limits["max_backoff_seconds"])
@@ -142,92 +532,78 @@ def _compute_next_delay(config: Dict[str, Any], storage_cfg: Dict[str, Any], res
     return base_interval
 
 
-def _maybe_sleep_for_block(storage_cfg: Dict[str, Any]) -> None:
-    blocked_until = get_state(storage_cfg, "blocked_until")
+def _seconds_until(blocked_until: Optional[str]) -> int:
     if not blocked_until:
-        return
+        return 0
     try:
         until_dt = datetime.fromisoformat(blocked_until)
     except ValueError:
-        return
+        return 0
     now = datetime.now(timezone.utc)
     if now < until_dt:
-        sleep_seconds = int((until_dt - now).total_seconds())
-        logger.warning("Blocked until %s, sleeping for %s seconds", blocked_until, sleep_seconds)
-        time.sleep(max(1, sleep_seconds))
-
-
-def _enforce_rate_limit(config: Dict[str, Any], storage_cfg: Dict[str, Any]) -> None:
-    max_checks = config["limits"]["max_checks_per_hour"]
-    if not max_checks:
-        return
-    now = datetime.now(timezone.utc)
-    window_start = now - timedelta(hours=1)
-    window_start_iso = window_start.isoformat()
-
-    recent = count_checks_since(storage_cfg, window_start_iso)
-    if recent < max_checks:
-        return
-
-    oldest = oldest_check_since(storage_cfg, window_start_iso)
-    if not oldest:
-        return
-    oldest_dt = datetime.fromisoformat(oldest)
-    sleep_until = oldest_dt + timedelta(hours=1)
-    sleep_seconds = int((sleep_until - now).total_seconds())
-    if sleep_seconds > 0:
-        logger.warning("Rate limit reached, sleeping for %s seconds", sleep_seconds)
-        time.sleep(sleep_seconds)
+        return max(1, int((until_dt - now).total_seconds()))
+    return 0
+
+
+# Returned (not stored) when a one-shot check would exceed
+# limits.max_checks_per_hour, e.g. a cron schedule tighter than the limit.
+def _rate_limited_result(config: Dict[str, Any], wait_seconds: float) -> Dict[str, Any]:
+    return {
+        "status": "rate_limited",
+        "slots": [],
+        "checked_at": iso_now(),
+        "evidence": {
+            "url": config["target"]["url"],
+            "retry_after_seconds": math.ceil(wait_seconds),
+        },
+    }
 
 
+# Decides notifications from the loaded state and returns the state keys whose
+# value changes plus the rendered notifications. The caller commits both with
+# the check (the notifications into the outbox), so an alert is never lost
+# or queued twice, and no SMTP happens on the check path.
 def _handle_state_and_notifications(
     config: Dict[str, Any],
-    storage_cfg: Dict[str, Any],
+    state: Dict[str, str],
     result: Dict[str, Any],
     result_hash: str,
-) -> None:
+) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
     status = result["status"]
-    last_status = get_state(storage_cfg, "last_status")
-    last_hash = get_state(storage_cfg, "last_hash")
-    last_notified_hash = get_state(storage_cfg, "last_notified_hash")
+    last_status = state.get("last_status")
+    last_notified_hash = state.get("last_notified_hash")
+    updates: Dict[str, str] = {}
+    messages: List[Tuple[str, str]] = []
 
     if status in {"error", "blocked"}:
-        failures = int(get_state(storage_cfg, "consecutive_failures") or 0) + 1
-        set_state(storage_cfg, "consecutive_failures", str(failures))
+        failures = int(state.get("consecutive_failures") or 0) + 1
+        updates["consecutive_failures"] = str(failures)
         if status == "blocked":
             cooldown_hours = config["limits"]["blocked_cooldown_hours"]
             blocked_until = datetime.now(timezone.utc) + timedelta(hours=cooldown_hours)
-            set_state(storage_cfg, "blocked_until", blocked_until.isoformat())
+            updates["blocked_until"] = blocked_until.isoformat()
             if last_status != "blocked":
-                _safe_notify(config, result)
-        set_state(storage_cfg, "last_status", status)
-        set_state(storage_cfg, "last_hash", result_hash)
-        return
-
-    set_state(storage_cfg, "consecutive_failures", "0")
-    set_state(storage_cfg, "blocked_until", "")
-
-    notify_cfg = config["notify"]
-    should_notify = False
-
-    if status == "available" and notify_cfg.get("on_available", True):
-        if last_status != "available":
-            should_notify = True
-
-    if status == "available" and notify_cfg.get("on_change"):
-        if last_notified_hash != result_hash:
-            should_notify = True
-
-    if should_notify:
-        _safe_notify(config, result)
-        set_state(storage_cfg, "last_notified_hash", result_hash)
-
-    set_state(storage_cfg, "last_status", status)
-    set_state(storage_cfg, "last_hash", result_hash)
-
-
-def _safe_notify(config: Dict[str, Any], result: Dict[str, Any]) -> None:
-    try:
-        send_notification(config, result)
-    except Exception as exc:
-        logger.error("Failed to send email: %s", exc)
+                messages.append(render_notification(config, result))
+    else:
+        updates["consecutive_failures"] = "0"
+        updates["blocked_until"] = ""
+
+        notify_cfg = config["notify"]
+        should_notify = False
+
+        if status == "available" and notify_cfg.get("on_available", True):
+            if last_status != "available":
+                should_notify = True
+
+        if status == "available" and notify_cfg.get("on_change"):
+            if last_notified_hash != result_hash:
+                should_notify = True
+
+        if should_notify:
+            messages.append(render_notification(config, result))
+            updates["last_notified_hash"] = result_hash
+
+    updates["last_status"] = status
+    updates["last_hash"] = result_hash
+    changes = {key: value for key, value in updates.items() if state.get(key) != value}
+    return changes, messages
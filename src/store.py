@@ -1,14 +1,22 @@
+import atexit
 import json
+import logging
 import os
 import sqlite3
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .util import iso_now
 
 try:
     import psycopg
 except Exception:  # pragma: no cover - optional dependency
     psycopg = None
 
+logger = logging.getLogger(__name__)
 
 SQLITE_SCHEMA = """
 CREATE TABLE IF NOT EXISTS checks (
@@ -43,6 +51,70 @@ CREATE TABLE IF NOT EXISTS state (
 """
 
 
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description TEXT,
+    applied_at TEXT
+)
+"""
+
+INSERT_CHECK_SQL = """
+INSERT INTO checks (
+    checked_at, checked_at_epoch, target, duration_ms, status, slots_json, result_hash, evidence_json, error
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_OUTBOX_SQL = """
+INSERT INTO outbox (created_at, created_at_epoch, target, subject, body, status, attempts, next_attempt_epoch)
+VALUES (?, ?, ?, ?, ?, 'pending', 0, ?)
+"""
+
+DEFAULT_RETENTION: Dict[str, Any] = {
+    # Raw check rows younger than this stay in checks (the rate limiter reads
+    # the last hour); older ones are collapsed into check_spans.
+    "raw_hours": 48,
+    # Spans that ended longer ago than this are deleted; 0 keeps them forever.
+    "span_days": 365,
+    # How often run compacts on its own; 0 leaves it to the compact command.
+    "compact_interval_hours": 6,
+}
+
+SPAN_COLUMNS = (
+    "target, status, result_hash, slots_json, evidence_json, error, "
+    "first_seen, last_seen, first_seen_epoch, last_seen_epoch, check_count"
+)
+
+SLOT_COLUMNS = (
+    "target, slot_date, slot_time, first_seen, last_seen, "
+    "first_seen_epoch, last_seen_epoch, appearances, is_open"
+)
+
+OPEN_SLOTS_SQL = "SELECT slot_date, slot_time FROM slots WHERE target = ? AND is_open = 1"
+
+# Only these results say which slots exist; an error or block page lists none
+# but must not close the slots seen before it.
+SLOT_TRACKED_STATUSES = ("available", "unavailable")
+
+# Serialises concurrent migrators on Postgres (pg_advisory_xact_lock key).
+MIGRATION_LOCK_ID = 720419
+# Serialises rate budget reservations of all replicas on Postgres; SQLite
+# gets the same from BEGIN IMMEDIATE.
+RATE_LOCK_ID = 720420
+RATE_WINDOW_SECONDS = 3600
+BACKFILL_BATCH_SIZE = 5000
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+)
+
+_stores: Dict[Tuple[Optional[str], Optional[str]], "Store"] = {}
+_stores_lock = threading.Lock()
+
+
 def _get_db_url(storage: Dict[str, Any]) -> Optional[str]:
     env_key = storage.get("postgres_url_env")
     if not env_key:
@@ -50,144 +122,968 @@ def _get_db_url(storage: Dict[str, Any]) -> Optional[str]:
     return os.getenv(env_key)
 
 
-def _is_postgres(storage: Dict[str, Any]) -> bool:
-    return _get_db_url(storage) is not None
+# One multi-row upsert, valid for both SQLite (3.24+) and Postgres.
+def _upsert_state_sql(count: int) -> str:
+    values = ", ".join("(?, ?)" for _ in range(count))
+    return f"INSERT INTO state (key, value) VALUES {values} ON CONFLICT(key) DO UPDATE SET value=excluded.value"
 
 
-def _connect(storage: Dict[str, Any]):
-    db_url = _get_db_url(storage)
-    if db_url:
-        if psycopg is None:
-            raise RuntimeError("psycopg is required for Postgres support")
-        return psycopg.connect(db_url, autocommit=True)
+def _migrate_base(store: "Store", conn) -> None:
+    schema = POSTGRES_SCHEMA if store.is_postgres else SQLITE_SCHEMA
+    for statement in (stmt.strip() for stmt in schema.split(";")):
+        if statement:
+            conn.execute(statement)
 
-    sqlite_path = storage["sqlite_path"]
-    sqlite_dir = os.path.dirname(sqlite_path)
-    if sqlite_dir:
-        os.makedirs(sqlite_dir, exist_ok=True)
-    conn = sqlite3.connect(sqlite_path)
-    conn.row_factory = sqlite3.Row
-    return conn
 
+# checked_at stays as the ISO text it always was; checked_at_epoch is what the
+# rate limiter and history queries filter and sort on, since ISO strings with
+# different offsets do not compare chronologically.
+def _migrate_epoch_and_target(store: "Store", conn) -> None:
+    epoch_type = "BIGINT" if store.is_postgres else "INTEGER"
+    conn.execute(f"ALTER TABLE checks ADD COLUMN checked_at_epoch {epoch_type}")
+    conn.execute("ALTER TABLE checks ADD COLUMN target TEXT")
+    _backfill_checks(store, conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS checks_epoch_idx ON checks (checked_at_epoch)")
+    conn.execute("CREATE INDEX IF NOT EXISTS checks_target_epoch_idx ON checks (target, checked_at_epoch)")
 
-def init_db(storage: Dict[str, Any]) -> None:
-    conn = _connect(storage)
-    try:
-        if _is_postgres(storage):
-            statements = [stmt.strip() for stmt in POSTGRES_SCHEMA.split(";") if stmt.strip()]
-            for statement in statements:
-                conn.execute(statement)
-        else:
-            conn.executescript(SQLITE_SCHEMA)
-            conn.commit()
-    finally:
-        conn.close()
 
+def _backfill_checks(store: "Store", conn) -> None:
+    def values(checked_at: str, evidence: Dict[str, Any]) -> Tuple[Any, ...]:
+        return to_epoch(checked_at), evidence.get("target")
 
-def insert_check(
-    storage: Dict[str, Any],
+    _backfill_from_evidence(store, conn, ("checked_at_epoch", "target"), values)
+
+
+# Batched by id so memory stays flat; values(checked_at, evidence) returns the
+# new column values for one row.
+def _backfill_from_evidence(
+    store: "Store",
+    conn,
+    columns: Sequence[str],
+    values: Callable[[str, Dict[str, Any]], Tuple[Any, ...]],
+) -> None:
+    select = store._sql("SELECT id, checked_at, evidence_json FROM checks WHERE id > ? ORDER BY id LIMIT ?")
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    update = store._sql(f"UPDATE checks SET {assignments} WHERE id = ?")
+    last_id = 0
+    total = 0
+    while True:
+        rows = conn.execute(select, (last_id, BACKFILL_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, checked_at, evidence_json in rows:
+            try:
+                evidence = json.loads(evidence_json or "{}")
+            except ValueError:
+                evidence = {}
+            if not isinstance(evidence, dict):
+                evidence = {}
+            updates.append((*values(checked_at, evidence), row_id))
+        conn.cursor().executemany(update, updates)
+        last_id = rows[-1][0]
+        total += len(rows)
+    if total:
+        logger.info("Backfilled %s for %s checks", ", ".join(columns), total)
+
+
+def _migrate_check_spans(store: "Store", conn) -> None:
+    id_column = "BIGSERIAL PRIMARY KEY" if store.is_postgres else "INTEGER PRIMARY KEY"
+    epoch_type = "BIGINT" if store.is_postgres else "INTEGER"
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS check_spans (
+            id {id_column},
+            target TEXT,
+            status TEXT,
+            result_hash TEXT,
+            slots_json TEXT,
+            evidence_json TEXT,
+            error TEXT,
+            first_seen TEXT,
+            last_seen TEXT,
+            first_seen_epoch {epoch_type},
+            last_seen_epoch {epoch_type},
+            check_count INTEGER
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS check_spans_target_last_idx ON check_spans (target, last_seen_epoch)")
+
+
+def _migrate_slots(store: "Store", conn) -> None:
+    id_column = "BIGSERIAL PRIMARY KEY" if store.is_postgres else "INTEGER PRIMARY KEY"
+    epoch_type = "BIGINT" if store.is_postgres else "INTEGER"
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS slots (
+            id {id_column},
+            target TEXT NOT NULL,
+            slot_date TEXT NOT NULL,
+            slot_time TEXT NOT NULL,
+            first_seen TEXT,
+            last_seen TEXT,
+            first_seen_epoch {epoch_type},
+            last_seen_epoch {epoch_type},
+            appearances INTEGER NOT NULL,
+            is_open INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS slots_key_idx ON slots (target, slot_date, slot_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS slots_open_idx ON slots (target, is_open)")
+    conn.execute("CREATE INDEX IF NOT EXISTS slots_first_seen_idx ON slots (target, first_seen_epoch)")
+    _backfill_slots(store, conn)
+
+
+# Replays compacted spans and raw checks in time order per target, applying the
+# same set diff record_check does, so the table starts out with the history.
+def _backfill_slots(store: "Store", conn) -> None:
+    statuses = SLOT_TRACKED_STATUSES
+    rows = conn.execute(
+        store._sql(
+            "SELECT COALESCE(target, ''), first_seen, last_seen, first_seen_epoch, last_seen_epoch, slots_json "
+            "FROM check_spans WHERE status IN (?, ?) "
+            "UNION ALL "
+            "SELECT COALESCE(target, ''), checked_at, checked_at, checked_at_epoch, checked_at_epoch, slots_json "
+            "FROM checks WHERE status IN (?, ?) AND checked_at_epoch IS NOT NULL "
+            "ORDER BY 1, 4"
+        ),
+        statuses + statuses,
+    )
+    slots: Dict[Tuple[str, str, str], List[Any]] = {}
+    open_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+    for target, first_seen, last_seen, first_epoch, last_epoch, slots_json in _iter_rows(rows):
+        current = {(target, date, time_) for date, time_ in _slot_pairs(slots_json)}
+        previous = open_keys.get(target, set())
+        for key in current - previous:
+            if key in slots:
+                slot = slots[key]
+                slot[4] += 1
+            else:
+                slot = slots[key] = [first_seen, last_seen, first_epoch, last_epoch, 1]
+        for key in current:
+            slots[key][1], slots[key][3] = last_seen, last_epoch
+        open_keys[target] = current
+    if not slots:
+        return
+    is_open = set().union(*open_keys.values())
+    conn.cursor().executemany(
+        store._sql(
+            f"INSERT INTO slots ({SLOT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        ),
+        [(*key, *values, int(key in is_open)) for key, values in slots.items()],
+    )
+    logger.info("Backfilled %s slots", len(slots))
+
+
+# Row for INSERT_CHECK_SQL, in its column order.
+def _check_row(
     checked_at: str,
     status: str,
     slots_json: str,
     result_hash: str,
     evidence_json: str,
     error: Optional[str],
-) -> None:
-    conn = _connect(storage)
+    target: Optional[str] = None,
+    duration_ms: Optional[int] = None,
+) -> Tuple[Any, ...]:
+    return (
+        checked_at, to_epoch(checked_at), target, duration_ms,
+        status, slots_json, result_hash, evidence_json, error,
+    )
+
+
+# Rows for INSERT_OUTBOX_SQL, due at once.
+def _outbox_rows(
+    checked_at: str,
+    target: Optional[str],
+    messages: Sequence[Tuple[str, str]],
+) -> List[Tuple[Any, ...]]:
+    epoch = to_epoch(checked_at)
+    return [(checked_at, epoch, target, subject, body, epoch) for subject, body in messages]
+
+
+# (target, checked_at, epoch) for slot tracking, with epoch None when the check
+# row says nothing about which slots exist.
+def _slot_context(row: Tuple[Any, ...]) -> Tuple[str, str, Optional[int]]:
+    checked_at, checked_epoch, target, _, status = row[:5]
+    if status not in SLOT_TRACKED_STATUSES:
+        checked_epoch = None
+    return target or "", checked_at, checked_epoch
+
+
+def _state_params(state: Dict[str, str]) -> List[str]:
+    return [item for pair in state.items() for item in pair]
+
+
+# Writes of record_check ahead of slot tracking, as (query, rows) pairs for
+# executemany: the check row, one upsert of the changed state keys and the
+# queued notifications. Shared by Store and the async stores.
+def _check_statements(
+    row: Tuple[Any, ...],
+    state: Dict[str, str],
+    outbox: Sequence[Tuple[Any, ...]] = (),
+) -> List[Tuple[str, List[Tuple[Any, ...]]]]:
+    statements = [(INSERT_CHECK_SQL, [row])]
+    if state:
+        statements.append((_upsert_state_sql(len(state)), [tuple(_state_params(state))]))
+    if outbox:
+        statements.append((INSERT_OUTBOX_SQL, list(outbox)))
+    return statements
+
+
+# Set diff against the slots that were open after the previous check, as
+# (query, rows) pairs for executemany: vanished slots close, remaining ones get
+# last_seen bumped in one statement, and new or reappearing ones are upserted.
+def _slot_statements(
+    target: str,
+    previous: Set[Tuple[str, str]],
+    current: Set[Tuple[str, str]],
+    checked_at: str,
+    checked_epoch: int,
+) -> List[Tuple[str, List[Tuple[Any, ...]]]]:
+    closed = previous - current
+    appeared = current - previous
+    statements = []
+    if closed:
+        statements.append((
+            "UPDATE slots SET is_open = 0 WHERE target = ? AND slot_date = ? AND slot_time = ?",
+            [(target, date, time_) for date, time_ in closed],
+        ))
+    if previous - closed:
+        statements.append((
+            "UPDATE slots SET last_seen = ?, last_seen_epoch = ? WHERE target = ? AND is_open = 1",
+            [(checked_at, checked_epoch, target)],
+        ))
+    if appeared:
+        statements.append((
+            f"INSERT INTO slots ({SLOT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, 1, 1) "
+            "ON CONFLICT(target, slot_date, slot_time) DO UPDATE SET "
+            "last_seen = excluded.last_seen, last_seen_epoch = excluded.last_seen_epoch, "
+            "appearances = slots.appearances + 1, is_open = 1",
+            [
+                (target, date, time_, checked_at, checked_at, checked_epoch, checked_epoch)
+                for date, time_ in appeared
+            ],
+        ))
+    return statements
+
+
+# Slot statements for a tracked check row, given the rows OPEN_SLOTS_SQL
+# returned for its target inside the same transaction.
+def _slot_changes(row: Tuple[Any, ...], open_rows: Sequence[Any]) -> List[Tuple[str, List[Tuple[Any, ...]]]]:
+    target, checked_at, checked_epoch = _slot_context(row)
+    previous = {(open_row[0], open_row[1]) for open_row in open_rows}
+    return _slot_statements(target, previous, _slot_pairs(row[5]), checked_at, checked_epoch)
+
+
+def _iter_rows(cursor, size: int = 1000):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _slot_pairs(slots_json: Optional[str]) -> Set[Tuple[str, str]]:
     try:
-        if _is_postgres(storage):
+        slots = json.loads(slots_json or "[]")
+    except ValueError:
+        return set()
+    return {(slot["date"], slot["time"]) for slot in slots if slot.get("date") and slot.get("time")}
+
+
+# duration_ms mirrors evidence.timings.check_ms so latency can be aggregated in
+# SQL; checks without timings (cooldown results, old rows) stay NULL.
+def _migrate_duration(store: "Store", conn) -> None:
+    conn.execute("ALTER TABLE checks ADD COLUMN duration_ms INTEGER")
+
+    def values(checked_at: str, evidence: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (_duration_ms(evidence),)
+
+    _backfill_from_evidence(store, conn, ("duration_ms",), values)
+
+
+def _duration_ms(evidence: Dict[str, Any]) -> Optional[int]:
+    timings = evidence.get("timings")
+    if not isinstance(timings, dict) or timings.get("check_ms") is None:
+        return None
+    try:
+        return int(timings["check_ms"])
+    except (TypeError, ValueError):
+        return None
+
+
+# Coordination between replicas: live workers, named leases (one per target
+# plus "leader") and the reservations behind the shared hourly check budget,
+# seeded with the checks of the last window so an upgrade keeps the count.
+def _migrate_coordination(store: "Store", conn) -> None:
+    id_column = "BIGSERIAL PRIMARY KEY" if store.is_postgres else "INTEGER PRIMARY KEY"
+    epoch_type = "BIGINT" if store.is_postgres else "INTEGER"
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, started_at TEXT, heartbeat_epoch {epoch_type})"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_epoch {epoch_type})"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS rate_reservations (id {id_column}, reserved_epoch {epoch_type} NOT NULL, worker_id TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS rate_reservations_epoch_idx ON rate_reservations (reserved_epoch)")
+    conn.execute(
+        store._sql(
+            "INSERT INTO rate_reservations (reserved_epoch) "
+            "SELECT checked_at_epoch FROM checks WHERE checked_at_epoch > ?"
+        ),
+        (int(time.time()) - RATE_WINDOW_SECONDS,),
+    )
+
+
+# Notifications waiting for (or done with) SMTP delivery. Rows are written in
+# the transaction of the check that decided them and claimed by the outbox
+# worker through next_attempt_epoch.
+def _migrate_outbox(store: "Store", conn) -> None:
+    id_column = "BIGSERIAL PRIMARY KEY" if store.is_postgres else "INTEGER PRIMARY KEY"
+    epoch_type = "BIGINT" if store.is_postgres else "INTEGER"
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id {id_column},
+            created_at TEXT,
+            created_at_epoch {epoch_type},
+            target TEXT,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            next_attempt_epoch {epoch_type},
+            sent_at TEXT,
+            sent_epoch {epoch_type},
+            last_error TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS outbox_due_idx ON outbox (status, next_attempt_epoch)")
+
+
+# Applied in order by init_db. Each migration runs in its own transaction and
+# is recorded in schema_migrations, so every database is upgraded exactly once.
+MIGRATIONS: List[Tuple[int, str, Callable[["Store", Any], None]]] = [
+    (1, "checks and state tables", _migrate_base),
+    (2, "checked_at_epoch and target columns with indexes", _migrate_epoch_and_target),
+    (3, "check_spans table for compacted history", _migrate_check_spans),
+    (4, "slots table with first/last seen", _migrate_slots),
+    (5, "duration_ms column on checks", _migrate_duration),
+    (6, "workers, leases and rate_reservations for replicas", _migrate_coordination),
+    (7, "outbox table for notifications", _migrate_outbox),
+]
+
+
+def _store_key(storage: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    return storage.get("postgres_url_env"), storage.get("sqlite_path")
+
+
+def get_store(storage: Dict[str, Any]) -> "Store":
+    key = _store_key(storage)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = Store(storage)
+            _stores[key] = store
+        return store
+
+
+def close_stores() -> None:
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+atexit.register(close_stores)
+
+
+# One persistent connection per database, shared by every target and thread of
+# the process. The backend is detected once; queries are written with "?" and
+# rewritten for psycopg. A connection that breaks (e.g. a Postgres restart) is
+# reopened and the statement retried once.
+class Store:
+    def __init__(self, storage: Dict[str, Any]):
+        self.db_url = _get_db_url(storage)
+        self.is_postgres = self.db_url is not None
+        self.sqlite_path = storage.get("sqlite_path")
+        self.connections_opened = 0
+        self._conn = None
+        self._schema_ready = False
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        self.connections_opened += 1
+        if self.is_postgres:
+            if psycopg is None:
+                raise RuntimeError("psycopg is required for Postgres support")
+            return psycopg.connect(self.db_url, autocommit=True)
+
+        sqlite_dir = os.path.dirname(self.sqlite_path)
+        if sqlite_dir:
+            os.makedirs(sqlite_dir, exist_ok=True)
+        # Autocommit like the psycopg connection; check_same_thread is off
+        # because asyncio.to_thread calls arrive on pool threads (under _lock).
+        conn = sqlite3.connect(self.sqlite_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _is_broken(self, conn) -> bool:
+        if self.is_postgres:
+            return bool(conn.closed or getattr(conn, "broken", False))
+        return False
+
+    def _sql(self, query: str) -> str:
+        return query.replace("?", "%s") if self.is_postgres else query
+
+    def _run(self, work: Callable[[Any], Any]) -> Any:
+        with self._lock:
+            conn = self._connection()
+            try:
+                return work(conn)
+            except Exception:
+                if not self._is_broken(conn):
+                    raise
+                logger.warning("Database connection lost, reconnecting")
+                self._reset()
+                return work(self._connection())
+
+    def execute(self, query: str, params: Sequence[Any] = ()):
+        return self._run(lambda conn: conn.execute(self._sql(query), params))
+
+    def fetchone(self, query: str, params: Sequence[Any] = ()):
+        return self._run(lambda conn: conn.execute(self._sql(query), params).fetchone())
+
+    def fetchall(self, query: str, params: Sequence[Any] = ()) -> List[Any]:
+        return self._run(lambda conn: conn.execute(self._sql(query), params).fetchall())
+
+    # Yields rows without loading the result set: fetchmany on SQLite, a
+    # named (server-side) cursor on Postgres. The store stays locked until the
+    # generator is exhausted or closed, so it is meant for one-shot exports.
+    def stream(self, query: str, params: Sequence[Any] = (), size: int = 1000) -> Iterator[Any]:
+        with self._lock:
+            conn = self._connection()
+            if self.is_postgres:
+                with conn.transaction(), conn.cursor(name="stream") as cursor:
+                    cursor.itersize = size
+                    cursor.execute(self._sql(query), params)
+                    yield from _iter_rows(cursor, size)
+            else:
+                yield from _iter_rows(conn.execute(query, params), size)
+
+    # Runs work(conn) as one transaction, rolled back if it raises. Statements
+    # inside must go through conn (with self._sql), not self.execute.
+    def transact(self, work: Callable[[Any], Any]) -> Any:
+        def run(conn):
+            if self.is_postgres:
+                with conn.transaction():
+                    return work(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return value
+
+        return self._run(run)
+
+    def _reset(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def init_db(self) -> None:
+        with self._lock:
+            if self._schema_ready:
+                return
+            self.execute(MIGRATIONS_TABLE_SQL)
+            applied = {row[0] for row in self.fetchall("SELECT version FROM schema_migrations")}
+            for version, description, migrate in MIGRATIONS:
+                if version not in applied:
+                    self.transact(partial(self._apply_migration, version=version, description=description, migrate=migrate))
+            self._schema_ready = True
+
+    def _apply_migration(self, conn, version: int, description: str, migrate) -> None:
+        if self.is_postgres:
+            conn.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        row = conn.execute(self._sql("SELECT 1 FROM schema_migrations WHERE version = ?"), (version,)).fetchone()
+        if row:
+            return
+        logger.info("Applying schema migration %s: %s", version, description)
+        migrate(self, conn)
+        conn.execute(
+            self._sql("INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)"),
+            (version, description, iso_now()),
+        )
+
+    def schema_version(self) -> int:
+        row = self.fetchone("SELECT MAX(version) FROM schema_migrations")
+        return int(row[0] or 0) if row else 0
+
+    def insert_check(
+        self,
+        checked_at: str,
+        status: str,
+        slots_json: str,
+        result_hash: str,
+        evidence_json: str,
+        error: Optional[str],
+        target: Optional[str] = None,
+        duration_ms: Optional[int] = None,
+    ) -> None:
+        self.execute(
+            INSERT_CHECK_SQL,
+            _check_row(checked_at, status, slots_json, result_hash, evidence_json, error, target, duration_ms),
+        )
+
+    def get_state(self, key: str) -> Optional[str]:
+        row = self.fetchone("SELECT value FROM state WHERE key = ?", (key,))
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        self.execute(_upsert_state_sql(1), (key, value))
+
+    def load_state(self, keys: Sequence[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        rows = self.fetchall(f"SELECT key, value FROM state WHERE key IN ({placeholders})", tuple(keys))
+        return {row[0]: row[1] for row in rows}
+
+    # The check row and every state change commit together, so a crash can
+    # never leave last_status or consecutive_failures out of step with checks.
+    def record_check(
+        self,
+        checked_at: str,
+        status: str,
+        slots_json: str,
+        result_hash: str,
+        evidence_json: str,
+        error: Optional[str],
+        state: Dict[str, str],
+        target: Optional[str] = None,
+        duration_ms: Optional[int] = None,
+        outbox: Sequence[Tuple[str, str]] = (),
+    ) -> None:
+        self.transact(
+            partial(
+                self._record_check_work,
+                row=_check_row(
+                    checked_at, status, slots_json, result_hash, evidence_json, error, target, duration_ms
+                ),
+                state=state,
+                outbox=_outbox_rows(checked_at, target, outbox),
+            )
+        )
+
+    def _record_check_work(
+        self,
+        conn,
+        row: Tuple[Any, ...],
+        state: Dict[str, str],
+        outbox: Sequence[Tuple[Any, ...]] = (),
+    ) -> None:
+        for query, rows in _check_statements(row, state, outbox):
+            conn.cursor().executemany(self._sql(query), rows)
+        target, _, checked_epoch = _slot_context(row)
+        if checked_epoch is not None:
+            open_rows = conn.execute(self._sql(OPEN_SLOTS_SQL), (target,)).fetchall()
+            for query, rows in _slot_changes(row, open_rows):
+                conn.cursor().executemany(self._sql(query), rows)
+
+    # Slot lifetimes for a target, newest first: seen_seconds is last_seen
+    # minus first_seen, appearances counts how often the slot (re)appeared.
+    def slot_lifetimes(
+        self,
+        target: Optional[str] = None,
+        since_epoch: Optional[float] = None,
+        open_only: bool = False,
+    ) -> List[Dict[str, Any]]:
+        query = f"SELECT {SLOT_COLUMNS} FROM slots WHERE target = ?"
+        params: List[Any] = [target or ""]
+        if since_epoch is not None:
+            query += " AND first_seen_epoch >= ?"
+            params.append(int(since_epoch))
+        if open_only:
+            query += " AND is_open = 1"
+        rows = self.fetchall(query + " ORDER BY first_seen_epoch DESC, slot_date, slot_time", params)
+        return [
+            {
+                "date": row[1],
+                "time": row[2],
+                "first_seen": row[3],
+                "last_seen": row[4],
+                "seen_seconds": int(row[6] - row[5]),
+                "appearances": int(row[7]),
+                "open": bool(row[8]),
+            }
+            for row in rows
+        ]
+
+    def count_checks_since(self, since_epoch: float) -> int:
+        row = self.fetchone("SELECT COUNT(*) FROM checks WHERE checked_at_epoch >= ?", (int(since_epoch),))
+        return int(row[0]) if row else 0
+
+    def oldest_check_since(self, since_epoch: float) -> Optional[int]:
+        row = self.fetchone(
+            "SELECT MIN(checked_at_epoch) FROM checks WHERE checked_at_epoch >= ?",
+            (int(since_epoch),),
+        )
+        return int(row[0]) if row and row[0] is not None else None
+
+    def check_epochs_since(self, since_epoch: float) -> List[int]:
+        rows = self.fetchall(
+            "SELECT checked_at_epoch FROM checks WHERE checked_at_epoch >= ? ORDER BY checked_at_epoch",
+            (int(since_epoch),),
+        )
+        return [int(row[0]) for row in rows]
+
+    # Collapses checks older than raw_before into spans of consecutive
+    # identical results per target (continuing the target's latest span when
+    # the hash still matches), deletes the collapsed rows, then drops spans
+    # and closed slots last seen before spans_before. One transaction, so readers see either
+    # the raw rows or the spans, never both or neither.
+    def compact(self, raw_before: float, spans_before: Optional[float] = None) -> Dict[str, int]:
+        stats = {"checks_compacted": 0, "spans_written": 0, "spans_deleted": 0, "slots_deleted": 0}
+
+        def work(conn):
+            sql = self._sql
+            targets = conn.execute(
+                sql("SELECT DISTINCT COALESCE(target, '') FROM checks WHERE checked_at_epoch < ? ORDER BY 1"),
+                (int(raw_before),),
+            ).fetchall()
+            for (target,) in targets:
+                self._compact_target(conn, target, int(raw_before), stats)
+            if spans_before is not None:
+                cursor = conn.execute(
+                    sql("DELETE FROM check_spans WHERE last_seen_epoch < ?"),
+                    (int(spans_before),),
+                )
+                stats["spans_deleted"] = max(cursor.rowcount, 0)
+                cursor = conn.execute(
+                    sql("DELETE FROM slots WHERE is_open = 0 AND last_seen_epoch < ?"),
+                    (int(spans_before),),
+                )
+                stats["slots_deleted"] = max(cursor.rowcount, 0)
+
+        self.transact(work)
+        return stats
+
+    # Records this worker as alive, extends every lease it holds and returns
+    # the workers that heartbeated within ttl_seconds (sorted). Workers silent
+    # for ten ttls are forgotten.
+    def heartbeat(self, worker_id: str, ttl_seconds: float, now: Optional[float] = None) -> List[str]:
+        now = int(time.time() if now is None else now)
+
+        def work(conn):
+            sql = self._sql
             conn.execute(
-                """
-                INSERT INTO checks (checked_at, status, slots_json, result_hash, evidence_json, error)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (checked_at, status, slots_json, result_hash, evidence_json, error),
+                sql(
+                    "INSERT INTO workers (worker_id, started_at, heartbeat_epoch) VALUES (?, ?, ?) "
+                    "ON CONFLICT(worker_id) DO UPDATE SET heartbeat_epoch = excluded.heartbeat_epoch"
+                ),
+                (worker_id, iso_now(), now),
             )
-        else:
             conn.execute(
-                """
-                INSERT INTO checks (checked_at, status, slots_json, result_hash, evidence_json, error)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (checked_at, status, slots_json, result_hash, evidence_json, error),
+                sql("UPDATE leases SET expires_epoch = ? WHERE owner = ?"),
+                (now + int(ttl_seconds), worker_id),
             )
-            conn.commit()
-    finally:
-        conn.close()
+            conn.execute(sql("DELETE FROM workers WHERE heartbeat_epoch < ?"), (now - 10 * int(ttl_seconds),))
+            rows = conn.execute(
+                sql("SELECT worker_id FROM workers WHERE heartbeat_epoch >= ? ORDER BY worker_id"),
+                (now - int(ttl_seconds),),
+            ).fetchall()
+            return [row[0] for row in rows]
 
+        return self.transact(work)
 
-def get_state(storage: Dict[str, Any], key: str) -> Optional[str]:
-    conn = _connect(storage)
-    try:
-        if _is_postgres(storage):
-            row = conn.execute("SELECT value FROM state WHERE key = %s", (key,)).fetchone()
-            return row[0] if row else None
-        row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
-        return row["value"] if row else None
-    finally:
-        conn.close()
+    # Takes the lease if it is free, expired or already ours; one upsert, so
+    # two workers racing for it cannot both win.
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float, now: Optional[float] = None) -> bool:
+        now = int(time.time() if now is None else now)
 
+        def work(conn):
+            conn.execute(
+                self._sql(
+                    "INSERT INTO leases (name, owner, expires_epoch) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_epoch = excluded.expires_epoch "
+                    "WHERE leases.owner = excluded.owner OR leases.expires_epoch < ?"
+                ),
+                (name, owner, now + int(ttl_seconds), now),
+            )
+            row = conn.execute(self._sql("SELECT owner FROM leases WHERE name = ?"), (name,)).fetchone()
+            return bool(row) and row[0] == owner
 
-def set_state(storage: Dict[str, Any], key: str, value: str) -> None:
-    conn = _connect(storage)
-    try:
-        if _is_postgres(storage):
+        return self.transact(work)
+
+    def release_lease(self, name: str, owner: str) -> None:
+        self.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def release_worker(self, worker_id: str) -> None:
+        def work(conn):
+            conn.execute(self._sql("DELETE FROM leases WHERE owner = ?"), (worker_id,))
+            conn.execute(self._sql("DELETE FROM workers WHERE worker_id = ?"), (worker_id,))
+
+        self.transact(work)
+
+    # Shared sliding window over rate_reservations: returns the seconds until
+    # a check may start and, when that is 0 and book is set, books it. All
+    # replicas serialise on one lock, so the window can never be overbooked.
+    def reserve_check(
+        self,
+        max_checks: int,
+        window_seconds: float = RATE_WINDOW_SECONDS,
+        now: Optional[float] = None,
+        worker_id: Optional[str] = None,
+        book: bool = True,
+    ) -> float:
+        now = time.time() if now is None else now
+
+        def work(conn):
+            sql = self._sql
+            if self.is_postgres:
+                conn.execute("SELECT pg_advisory_xact_lock(%s)", (RATE_LOCK_ID,))
+            conn.execute(sql("DELETE FROM rate_reservations WHERE reserved_epoch <= ?"), (int(now - window_seconds),))
+            rows = conn.execute(
+                sql("SELECT reserved_epoch FROM rate_reservations ORDER BY reserved_epoch DESC LIMIT ?"),
+                (max_checks,),
+            ).fetchall()
+            wait = max(0.0, rows[-1][0] + window_seconds - now) if len(rows) >= max_checks else 0.0
+            if wait <= 0 and book:
+                conn.execute(
+                    sql("INSERT INTO rate_reservations (reserved_epoch, worker_id) VALUES (?, ?)"),
+                    (int(now), worker_id),
+                )
+            return wait
+
+        return self.transact(work)
+
+    # Takes up to limit due notifications for this worker: each claim bumps
+    # attempts and pushes next_attempt_epoch out by claim_seconds, so other
+    # workers skip the row, and a worker that dies mid-send leaves it to be
+    # retried once the claim runs out.
+    def claim_notifications(
+        self,
+        limit: int,
+        claim_seconds: float,
+        now: Optional[float] = None,
+    ) -> List[Tuple[Any, ...]]:
+        now = int(time.time() if now is None else now)
+
+        def work(conn):
+            sql = self._sql
+            rows = conn.execute(
+                sql(
+                    "SELECT id, target, subject, body, attempts FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt_epoch <= ? ORDER BY next_attempt_epoch, id LIMIT ?"
+                ),
+                (now, limit),
+            ).fetchall()
+            claimed = []
+            for row_id, target, subject, body, attempts in rows:
+                cursor = conn.execute(
+                    sql(
+                        "UPDATE outbox SET attempts = attempts + 1, next_attempt_epoch = ? "
+                        "WHERE id = ? AND attempts = ? AND status = 'pending'"
+                    ),
+                    (now + int(claim_seconds), row_id, attempts),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append((row_id, target, subject, body, attempts + 1))
+            return claimed
+
+        return self.transact(work)
+
+    def mark_notification_sent(self, row_id: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.execute(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, sent_epoch = ?, last_error = NULL WHERE id = ?",
+            (datetime.fromtimestamp(now, timezone.utc).isoformat(), int(now), row_id),
+        )
+
+    # Schedules another attempt at retry_epoch, or gives up (status failed)
+    # when retry_epoch is None.
+    def mark_notification_failed(self, row_id: int, error: str, retry_epoch: Optional[float]) -> None:
+        if retry_epoch is None:
+            self.execute("UPDATE outbox SET status = 'failed', last_error = ? WHERE id = ?", (error, row_id))
+            return
+        self.execute(
+            "UPDATE outbox SET next_attempt_epoch = ?, last_error = ? WHERE id = ?",
+            (int(retry_epoch), error, row_id),
+        )
+
+    def prune_outbox(self, sent_before: float) -> int:
+        cursor = self.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_epoch < ?", (int(sent_before),))
+        return max(cursor.rowcount, 0)
+
+    def outbox_counts(self) -> Dict[str, int]:
+        rows = self.fetchall("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        return {row[0]: int(row[1]) for row in rows}
+
+    # Returns the space freed by compact() to the filesystem (SQLite) or
+    # marks it reusable and refreshes planner statistics (Postgres).
+    def vacuum(self) -> None:
+        if self.is_postgres:
+            self.execute("VACUUM ANALYZE checks")
+            self.execute("VACUUM ANALYZE check_spans")
+        else:
+            self.execute("VACUUM")
+            self.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _compact_target(self, conn, target: str, raw_before: int, stats: Dict[str, int]) -> None:
+        sql = self._sql
+        # span mirrors "id, SPAN_COLUMNS": [id, target, status, result_hash, slots_json,
+        # evidence_json, error, first_seen, last_seen, first/last_seen_epoch, check_count]
+        span = None
+        latest = conn.execute(
+            sql(
+                f"SELECT id, {SPAN_COLUMNS} FROM check_spans WHERE COALESCE(target, '') = ? "
+                "ORDER BY last_seen_epoch DESC LIMIT 1"
+            ),
+            (target,),
+        ).fetchone()
+        if latest:
+            span = list(latest)
+
+        cursor = conn.execute(
+            sql(
+                "SELECT target, status, result_hash, slots_json, evidence_json, error, "
+                "checked_at, checked_at_epoch FROM checks "
+                "WHERE COALESCE(target, '') = ? AND checked_at_epoch < ? "
+                "ORDER BY checked_at_epoch, id"
+            ),
+            (target, raw_before),
+        )
+        for row in _iter_rows(cursor):
+            stats["checks_compacted"] += 1
+            if span is not None and span[3] == row[2]:
+                span[8], span[10] = row[6], row[7]
+                span[11] += 1
+                continue
+            if span is not None:
+                self._write_span(conn, span, stats)
+            span = [None, *row[:6], row[6], row[6], row[7], row[7], 1]
+        if span is not None:
+            self._write_span(conn, span, stats)
+        conn.execute(
+            sql("DELETE FROM checks WHERE COALESCE(target, '') = ? AND checked_at_epoch < ?"),
+            (target, raw_before),
+        )
+
+    def _write_span(self, conn, span: List[Any], stats: Dict[str, int]) -> None:
+        if span[0] is None:
             conn.execute(
-                """
-                INSERT INTO state (key, value)
-                VALUES (%s, %s)
-                ON CONFLICT(key) DO UPDATE SET value=excluded.value
-                """,
-                (key, value),
+                self._sql(f"INSERT INTO check_spans ({SPAN_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+                span[1:],
             )
+            stats["spans_written"] += 1
         else:
             conn.execute(
-                """
-                INSERT INTO state (key, value)
-                VALUES (?, ?)
-                ON CONFLICT(key) DO UPDATE SET value=excluded.value
-                """,
-                (key, value),
+                self._sql("UPDATE check_spans SET last_seen = ?, last_seen_epoch = ?, check_count = ? WHERE id = ?"),
+                (span[8], span[10], span[11], span[0]),
             )
-            conn.commit()
-    finally:
-        conn.close()
 
 
-def count_checks_since(storage: Dict[str, Any], since_iso: str) -> int:
-    conn = _connect(storage)
-    try:
-        if _is_postgres(storage):
-            row = conn.execute(
-                "SELECT COUNT(*) AS count FROM checks WHERE checked_at >= %s",
-                (since_iso,),
-            ).fetchone()
-            return int(row[0]) if row else 0
-        row = conn.execute(
-            "SELECT COUNT(*) AS count FROM checks WHERE checked_at >= ?",
-            (since_iso,),
-        ).fetchone()
-        return int(row["count"]) if row else 0
-    finally:
-        conn.close()
+def init_db(storage: Dict[str, Any]) -> None:
+    get_store(storage).init_db()
 
 
-def oldest_check_since(storage: Dict[str, Any], since_iso: str) -> Optional[str]:
-    conn = _connect(storage)
-    try:
-        if _is_postgres(storage):
-            row = conn.execute(
-                "SELECT checked_at FROM checks WHERE checked_at >= %s ORDER BY checked_at ASC LIMIT 1",
-                (since_iso,),
-            ).fetchone()
-            return row[0] if row else None
-        row = conn.execute(
-            "SELECT checked_at FROM checks WHERE checked_at >= ? ORDER BY checked_at ASC LIMIT 1",
-            (since_iso,),
-        ).fetchone()
-        return row["checked_at"] if row else None
-    finally:
-        conn.close()
+def insert_check(
+    storage: Dict[str, Any],
+    checked_at: str,
+    status: str,
+    slots_json: str,
+    result_hash: str,
+    evidence_json: str,
+    error: Optional[str],
+    target: Optional[str] = None,
+    duration_ms: Optional[int] = None,
+) -> None:
+    get_store(storage).insert_check(
+        checked_at, status, slots_json, result_hash, evidence_json, error, target, duration_ms
+    )
+
+
+def _state_key(storage: Dict[str, Any], key: str) -> str:
+    return f"{storage.get('state_prefix') or ''}{key}"
+
+
+def get_state(storage: Dict[str, Any], key: str) -> Optional[str]:
+    return get_store(storage).get_state(_state_key(storage, key))
+
+
+def set_state(storage: Dict[str, Any], key: str, value: str) -> None:
+    get_store(storage).set_state(_state_key(storage, key), value)
+
+
+def load_state(storage: Dict[str, Any], keys: Sequence[str]) -> Dict[str, str]:
+    prefixed = {_state_key(storage, key): key for key in keys}
+    rows = get_store(storage).load_state(list(prefixed))
+    return {prefixed[key]: value for key, value in rows.items()}
+
+
+def record_check(
+    storage: Dict[str, Any],
+    checked_at: str,
+    status: str,
+    slots_json: str,
+    result_hash: str,
+    evidence_json: str,
+    error: Optional[str],
+    state: Dict[str, str],
+    target: Optional[str] = None,
+    duration_ms: Optional[int] = None,
+    outbox: Sequence[Tuple[str, str]] = (),
+) -> None:
+    prefixed = {_state_key(storage, key): value for key, value in state.items()}
+    get_store(storage).record_check(
+        checked_at, status, slots_json, result_hash, evidence_json, error, prefixed, target, duration_ms, outbox
+    )
+
+
+def count_checks_since(storage: Dict[str, Any], since_epoch: float) -> int:
+    return get_store(storage).count_checks_since(since_epoch)
+
+
+def oldest_check_since(storage: Dict[str, Any], since_epoch: float) -> Optional[int]:
+    return get_store(storage).oldest_check_since(since_epoch)
+
+
+def check_epochs_since(storage: Dict[str, Any], since_epoch: float) -> List[int]:
+    return get_store(storage).check_epochs_since(since_epoch)
+
+
+def compact_checks(storage: Dict[str, Any], now: Optional[float] = None) -> Dict[str, int]:
+    retention = {**DEFAULT_RETENTION, **(storage.get("retention") or {})}
+    now = time.time() if now is None else now
+    # Never compact the last hour: the rate limiter is seeded from it.
+    raw_before = now - max(1.0, float(retention["raw_hours"])) * 3600
+    span_days = float(retention["span_days"] or 0)
+    spans_before = now - span_days * 86400 if span_days > 0 else None
+    return get_store(storage).compact(raw_before, spans_before)
 
 
 def serialize_slots(slots: Any) -> str:
@@ -202,5 +1098,11 @@ def parse_iso(value: str) -> datetime:
     return datetime.fromisoformat(value)
 
 
-def iso_now() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def to_epoch(checked_at: Optional[str]) -> Optional[int]:
+    try:
+        parsed = parse_iso(checked_at or "")
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
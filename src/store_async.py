@@ -0,0 +1,397 @@
+import abc
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .store import (
+    INSERT_CHECK_SQL,
+    OPEN_SLOTS_SQL,
+    _check_row,
+    _check_statements,
+    _get_db_url,
+    _outbox_rows,
+    _slot_changes,
+    _slot_context,
+    _state_key,
+    _store_key,
+    _upsert_state_sql,
+    get_store,
+)
+
+try:
+    import psycopg
+except Exception:  # pragma: no cover - optional dependency
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the writes folded into one transaction.
+GROUP_COMMIT_MAX = 256
+
+_async_stores: Dict[Tuple[Optional[str], Optional[str]], "AsyncStore"] = {}
+
+
+# asyncio counterpart of Store, with the same methods as coroutines. Reads go
+# straight to the backend; writes are queued and group-committed: whatever is
+# waiting when the committer gets to it is written in one transaction, so many
+# concurrent checks cost few commits. If that transaction fails, its writes are
+# retried one per transaction so only the faulty one raises. Migrations stay
+# on the blocking Store (in a thread), they run once per process. Backends
+# provide reads, batch execution and the work objects a batch runs.
+class AsyncStore(abc.ABC):
+    def __init__(self, storage: Dict[str, Any], max_batch: int = GROUP_COMMIT_MAX):
+        self.storage = storage
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._committer: Optional[asyncio.Task] = None
+
+    @abc.abstractmethod
+    async def _fetchone(self, query: str, params: Sequence[Any] = ()) -> Any:
+        ...
+
+    @abc.abstractmethod
+    async def _fetchall(self, query: str, params: Sequence[Any] = ()) -> List[Any]:
+        ...
+
+    # Runs every work in one transaction, in queue order.
+    @abc.abstractmethod
+    async def _run_batch(self, works: List[Any]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def _record_check_work(
+        self,
+        row: Tuple[Any, ...],
+        state: Dict[str, str],
+        outbox: Sequence[Tuple[Any, ...]],
+    ) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def _execute_work(self, query: str, params: Sequence[Any]) -> Any:
+        ...
+
+    async def _close_backend(self) -> None:
+        pass
+
+    async def _write(self, work: Any) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._committer = asyncio.create_task(self._commit_loop())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((work, future))
+        await future
+
+    async def _commit_loop(self) -> None:
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+
+    async def _commit(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            await self._run_batch([work for work, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                _settle(batch[0][1], exc)
+                return
+            logger.warning("Group commit of %s writes failed, retrying them one by one: %s", len(batch), exc)
+            for work, future in batch:
+                try:
+                    await self._run_batch([work])
+                except Exception as single_exc:
+                    _settle(future, single_exc)
+                    continue
+                self.commits += 1
+                self.writes += 1
+                _settle(future)
+            return
+        self.commits += 1
+        self.writes += len(batch)
+        for _, future in batch:
+            _settle(future)
+
+    # Flushes the queued writes, then closes the backend.
+    async def close(self) -> None:
+        if self._committer is not None:
+            self._queue.put_nowait(None)
+            await self._committer
+            self._queue = None
+            self._committer = None
+        await self._close_backend()
+
+    async def init_db(self) -> None:
+        await asyncio.to_thread(get_store(self.storage).init_db)
+
+    async def insert_check(
+        self,
+        checked_at: str,
+        status: str,
+        slots_json: str,
+        result_hash: str,
+        evidence_json: str,
+        error: Optional[str],
+        target: Optional[str] = None,
+        duration_ms: Optional[int] = None,
+    ) -> None:
+        row = _check_row(checked_at, status, slots_json, result_hash, evidence_json, error, target, duration_ms)
+        await self._write(self._execute_work(INSERT_CHECK_SQL, row))
+
+    async def get_state(self, key: str) -> Optional[str]:
+        row = await self._fetchone("SELECT value FROM state WHERE key = ?", (key,))
+        return row[0] if row else None
+
+    async def set_state(self, key: str, value: str) -> None:
+        await self._write(self._execute_work(_upsert_state_sql(1), (key, value)))
+
+    async def load_state(self, keys: Sequence[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        rows = await self._fetchall(f"SELECT key, value FROM state WHERE key IN ({placeholders})", tuple(keys))
+        return {row[0]: row[1] for row in rows}
+
+    async def record_check(
+        self,
+        checked_at: str,
+        status: str,
+        slots_json: str,
+        result_hash: str,
+        evidence_json: str,
+        error: Optional[str],
+        state: Dict[str, str],
+        target: Optional[str] = None,
+        duration_ms: Optional[int] = None,
+        outbox: Sequence[Tuple[str, str]] = (),
+    ) -> None:
+        row = _check_row(checked_at, status, slots_json, result_hash, evidence_json, error, target, duration_ms)
+        await self._write(self._record_check_work(row, state, _outbox_rows(checked_at, target, outbox)))
+
+    async def count_checks_since(self, since_epoch: float) -> int:
+        row = await self._fetchone("SELECT COUNT(*) FROM checks WHERE checked_at_epoch >= ?", (int(since_epoch),))
+        return int(row[0]) if row else 0
+
+    async def check_epochs_since(self, since_epoch: float) -> List[int]:
+        rows = await self._fetchall(
+            "SELECT checked_at_epoch FROM checks WHERE checked_at_epoch >= ? ORDER BY checked_at_epoch",
+            (int(since_epoch),),
+        )
+        return [int(row[0]) for row in rows]
+
+
+def _settle(future: asyncio.Future, exc: Optional[BaseException] = None) -> None:
+    # The writer may have been cancelled while its write was in flight.
+    if future.done():
+        return
+    if exc is None:
+        future.set_result(None)
+    else:
+        future.set_exception(exc)
+
+
+# SQLite: the blocking Store does the work. Reads run on the default thread
+# pool; each batch runs on one dedicated writer thread as a single transaction.
+class SqliteAsyncStore(AsyncStore):
+    def __init__(self, storage: Dict[str, Any], max_batch: int = GROUP_COMMIT_MAX):
+        super().__init__(storage, max_batch)
+        self.store = get_store(storage)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store-writer")
+
+    async def _fetchone(self, query: str, params: Sequence[Any] = ()) -> Any:
+        return await asyncio.to_thread(self.store.fetchone, query, params)
+
+    async def _fetchall(self, query: str, params: Sequence[Any] = ()) -> List[Any]:
+        return await asyncio.to_thread(self.store.fetchall, query, params)
+
+    async def _run_batch(self, works: List[Callable[[Any], Any]]) -> None:
+        def run(conn):
+            for work in works:
+                work(conn)
+
+        await asyncio.get_running_loop().run_in_executor(self._writer, self.store.transact, run)
+
+    def _record_check_work(
+        self,
+        row: Tuple[Any, ...],
+        state: Dict[str, str],
+        outbox: Sequence[Tuple[Any, ...]],
+    ) -> Callable[[Any], Any]:
+        return partial(self.store._record_check_work, row=row, state=state, outbox=outbox)
+
+    def _execute_work(self, query: str, params: Sequence[Any]) -> Callable[[Any], Any]:
+        return lambda conn: conn.execute(query, params)
+
+    async def _close_backend(self) -> None:
+        self._writer.shutdown(wait=True)
+
+
+# Postgres: one psycopg AsyncConnection, used by one coroutine at a time (a
+# batch holds it for its whole transaction). A broken connection is reopened
+# before the next statement.
+class PostgresAsyncStore(AsyncStore):
+    def __init__(self, storage: Dict[str, Any], max_batch: int = GROUP_COMMIT_MAX):
+        super().__init__(storage, max_batch)
+        self.db_url = _get_db_url(storage)
+        self.connections_opened = 0
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self):
+        if self._conn is not None and (self._conn.closed or self._conn.broken):
+            logger.warning("Database connection lost, reconnecting")
+            self._conn = None
+        if self._conn is None:
+            if psycopg is None:
+                raise RuntimeError("psycopg is required for Postgres support")
+            self._conn = await psycopg.AsyncConnection.connect(self.db_url, autocommit=True)
+            self.connections_opened += 1
+        return self._conn
+
+    @staticmethod
+    def _sql(query: str) -> str:
+        return query.replace("?", "%s")
+
+    async def _fetchone(self, query: str, params: Sequence[Any] = ()) -> Any:
+        async with self._lock:
+            conn = await self._connection()
+            cursor = await conn.execute(self._sql(query), params)
+            return await cursor.fetchone()
+
+    async def _fetchall(self, query: str, params: Sequence[Any] = ()) -> List[Any]:
+        async with self._lock:
+            conn = await self._connection()
+            cursor = await conn.execute(self._sql(query), params)
+            return await cursor.fetchall()
+
+    async def _run_batch(self, works: List[Callable[[Any], Awaitable[Any]]]) -> None:
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.transaction():
+                for work in works:
+                    await work(conn)
+
+    def _record_check_work(
+        self,
+        row: Tuple[Any, ...],
+        state: Dict[str, str],
+        outbox: Sequence[Tuple[Any, ...]],
+    ) -> Callable[[Any], Awaitable[Any]]:
+        async def work(conn) -> None:
+            for query, rows in _check_statements(row, state, outbox):
+                await self._executemany(conn, query, rows)
+            target, _, checked_epoch = _slot_context(row)
+            if checked_epoch is not None:
+                cursor = await conn.execute(self._sql(OPEN_SLOTS_SQL), (target,))
+                for query, rows in _slot_changes(row, await cursor.fetchall()):
+                    await self._executemany(conn, query, rows)
+
+        return work
+
+    def _execute_work(self, query: str, params: Sequence[Any]) -> Callable[[Any], Awaitable[Any]]:
+        return lambda conn: conn.execute(self._sql(query), params)
+
+    async def _executemany(self, conn, query: str, rows: List[Tuple[Any, ...]]) -> None:
+        async with conn.cursor() as cursor:
+            await cursor.executemany(self._sql(query), rows)
+
+    async def _close_backend(self) -> None:
+        async with self._lock:
+            conn, self._conn = self._conn, None
+            if conn is not None:
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+
+
+# One AsyncStore per database for the running event loop; close_async_stores
+# must be awaited before the loop ends so queued writes are committed.
+def get_async_store(storage: Dict[str, Any]) -> AsyncStore:
+    key = _store_key(storage)
+    store = _async_stores.get(key)
+    if store is None:
+        store_cls = PostgresAsyncStore if _get_db_url(storage) else SqliteAsyncStore
+        store = _async_stores[key] = store_cls(storage)
+    return store
+
+
+async def close_async_stores() -> None:
+    stores = list(_async_stores.values())
+    _async_stores.clear()
+    for store in stores:
+        await store.close()
+
+
+async def init_db(storage: Dict[str, Any]) -> None:
+    await get_async_store(storage).init_db()
+
+
+async def insert_check(
+    storage: Dict[str, Any],
+    checked_at: str,
+    status: str,
+    slots_json: str,
+    result_hash: str,
+    evidence_json: str,
+    error: Optional[str],
+    target: Optional[str] = None,
+    duration_ms: Optional[int] = None,
+) -> None:
+    await get_async_store(storage).insert_check(
+        checked_at, status, slots_json, result_hash, evidence_json, error, target, duration_ms
+    )
+
+
+async def get_state(storage: Dict[str, Any], key: str) -> Optional[str]:
+    return await get_async_store(storage).get_state(_state_key(storage, key))
+
+
+async def set_state(storage: Dict[str, Any], key: str, value: str) -> None:
+    await get_async_store(storage).set_state(_state_key(storage, key), value)
+
+
+async def load_state(storage: Dict[str, Any], keys: Sequence[str]) -> Dict[str, str]:
+    prefixed = {_state_key(storage, key): key for key in keys}
+    rows = await get_async_store(storage).load_state(list(prefixed))
+    return {prefixed[key]: value for key, value in rows.items()}
+
+
+async def record_check(
+    storage: Dict[str, Any],
+    checked_at: str,
+    status: str,
+    slots_json: str,
+    result_hash: str,
+    evidence_json: str,
+    error: Optional[str],
+    state: Dict[str, str],
+    target: Optional[str] = None,
+    duration_ms: Optional[int] = None,
+    outbox: Sequence[Tuple[str, str]] = (),
+) -> None:
+    prefixed = {_state_key(storage, key): value for key, value in state.items()}
+    await get_async_store(storage).record_check(
+        checked_at, status, slots_json, result_hash, evidence_json, error, prefixed, target, duration_ms, outbox
+    )
+
+
+async def count_checks_since(storage: Dict[str, Any], since_epoch: float) -> int:
+    return await get_async_store(storage).count_checks_since(since_epoch)
+
+
+async def check_epochs_since(storage: Dict[str, Any], since_epoch: float) -> List[int]:
+    return await get_async_store(storage).check_epochs_since(since_epoch)
@@ -0,0 +1,246 @@
+import contextlib
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .util import ensure_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACING: Dict[str, Any] = {
+    "enabled": False,
+    "dir": "./data/traces",
+    # "ndjson" (one span per line) or "chrome" (trace-event JSON for
+    # chrome://tracing or ui.perfetto.dev).
+    "format": "ndjson",
+    # Fraction of checks traced; only those at least min_duration_ms long
+    # are written, so a high threshold keeps just the slow ones.
+    "sample_rate": 1.0,
+    "min_duration_ms": 0,
+    # Fraction of traced checks run under cProfile; the .prof lands next to
+    # the trace (python -m pstats FILE). cProfile follows the thread that
+    # started the check from start to end: under `run` that is the event loop,
+    # so the profile also holds other targets' coroutines that ran while this
+    # check awaited, and none of the work done in worker threads.
+    "profile_sample_rate": 0.0,
+    "max_files": 500,
+}
+
+FORMAT_SUFFIXES = {"ndjson": ".ndjson", "chrome": ".trace.json"}
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+# cProfile can only run once per process; a sampled check that overlaps a
+# profiled one is traced without a profile.
+_profiler_lock = threading.Lock()
+_NOT_TRACED = contextlib.nullcontext()
+
+
+# Spans of one check. Checkers and the scheduler add spans through
+# record_span/span, which find the trace in a context variable: asyncio tasks
+# and asyncio.to_thread carry it along, and outside a traced check they return
+# at once.
+class Trace:
+    def __init__(self, settings: Dict[str, Any], target: str, profile: bool = False):
+        self.settings = settings
+        self.target = target
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.trace_id = f"{stamp}-{_safe_name(target)}-{uuid.uuid4().hex[:6]}"
+        self.attrs: Dict[str, Any] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        # perf_counter -> Unix time, for absolute timestamps in the files.
+        self._epoch_offset = time.time() - self.started
+        self.profile = profile
+        self.profiled = False
+        self._profiler: Optional[cProfile.Profile] = None
+
+    def add(
+        self,
+        name: str,
+        started: float,
+        ended: float,
+        attrs: Optional[Dict[str, Any]] = None,
+        parent: str = "check",
+    ) -> None:
+        self.spans.append({"name": name, "parent": parent, "start": started, "end": ended, "attrs": attrs or {}})
+
+    def __enter__(self) -> "Trace":
+        self._token = _current.set(self)
+        if self.profile and _profiler_lock.acquire(blocking=False):
+            self._profiler = cProfile.Profile()
+            self.profiled = True
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.ended = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.disable()
+            _profiler_lock.release()
+        _current.reset(self._token)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.ended or time.perf_counter()) - self.started) * 1000
+
+    # Writes the trace (and profile) unless the check was faster than
+    # min_duration_ms; returns the trace path. Does file I/O, so async
+    # callers run it in a thread.
+    def write(self) -> Optional[str]:
+        if self.duration_ms < float(self.settings["min_duration_ms"]):
+            return None
+        directory = self.settings["dir"]
+        ensure_dir(directory)
+        fmt = self.settings["format"]
+        path = os.path.join(directory, self.trace_id + FORMAT_SUFFIXES.get(fmt, ".ndjson"))
+        with open(path, "w", encoding="utf-8") as handle:
+            if fmt == "chrome":
+                json.dump(self.chrome_events(), handle)
+            else:
+                for record in self.records():
+                    handle.write(json.dumps(record, sort_keys=True) + "\n")
+        if self._profiler is not None:
+            self._profiler.dump_stats(os.path.join(directory, self.trace_id + ".prof"))
+        _enforce_retention(directory, int(self.settings["max_files"]))
+        return path
+
+    def _root(self) -> Dict[str, Any]:
+        return {
+            "name": "check",
+            "start": self.started,
+            "end": self.ended or time.perf_counter(),
+            "attrs": {"target": self.target, "profiled": self.profiled, **self.attrs},
+        }
+
+    # Parents come before their children: a parent span starts no later and,
+    # on a tie, ends later.
+    def records(self) -> List[Dict[str, Any]]:
+        spans = sorted(self.spans, key=lambda span: (span["start"], -span["end"]))
+        return [self._record(self._root(), None)] + [self._record(span, span["parent"]) for span in spans]
+
+    def _record(self, span: Dict[str, Any], parent: Optional[str]) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": span["name"],
+            "parent": parent,
+            "start": _iso(self._epoch_offset + span["start"]),
+            "offset_ms": round((span["start"] - self.started) * 1000, 3),
+            "duration_ms": round((span["end"] - span["start"]) * 1000, 3),
+            "attrs": span["attrs"],
+        }
+
+    def chrome_events(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": self.target}}
+        ]
+        for span in [self._root(), *self.spans]:
+            events.append(
+                {
+                    "name": span["name"],
+                    "cat": "check",
+                    "ph": "X",
+                    "ts": round((self._epoch_offset + span["start"]) * 1e6),
+                    "dur": round((span["end"] - span["start"]) * 1e6),
+                    "pid": pid,
+                    "tid": 1,
+                    "args": span["attrs"],
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": self.trace_id}}
+
+
+def tracing_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {**DEFAULT_TRACING, **(config["runtime"].get("tracing") or {})}
+
+
+# Context manager around one check: a Trace when tracing is enabled and the
+# check is sampled, otherwise a no-op that yields None.
+def start_trace(config: Dict[str, Any], target: str):
+    settings = tracing_settings(config)
+    if not settings.get("enabled") or random.random() >= float(settings["sample_rate"]):
+        return _NOT_TRACED
+    profile = random.random() < float(settings["profile_sample_rate"])
+    return Trace(settings, target, profile)
+
+
+def write_trace(trace: Trace) -> Optional[str]:
+    try:
+        return trace.write()
+    except Exception as exc:
+        logger.warning("Failed to write trace %s: %s", trace.trace_id, exc)
+        return None
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+# Adds attributes (status, ...) to the root span of the current trace.
+def annotate(**attrs: Any) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+# Records a span from a perf_counter start to now in the current trace, as a
+# child of `parent` (the root check span by default).
+def record_span(name: str, started: float, parent: str = "check", **attrs: Any) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started, time.perf_counter(), attrs, parent)
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "parent", "started")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: str):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record_span(self.name, self.started, self.parent, **self.attrs)
+
+
+def span(name: str, parent: str = "check", **attrs: Any) -> _Span:
+    return _Span(name, attrs, parent)
+
+
+def _enforce_retention(directory: str, max_files: int) -> None:
+    if max_files <= 0:
+        return
+    files = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            files.append((os.stat(path).st_mtime, path))
+        except OSError:
+            continue
+    files.sort()
+    for _, path in files[: max(0, len(files) - max_files)]:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+
+def _safe_name(name: str) -> str:
+    return "".join(char if char.isalnum() or char in "-_" else "_" for char in name) or "default"
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
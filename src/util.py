@@ -2,6 +2,7 @@ import hashlib
 import json
 import os
 import random
+import time
 from datetime import datetime, timezone
 from typing import Any, Dict, Iterable, List
 
@@ -10,6 +11,10 @@ def iso_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
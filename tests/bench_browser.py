@@ -0,0 +1,80 @@
+"""Browser launch vs per-check cost.
+
+Loads a parser fixture with a fresh Chromium per check (what `check-once`
+does) and with one BrowserSession that opens a new context per check (what
+`run` does), then reports the median wall time of each:
+
+    python -m tests.bench_browser --checks 20
+
+Needs Chromium (`playwright install chromium`).
+"""
+
+import argparse
+import os
+import statistics
+import time
+from typing import List, Optional
+
+from playwright.sync_api import sync_playwright
+
+from src.browser import BrowserSession
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "parser", "multi_day.html")
+
+
+def load(context, url: str) -> None:
+    page = context.new_page()
+    page.goto(url, wait_until="load")
+    page.content()
+
+
+def cold_checks(url: str, checks: int) -> List[float]:
+    timings = []
+    with sync_playwright() as playwright:
+        for _ in range(checks):
+            started = time.perf_counter()
+            browser = playwright.chromium.launch(headless=True)
+            context = browser.new_context()
+            load(context, url)
+            context.close()
+            browser.close()
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def session_checks(url: str, checks: int) -> List[float]:
+    session = BrowserSession({"headless": True, "browser": {"max_checks_per_browser": checks + 1}})
+    timings = []
+    launch_ms = 0
+    try:
+        for _ in range(checks):
+            started = time.perf_counter()
+            context, info = session.new_context()
+            try:
+                load(context, url)
+            finally:
+                session.release(context)
+            launch_ms += info["launch_ms"]
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        session.close()
+    print(f"session launch: {launch_ms} ms (first check only)")
+    return timings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Browser launch vs reused-session benchmark")
+    parser.add_argument("--checks", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    url = "file://" + os.path.abspath(FIXTURE)
+    cold = cold_checks(url, args.checks)
+    reused = session_checks(url, args.checks)
+
+    print(f"launch per check:  median {statistics.median(cold):7.1f} ms, total {sum(cold) / 1000:6.1f} s")
+    print(f"reused browser:    median {statistics.median(reused):7.1f} ms, total {sum(reused) / 1000:6.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
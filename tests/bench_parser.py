@@ -0,0 +1,167 @@
+"""Parser throughput and allocation benchmark.
+
+Runs parse_availability, detect_blocked and extract_slots over the fixture
+corpus in tests/fixtures/parser (plus a generated calendar of several hundred KB) and
+compares the result with the stored baseline:
+
+    python -m tests.bench_parser                     # gate against baseline
+    python -m tests.bench_parser --update-baseline   # record a new baseline
+    python -m tests.bench_parser --dumps data/html   # also time real dumps
+
+Throughput depends on the machine, so record the baseline where the gate runs.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.artifacts import read_html_dump
+from src.parser import detect_blocked, extract_slots, html_to_text, parse_availability
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "parser")
+BASELINE_PATH = os.path.join(FIXTURE_DIR, "baseline.json")
+UNAVAILABLE = ["keine freien termine", "keine termine verfügbar"]
+DEFAULT_TOLERANCE = 0.3
+HUGE_WEEKS = 600
+PYTHON = f"{sys.version_info.major}.{sys.version_info.minor}"
+
+Page = Tuple[str, str, str]
+
+
+def huge_page(weeks: int = HUGE_WEEKS) -> str:
+    start = date(2024, 10, 14)
+    rows = []
+    for week in range(weeks):
+        cells = []
+        for offset in range(5):
+            day = start + timedelta(days=week * 7 + offset)
+            slots = "<a class='tl-slot'>09:30</a><a class='tl-slot'>13:00</a>"
+            cells.append(f"<td><div class='tl-date'>{day:%d.%m.%Y}</div>{slots}</td>")
+        rows.append(f"<tr data-week='{week}'>{''.join(cells)}</tr>")
+    filler = "<style>" + ".tl-slot{color:#005a9c}" * 2000 + "</style>"
+    return f"<html><head>{filler}</head><body><table>{''.join(rows)}</table></body></html>"
+
+
+def load_corpus(dump_dir: Optional[str] = None) -> List[Page]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        html = read_html_dump(path)
+        pages.append((os.path.basename(path), html, html_to_text(html)))
+    html = huge_page()
+    pages.append(("huge", html, html_to_text(html)))
+    if dump_dir:
+        for path in sorted(glob.glob(os.path.join(dump_dir, "*.html*"))):
+            html = read_html_dump(path)
+            pages.append((os.path.basename(path), html, html_to_text(html)))
+    return pages
+
+
+def _cases() -> Dict[str, Callable[[Page], Any]]:
+    return {
+        "parse_availability": lambda page: parse_availability(page[2], page[0], UNAVAILABLE, html=page[1]),
+        "detect_blocked": lambda page: detect_blocked(page[2]),
+        "extract_slots": lambda page: extract_slots(page[2]),
+    }
+
+
+def measure(pages: List[Page], min_seconds: float = 0.5) -> Dict[str, Dict[str, float]]:
+    page_bytes = sum(len(page[1].encode("utf-8")) for page in pages)
+    results = {}
+    for name, func in _cases().items():
+        rounds = 0
+        started = time.perf_counter()
+        while True:
+            for page in pages:
+                func(page)
+            rounds += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_seconds:
+                break
+
+        tracemalloc.start()
+        for page in pages:
+            func(page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "pages_per_s": round(rounds * len(pages) / elapsed, 1),
+            "mb_per_s": round(rounds * page_bytes / elapsed / 1e6, 2),
+            "peak_alloc_kb": round(peak / 1024, 1),
+        }
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    check_throughput: bool = True,
+) -> List[str]:
+    failures = []
+    same_python = baseline.get("python") == PYTHON
+    for name, stats in results.items():
+        expected = baseline.get("results", {}).get(name)
+        if not expected:
+            continue
+        if check_throughput and stats["mb_per_s"] < expected["mb_per_s"] * (1 - tolerance):
+            failures.append(f"{name}: {stats['mb_per_s']} MB/s, baseline {expected['mb_per_s']} MB/s")
+        # Allocation sizes shift between interpreter versions, not between runs.
+        if same_python and stats["peak_alloc_kb"] > expected["peak_alloc_kb"] * (1 + tolerance):
+            failures.append(
+                f"{name}: peak {stats['peak_alloc_kb']} KiB, baseline {expected['peak_alloc_kb']} KiB"
+            )
+    return failures
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parser benchmark and regression gate")
+    parser.add_argument("--update-baseline", action="store_true", help="Store results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--dumps", help="Directory of saved HTML dumps to include (not stored in baselines)")
+    args = parser.parse_args(argv)
+
+    results = measure(load_corpus())
+    for name, stats in results.items():
+        print(
+            f"{name:20} {stats['pages_per_s']:>10} pages/s {stats['mb_per_s']:>8} MB/s "
+            f"{stats['peak_alloc_kb']:>10} KiB peak"
+        )
+    if args.dumps:
+        dump_results = measure(load_corpus(args.dumps))
+        for name, stats in dump_results.items():
+            print(f"{name + ' +dumps':20} {stats['pages_per_s']:>10} pages/s {stats['mb_per_s']:>8} MB/s")
+
+    if args.update_baseline:
+        baseline = {"python": PYTHON, "results": results}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    baseline = load_baseline()
+    if not baseline:
+        print("No baseline stored; run with --update-baseline")
+        return 0
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Rate-limit query and migration benchmark on a large SQLite history.
+
+Builds a pre-migration checks table, times the old ISO-text rate-limit
+queries, migrates it (epoch backfill and indexes) and times the new ones:
+
+    python -m tests.bench_store --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from src.store import SQLITE_SCHEMA, Store
+
+LEGACY_COUNT_SQL = "SELECT COUNT(*) FROM checks WHERE checked_at >= ?"
+LEGACY_OLDEST_SQL = "SELECT checked_at FROM checks WHERE checked_at >= ? ORDER BY checked_at ASC LIMIT 1"
+
+
+def build_legacy_db(path: str, rows: int, interval_seconds: int = 30) -> datetime:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    offsets = [timezone.utc, timezone(timedelta(hours=2))]
+    evidence = {"url": "https://example.com", "target": "einstufung", "date_count": 0, "slot_time_count": 0}
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+
+    def generate():
+        for index in range(rows):
+            checked = (start + timedelta(seconds=index * interval_seconds)).astimezone(offsets[index % 2])
+            yield (checked.isoformat(), "unavailable", "[]", "h", json.dumps(evidence), None)
+
+    conn.executemany(
+        "INSERT INTO checks (checked_at, status, slots_json, result_hash, evidence_json, error) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        generate(),
+    )
+    conn.commit()
+    conn.close()
+    return start + timedelta(seconds=rows * interval_seconds)
+
+
+def timed(func: Callable[[], object], repeat: int = 5) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Store migration and rate-limit query benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        started = time.perf_counter()
+        end = build_legacy_db(path, args.rows)
+        print(f"built {args.rows} legacy rows in {time.perf_counter() - started:.1f} s")
+
+        window_start = end - timedelta(hours=1)
+        conn = sqlite3.connect(path)
+        legacy_count = timed(lambda: conn.execute(LEGACY_COUNT_SQL, (window_start.isoformat(),)).fetchone())
+        legacy_oldest = timed(lambda: conn.execute(LEGACY_OLDEST_SQL, (window_start.isoformat(),)).fetchone())
+        conn.close()
+
+        store = Store({"sqlite_path": path})
+        started = time.perf_counter()
+        store.init_db()
+        migrate_seconds = time.perf_counter() - started
+        since = window_start.timestamp()
+        count = timed(lambda: store.count_checks_since(since))
+        oldest = timed(lambda: store.oldest_check_since(since))
+        store.close()
+
+    print(f"migration (backfill + indexes): {migrate_seconds:.1f} s")
+    print(f"count_checks_since:  {legacy_count:8.2f} ms -> {count:6.3f} ms")
+    print(f"oldest_check_since:  {legacy_oldest:8.2f} ms -> {oldest:6.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
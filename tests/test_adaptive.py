@@ -0,0 +1,89 @@
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.adaptive import AdaptiveSchedule, allocate_rates, availability_periods, evaluate
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.store import INSERT_CHECK_SQL, Store, _check_row
+
+BERLIN = ZoneInfo("Europe/Berlin")
+START = datetime(2024, 9, 2, tzinfo=BERLIN)  # a Monday
+
+
+# Eight weeks of checks every ~7 minutes; slots show up on Tuesdays and
+# Thursdays at 09:00-09:20 local time and are gone 15 minutes later.
+def _history(store, weeks=8, seed=7):
+    rng = random.Random(seed)
+    openings = []
+    for week in range(weeks):
+        for weekday in (1, 3):
+            day = START + timedelta(days=week * 7 + weekday)
+            opened = day.replace(hour=9) + timedelta(minutes=rng.uniform(0, 20))
+            openings.append((opened.timestamp(), opened.timestamp() + 900))
+    rows = []
+    epoch = START.timestamp()
+    end = epoch + weeks * 7 * 86400
+    while epoch < end:
+        status = "available" if any(start <= epoch < stop for start, stop in openings) else "unavailable"
+        checked_at = datetime.fromtimestamp(epoch, BERLIN).isoformat()
+        rows.append(_check_row(checked_at, status, "[]", status, "{}", None))
+        epoch += rng.uniform(336, 504)
+    store.transact(lambda conn: conn.executemany(INSERT_CHECK_SQL, rows))
+    return end
+
+
+def _config(**adaptive):
+    return deep_merge(
+        DEFAULT_CONFIG,
+        {"schedule": {"interval_seconds": 420, "adaptive": {"enabled": True, **adaptive}}},
+    )
+
+
+def test_allocation_keeps_budget_and_bounds():
+    rates = allocate_rates([1, 1, 10, 1], total=20, low=2, high=12)
+    assert abs(sum(rates) - 20) < 1e-6
+    assert rates[2] == 12
+    assert min(rates) >= 2
+    assert allocate_rates([1, 5], total=100, low=2, high=12) == [12, 12]
+
+
+def test_schedule_concentrates_checks_on_hot_windows(tmp_path):
+    store = Store({"sqlite_path": str(tmp_path / "state.db")})
+    store.init_db()
+    end = _history(store)
+    periods = list(availability_periods(store, None, START.timestamp(), end))
+    assert len(periods) == 16
+
+    config = _config()
+    schedule = AdaptiveSchedule.from_history(config, store, end)
+    tuesday_nine = (START + timedelta(days=1, hours=9, minutes=10)).timestamp()
+    sunday_night = (START + timedelta(days=6, hours=3)).timestamp()
+    assert schedule.delay_at(tuesday_nine) == 300  # 3600 / max_checks_per_hour
+    assert schedule.delay_at(sunday_night) > 420
+    assert schedule.hot_windows(2)[0]["window"] in ("Tue 09:00", "Thu 09:00")
+    store.close()
+
+
+def test_check_moves_to_the_start_of_a_hotter_hour():
+    counts = [0] * (7 * 24)
+    counts[24 + 9] = 10  # Tuesday 09:00
+    schedule = AdaptiveSchedule(counts, 1200, 12, 3600, BERLIN)
+    tuesday_seven_fifty = (START + timedelta(days=1, hours=7, minutes=50)).timestamp()
+    assert schedule.intervals[24 + 7] > 600
+    assert schedule.delay_at(tuesday_seven_fifty) == 600
+    tuesday_eight_fifty_eight = (START + timedelta(days=1, hours=8, minutes=58)).timestamp()
+    assert schedule.delay_at(tuesday_eight_fifty_eight) == 300  # never below the hourly limit
+
+
+def test_evaluation_reduces_latency_within_the_hourly_limit(tmp_path):
+    store = Store({"sqlite_path": str(tmp_path / "state.db")})
+    store.init_db()
+    end = _history(store)
+
+    report = evaluate(_config(lookback_days=42), store, now=end, test_days=14)
+    fixed, adaptive = report["fixed"], report["adaptive"]
+    assert report["periods"] == 4
+    assert adaptive["max_checks_per_hour"] <= 12
+    assert adaptive["checks"] <= fixed["checks"] * 1.01
+    assert adaptive["mean_latency_s"] < fixed["mean_latency_s"]
+    store.close()
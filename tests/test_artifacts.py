@@ -0,0 +1,122 @@
+import gzip
+import os
+import time
+
+from src import checker_playwright
+from src.artifacts import ArtifactWriter, read_html_dump
+from src.config import DEFAULT_CONFIG, deep_merge
+
+
+def _writer(tmp_path, **settings):
+    return ArtifactWriter(str(tmp_path / "html"), str(tmp_path / "shots"), settings)
+
+
+def test_html_is_compressed_and_deduplicated(tmp_path):
+    writer = _writer(tmp_path)
+    writer.submit("error", "<html>same</html>", b"png-bytes")
+    writer.submit("error", "<html>same</html>", b"png-bytes")
+    writer.submit("blocked", "<html>other</html>", None)
+    writer.close()
+
+    html_files = sorted(os.listdir(tmp_path / "html"))
+    assert len(html_files) == 2
+    assert all(name.endswith(".html.gz") for name in html_files)
+    assert len(os.listdir(tmp_path / "shots")) == 1
+    assert writer.deduplicated == 2
+
+    contents = {read_html_dump(str(tmp_path / "html" / name)) for name in html_files}
+    assert contents == {"<html>same</html>", "<html>other</html>"}
+    with gzip.open(tmp_path / "html" / html_files[0]) as handle:
+        assert handle.read().startswith(b"<html>")
+
+
+def test_retention_by_count_and_age(tmp_path):
+    html_dir = tmp_path / "html"
+    html_dir.mkdir()
+    stale = html_dir / "error-old-0000000000000000.html.gz"
+    stale.write_bytes(b"x")
+    old = time.time() - 3 * 86400
+    os.utime(stale, (old, old))
+
+    writer = _writer(tmp_path, max_files=3, max_age_days=1)
+    for index in range(5):
+        writer.submit("error", f"<html>{index}</html>", None)
+    writer.close()
+
+    remaining = os.listdir(html_dir)
+    assert len(remaining) == 3
+    assert stale.name not in remaining
+
+
+def test_retention_by_total_bytes(tmp_path):
+    writer = _writer(tmp_path, max_total_mb=0.001)
+    for index in range(3):
+        writer.submit("error", os.urandom(600).hex(), None)
+    writer.close()
+    total = sum(os.path.getsize(tmp_path / "html" / name) for name in os.listdir(tmp_path / "html"))
+    assert total <= 1024 * 1024 * 0.001
+
+
+class BlockedPage:
+    url = "https://www.terminland.de/DAA/"
+    status = 403
+
+    def __init__(self):
+        self.content_calls = 0
+
+    def goto(self, url, wait_until, timeout):
+        return self
+
+    def wait_for_load_state(self, state, timeout):
+        pass
+
+    def wait_for_function(self, script, arg, timeout, polling):
+        raise checker_playwright.PlaywrightTimeoutError("timeout")
+
+    def inner_text(self, selector):
+        return "Access denied"
+
+    def content(self):
+        self.content_calls += 1
+        return "<html><body>Access denied</body></html>"
+
+    def screenshot(self, full_page=False):
+        return b"png-bytes"
+
+
+class OnePageSession:
+    def __init__(self, page):
+        self.page = page
+
+    def new_context(self):
+        return self, {"launch_ms": 0, "reused": True}
+
+    def route(self, pattern, handler):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    def new_page(self):
+        return self.page
+
+    def release(self, context):
+        pass
+
+
+def test_blocked_check_dumps_the_html_it_already_read(monkeypatch):
+    submitted = []
+
+    class Writer:
+        def submit(self, prefix, html, screenshot):
+            submitted.append((prefix, html, screenshot))
+
+    monkeypatch.setattr(checker_playwright, "get_artifact_writer", lambda runtime: Writer())
+    page = BlockedPage()
+    config = deep_merge(DEFAULT_CONFIG, {"target": {"url": page.url}})
+
+    result = checker_playwright.check_with_playwright(config, OnePageSession(page))
+
+    assert result["status"] == "blocked"
+    assert page.content_calls == 1
+    assert submitted == [("blocked", "<html><body>Access denied</body></html>", b"png-bytes")]
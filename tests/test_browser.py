@@ -0,0 +1,170 @@
+import asyncio
+
+from src import browser
+from src.browser import AsyncBrowserSession, BrowserSession
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    def new_context(self, user_agent=None):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.stopped = False
+        self.chromium = self
+
+    def start(self):
+        return self
+
+    def launch(self, headless=True):
+        fake = FakeBrowser()
+        self.browsers.append(fake)
+        return fake
+
+    def stop(self):
+        self.stopped = True
+
+
+def _session(monkeypatch, **browser_cfg):
+    fake = FakePlaywright()
+    monkeypatch.setattr(browser, "sync_playwright", lambda: fake)
+    return BrowserSession({"headless": True, "browser": browser_cfg}), fake
+
+
+def _check(session):
+    context, info = session.new_context()
+    session.release(context)
+    return info
+
+
+def test_browser_is_reused_then_recycled_after_max_checks(monkeypatch):
+    session, fake = _session(monkeypatch, max_checks_per_browser=3)
+
+    infos = [_check(session) for _ in range(4)]
+
+    assert [info["reused"] for info in infos] == [False, True, True, False]
+    assert [info["checks_on_browser"] for info in infos] == [1, 2, 3, 1]
+    assert infos[3]["recycled"] == "max_checks"
+    assert len(fake.browsers) == 2 and fake.browsers[0].closed
+    assert all(context.closed for context in fake.browsers[0].contexts)
+    session.close()
+    assert fake.browsers[1].closed and fake.stopped
+
+
+def test_browser_is_recycled_above_memory_ceiling(monkeypatch):
+    session, fake = _session(monkeypatch, max_memory_mb=300)
+    rss = iter([120.0, 450.0])
+    monkeypatch.setattr(browser, "descendant_rss_mb", lambda: next(rss))
+
+    infos = [_check(session) for _ in range(3)]
+
+    assert "recycled" not in infos[1]
+    assert infos[2]["recycled"] == "max_memory"
+    assert session.launch_count == 2 and fake.browsers[0].closed
+
+
+def test_memory_ceiling_is_ignored_without_proc(monkeypatch):
+    session, fake = _session(monkeypatch, max_memory_mb=300)
+    monkeypatch.setattr(browser, "descendant_rss_mb", lambda: None)
+
+    infos = [_check(session) for _ in range(3)]
+
+    assert [info["reused"] for info in infos] == [False, True, True]
+    assert session.launch_count == 1
+
+
+def test_browser_is_relaunched_after_crash(monkeypatch):
+    session, fake = _session(monkeypatch)
+
+    context, _ = session.new_context()
+    fake.browsers[0].connected = False  # crashed during the check
+    session.release(context)
+    info = _check(session)
+
+    assert info["reused"] is False and "recycled" not in info
+    assert session.launch_count == 2 and fake.browsers[0].closed
+
+    # A crash between checks is noticed when the next context is opened.
+    fake.browsers[1].connected = False
+    info = _check(session)
+    assert info["recycled"] == "disconnected"
+    assert session.launch_count == 3
+
+
+class AsyncFakeContext(FakeContext):
+    async def close(self):
+        self.closed = True
+
+
+class AsyncFakeBrowser(FakeBrowser):
+    async def new_context(self, user_agent=None):
+        context = AsyncFakeContext()
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class AsyncFakePlaywright(FakePlaywright):
+    async def start(self):
+        return self
+
+    async def launch(self, headless=True):
+        fake = AsyncFakeBrowser()
+        self.browsers.append(fake)
+        return fake
+
+    async def stop(self):
+        self.stopped = True
+
+
+def test_async_recycle_waits_for_contexts_in_flight(monkeypatch):
+    fake = AsyncFakePlaywright()
+    monkeypatch.setattr(browser, "async_playwright", lambda: fake)
+    session = AsyncBrowserSession({"headless": True, "browser": {"max_checks_per_browser": 1}})
+
+    async def main():
+        first, _ = await session.new_context()
+        second, _ = await session.new_context()
+        await session.release(first)
+        # The browser is due for recycling, but `second` is still open on it.
+        third_task = asyncio.create_task(session.new_context())
+        await asyncio.sleep(0)
+        assert not third_task.done() and not fake.browsers[0].closed
+        await session.release(second)
+        third, info = await third_task
+        await session.release(third)
+        await session.close()
+        return info
+
+    info = asyncio.run(main())
+
+    assert info["recycled"] == "max_checks" and info["reused"] is False
+    assert len(fake.browsers) == 2 and fake.browsers[0].closed
+    assert fake.stopped
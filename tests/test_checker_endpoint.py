@@ -0,0 +1,146 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.checker_endpoint import (
+    EndpointSessionExpired,
+    build_profile,
+    poll_endpoint,
+    score_payload,
+    slots_from_json,
+)
+from src.checker_http import HttpPool
+from src.config import DEFAULT_CONFIG, deep_merge
+
+
+def test_slots_from_json_pairs_dates_with_times():
+    payload = {
+        "termine": [
+            {"datum": "14.10.2024", "zeit": "9:30"},
+            {"start": "2024-10-15T10:15:00+02:00"},
+            {"label": "16.10.2024 11:00"},
+        ]
+    }
+    slots, text = slots_from_json(payload)
+    assert sorted((slot["date"], slot["time"]) for slot in slots) == [
+        ("2024-10-14", "09:30"),
+        ("2024-10-15", "10:15"),
+        ("2024-10-16", "11:00"),
+    ]
+    assert "termine" in text
+
+
+def test_slots_from_json_ignores_metadata_and_closed_entries():
+    payload = {
+        "days": [
+            {"date": "2026-10-20", "time": "09:00", "free": False},
+            {"date": "2026-10-21", "time": "10:30", "free": True},
+            {"datum": "22.10.2026", "bookable": False, "zeiten": [{"zeit": "11:00"}]},
+        ],
+        "updated": "2026-10-17T10:00:00",
+        "meta": {"generatedAt": "2026-10-17T10:00:00"},
+    }
+    slots, text = slots_from_json(payload)
+    assert slots == [{"date": "2026-10-21", "time": "10:30"}]
+    assert "2026-10-17T10:00:00" in text
+
+    closed_only = {"days": [{"date": "2026-10-20", "time": "09:00", "free": False}], "updated": "2026-10-17T10:00:00"}
+    assert slots_from_json(closed_only)[0] == []
+
+
+def test_score_prefers_availability_payloads():
+    assert score_payload({"termine": [{"datum": "14.10.2024", "zeit": "09:30"}]}) > score_payload(
+        {"user": {"language": "de"}}
+    )
+    assert score_payload({"config": {"theme": "dark"}}) == 0
+
+
+def test_build_profile_keeps_replayable_headers_and_cookies():
+    profile = build_profile(
+        "https://example.com/api/slots",
+        "POST",
+        '{"month": 10}',
+        {"content-type": "application/json", "cookie": "stale", "x-requested-with": "XMLHttpRequest"},
+        [{"name": "SID", "value": "abc"}, {"name": "lang", "value": "de"}],
+    )
+    assert profile["headers"] == {
+        "content-type": "application/json",
+        "x-requested-with": "XMLHttpRequest",
+        "Cookie": "SID=abc; lang=de",
+    }
+
+
+class EndpointHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if "SID=valid" not in (self.headers.get("Cookie") or ""):
+            body = b'{"error": "session expired"}'
+            self.send_response(401)
+        else:
+            body = json.dumps(self.server.payload).encode("utf-8")
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    stand_in = ThreadingHTTPServer(("127.0.0.1", 0), EndpointHandler)
+    stand_in.payload = {"termine": []}
+    thread = threading.Thread(target=stand_in.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in
+    stand_in.shutdown()
+    stand_in.server_close()
+
+
+def _profile(server, sid):
+    return build_profile(
+        f"http://127.0.0.1:{server.server_port}/api/slots",
+        "POST",
+        "{}",
+        {"content-type": "application/json"},
+        [{"name": "SID", "value": sid}],
+    )
+
+
+def test_poll_endpoint_reads_slots(server):
+    config = deep_merge(DEFAULT_CONFIG, {"target": {"mode": "endpoint"}})
+    pool = HttpPool()
+    server.payload = {"termine": [{"datum": "2024-10-14", "zeit": "09:30"}]}
+
+    result = poll_endpoint(config, _profile(server, "valid"), pool)
+    assert result["status"] == "available"
+    assert result["slots"] == [{"date": "2024-10-14", "time": "09:30"}]
+
+    server.payload = {"termine": [], "meldung": "Keine freien Termine"}
+    result = poll_endpoint(config, _profile(server, "valid"), pool)
+    assert result["status"] == "unavailable"
+
+    # Times in metadata or in entries marked not free do not make it available.
+    server.payload = {
+        "days": [{"date": "2026-10-20", "time": "09:00", "free": False}],
+        "updated": "2026-10-17T10:00:00",
+    }
+    result = poll_endpoint(config, _profile(server, "valid"), pool)
+    assert result["status"] == "unavailable"
+    assert result["slots"] == []
+    assert pool.connections_opened == 1
+    pool.close()
+
+
+def test_poll_endpoint_detects_expired_session(server):
+    config = deep_merge(DEFAULT_CONFIG, {"target": {"mode": "endpoint"}})
+    pool = HttpPool()
+    with pytest.raises(EndpointSessionExpired):
+        poll_endpoint(config, _profile(server, "expired"), pool)
+    pool.close()
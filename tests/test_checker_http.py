@@ -0,0 +1,187 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import scheduler
+from src.checker_http import HttpPrecheck, check_with_http
+from src.config import DEFAULT_CONFIG, deep_merge
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if self.path == "/blocked":
+            self._send(429, b"Too Many Requests")
+            return
+        etag = f'"v{server.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, server.body.encode("utf-8"), etag)
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.requests = []
+        self.connections = 0
+        self.version = 1
+        self.body = "<html><head><meta name='robots'></head><body>keine freien Termine</body></html>"
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer()
+    thread = threading.Thread(target=stand_in.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in
+    stand_in.shutdown()
+    stand_in.server_close()
+
+
+def _config(url):
+    return deep_merge(DEFAULT_CONFIG, {"target": {"url": url, "mode": "http"}})
+
+
+def _browser_result(config):
+    return {
+        "status": "unavailable",
+        "slots": [],
+        "checked_at": "2024-10-01T00:00:00+00:00",
+        "evidence": {"url": config["target"]["url"], "timings": {"check_ms": 4000}},
+    }
+
+
+def test_escalates_until_a_browser_result_is_known(server):
+    config = _config(f"http://127.0.0.1:{server.server_port}/")
+    precheck = HttpPrecheck()
+
+    assert check_with_http(config, precheck) is None
+    precheck.remember(config, _browser_result(config))
+
+    result = check_with_http(config, precheck)
+    assert result["status"] == "unavailable"
+    assert result["evidence"]["precheck"]["decision"] == "not_modified"
+    assert "timings" not in result["evidence"]
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+    precheck.close()
+
+
+def test_changed_content_escalates_again(server):
+    config = _config(f"http://127.0.0.1:{server.server_port}/")
+    precheck = HttpPrecheck()
+    check_with_http(config, precheck)
+    precheck.remember(config, _browser_result(config))
+
+    server.version = 2
+    server.body = "<html><body>Freie Termine: 14.10.2024 09:30</body></html>"
+    assert check_with_http(config, precheck) is None
+    precheck.close()
+
+
+def test_fingerprint_match_without_validators(server):
+    config = _config(f"http://127.0.0.1:{server.server_port}/")
+    precheck = HttpPrecheck()
+    check_with_http(config, precheck)
+    precheck.remember(config, _browser_result(config))
+
+    # A server that ignores If-None-Match still resolves through the fingerprint.
+    precheck.update(config["target"]["url"], etag=None)
+    result = check_with_http(config, precheck)
+    assert result["evidence"]["precheck"]["decision"] == "fingerprint_match"
+    precheck.close()
+
+
+def test_cached_result_expires_after_max_reuse_seconds(server):
+    config = deep_merge(
+        _config(f"http://127.0.0.1:{server.server_port}/"),
+        {"target": {"http_precheck": {"max_reuse_seconds": 60}}},
+    )
+    precheck = HttpPrecheck()
+    check_with_http(config, precheck)
+    precheck.remember(config, _browser_result(config))
+    url = config["target"]["url"]
+
+    precheck.update(url, rendered_at=time.monotonic() - 59)
+    assert check_with_http(config, precheck)["evidence"]["precheck"]["result_age_seconds"] == 59
+
+    # Still 304, but the render is too old: the browser has to look again.
+    precheck.update(url, rendered_at=time.monotonic() - 61)
+    assert check_with_http(config, precheck) is None
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+
+    precheck.remember(config, _browser_result(config))
+    assert check_with_http(config, precheck)["evidence"]["precheck"]["decision"] == "not_modified"
+    precheck.close()
+
+
+def test_blocked_status_is_decided_without_browser(server):
+    config = _config(f"http://127.0.0.1:{server.server_port}/blocked")
+    precheck = HttpPrecheck()
+    result = check_with_http(config, precheck)
+    assert result["status"] == "blocked"
+    assert result["evidence"]["blocked_reason"] == "status"
+    precheck.close()
+
+
+def test_hidden_block_text_escalates_to_the_browser(server):
+    config = _config(f"http://127.0.0.1:{server.server_port}/")
+    precheck = HttpPrecheck()
+    check_with_http(config, precheck)
+    precheck.remember(config, _browser_result(config))
+
+    server.version = 2
+    server.body = (
+        "<html><body><div style='display:none'>Access denied</div>keine freien Termine</body></html>"
+    )
+    assert check_with_http(config, precheck) is None
+    assert precheck.entry(config["target"]["url"])["result"] is None
+    precheck.close()
+
+
+def test_pool_reuses_connection(server):
+    config = _config(f"http://127.0.0.1:{server.server_port}/")
+    precheck = HttpPrecheck()
+    for _ in range(5):
+        check_with_http(config, precheck)
+    assert precheck.pool.connections_opened == 1
+    assert server.connections == 1
+    precheck.close()
+
+
+def test_one_shot_check_skips_the_precheck(server, monkeypatch):
+    config = _config(f"http://127.0.0.1:{server.server_port}/")
+    monkeypatch.setattr(scheduler, "check_with_playwright", lambda config, session: _browser_result(config))
+
+    assert scheduler.run_once(config)["status"] == "unavailable"
+    assert server.requests == []
+
+    precheck = HttpPrecheck()
+    scheduler.run_once(config, precheck=precheck)
+    assert len(server.requests) == 1
+    assert precheck.entry(config["target"]["url"])["result"]["status"] == "unavailable"
+    precheck.close()
@@ -0,0 +1,44 @@
+import pytest
+
+from src.config import DEFAULT_CONFIG, deep_merge, resolve_targets
+
+
+def test_resolve_targets_without_list_returns_config():
+    assert resolve_targets(DEFAULT_CONFIG) == [DEFAULT_CONFIG]
+
+
+def test_resolve_targets_overrides_per_target():
+    config = deep_merge(
+        DEFAULT_CONFIG,
+        {
+            "targets": [
+                {"name": "a1", "url": "http://example.com/a1"},
+                {
+                    "url": "http://example.com/b1",
+                    "schedule": {"interval_seconds": 900},
+                    "matchers": {"unavailable_text_substrings": ["ausgebucht"]},
+                },
+            ]
+        },
+    )
+    first, second = resolve_targets(config)
+
+    assert first["target"]["name"] == "a1"
+    assert first["storage"]["state_prefix"] == "a1:"
+    assert first["schedule"] == DEFAULT_CONFIG["schedule"]
+
+    assert second["target"]["name"] == "target-2"
+    assert second["target"]["url"] == "http://example.com/b1"
+    assert second["schedule"]["interval_seconds"] == 900
+    assert second["schedule"]["jitter_percent"] == DEFAULT_CONFIG["schedule"]["jitter_percent"]
+    assert second["matchers"]["unavailable_text_substrings"] == ["ausgebucht"]
+    assert second["storage"]["sqlite_path"] == DEFAULT_CONFIG["storage"]["sqlite_path"]
+
+
+def test_resolve_targets_rejects_duplicate_names():
+    config = deep_merge(
+        DEFAULT_CONFIG,
+        {"targets": [{"name": "x", "url": "http://a"}, {"name": "x", "url": "http://b"}]},
+    )
+    with pytest.raises(ValueError):
+        resolve_targets(config)
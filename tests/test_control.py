@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from src import scheduler
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.control import Controller, send_command, serve_control
+from src.rate_limit import RateLimiter
+from src.store import close_stores, init_db
+from src.util import iso_now
+
+
+def test_trigger_ends_only_interruptible_waits():
+    async def main():
+        controller = Controller(["a"])
+        control = controller.targets["a"]
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, controller.trigger, "a")
+        started = time.monotonic()
+        assert await controller.sleep(control, 30, "waiting")
+        interrupted = time.monotonic() - started
+
+        started = time.monotonic()
+        assert await controller.sleep(control, 0.2, "blocked", interruptible=False)
+        uninterrupted = time.monotonic() - started
+
+        loop.call_later(0.05, controller.drain)
+        assert not await controller.sleep(control, 30, "blocked", interruptible=False)
+        return interrupted, uninterrupted
+
+    interrupted, uninterrupted = asyncio.run(main())
+    assert interrupted < 1
+    assert uninterrupted >= 0.2
+
+
+def test_pause_holds_until_resume_or_trigger():
+    async def main():
+        controller = Controller(["a", "b"])
+        control = controller.targets["a"]
+        controller.pause()
+        waiter = asyncio.create_task(controller.wait_while_paused(control))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        assert controller.status()["targets"]["a"]["state"] == "paused"
+        controller.resume("a")
+        assert await waiter
+        assert controller.targets["b"].paused
+
+    asyncio.run(main())
+
+
+def test_endpoint_round_trip():
+    config = deep_merge(DEFAULT_CONFIG, {"runtime": {"control": {"host": "127.0.0.1", "port": 0}}})
+
+    async def main():
+        controller = Controller(["a"])
+        server = await serve_control(controller, config["runtime"]["control"])
+        port = server.sockets[0].getsockname()[1]
+        client = deep_merge(config, {"runtime": {"control": {"port": port}}})
+        try:
+            paused = await asyncio.to_thread(send_command, client, "pause", "a")
+            missing = await asyncio.to_thread(send_command, client, "check", "nope")
+            drain_one = await asyncio.to_thread(send_command, client, "drain", "a")
+            status = await asyncio.to_thread(send_command, client, "status")
+        finally:
+            server.close()
+            await server.wait_closed()
+        draining = controller.draining.is_set()
+        return paused, missing, drain_one, draining, status
+
+    paused, missing, drain_one, draining, status = asyncio.run(main())
+    assert paused == (202, {"pause": ["a"]})
+    assert missing[0] == 404
+    assert drain_one[0] == 400 and not draining
+    assert status[1]["targets"]["a"]["paused"] is True
+
+
+def test_triggered_check_waits_for_the_rate_limiter(tmp_path, monkeypatch):
+    config = deep_merge(
+        DEFAULT_CONFIG,
+        {
+            "target": {"name": "a"},
+            "storage": {"sqlite_path": str(tmp_path / "state.db"), "state_prefix": "a:"},
+            "schedule": {"interval_seconds": 3600, "jitter_percent": 0},
+        },
+    )
+    init_db(config["storage"])
+    checks = []
+
+    async def fake_check(config, session, precheck, endpoints):
+        checks.append(time.time())
+        return {"status": "unavailable", "slots": [], "checked_at": iso_now(), "evidence": {}}
+
+    monkeypatch.setattr(scheduler, "run_once_async", fake_check)
+
+    async def main():
+        controller = Controller(["a"])
+        limiter = RateLimiter(1)
+        task = asyncio.create_task(
+            scheduler._target_loop(config, None, None, None, asyncio.Semaphore(1), limiter, controller)
+        )
+        await asyncio.sleep(0.2)
+        controller.trigger("a")
+        await asyncio.sleep(0.2)
+        state = controller.status()["targets"]["a"]
+        controller.drain()
+        await asyncio.wait_for(task, 5)
+        await scheduler.store_async.close_async_stores()
+        return state
+
+    state = asyncio.run(main())
+    assert len(checks) == 1
+    assert state["state"] == "rate_limited"
+    assert state["last_status"] == "unavailable"
+    assert state["next_check_in_seconds"] > 3500
+    close_stores()
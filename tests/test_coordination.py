@@ -0,0 +1,83 @@
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.coordination import Coordinator, assign_owner
+from src.rate_limit import SharedRateLimiter, make_limiter
+from src.store import close_stores, get_store, init_db
+
+NOW = 1_700_000_000
+
+
+def _config(tmp_path, worker_id):
+    return deep_merge(
+        DEFAULT_CONFIG,
+        {
+            "storage": {"sqlite_path": str(tmp_path / "state.db")},
+            "runtime": {"coordination": {"enabled": True, "worker_id": worker_id, "lease_seconds": 60}},
+        },
+    )
+
+
+def test_assignment_moves_only_the_leaving_workers_targets():
+    targets = [f"target-{index}" for index in range(40)]
+    before = {target: assign_owner(["a", "b", "c"], target) for target in targets}
+    after = {target: assign_owner(["a", "c"], target) for target in targets}
+    assert set(before.values()) == {"a", "b", "c"}
+    assert all(after[target] == owner for target, owner in before.items() if owner != "b")
+
+
+def test_targets_are_sharded_and_taken_over(tmp_path):
+    first = Coordinator(_config(tmp_path, "a"))
+    second = Coordinator(_config(tmp_path, "b"))
+    init_db(first.storage)
+    targets = [f"target-{index}" for index in range(10)]
+
+    # a runs alone and takes everything, including leadership.
+    first.heartbeat(NOW)
+    assert all(first.owns(target, NOW) for target in targets)
+    assert first.is_leader(NOW)
+
+    # b joins; a hands over b's share at its next attempt, b takes it then.
+    second.heartbeat(NOW + 1)
+    first.heartbeat(NOW + 1)
+    owners = {target: assign_owner(["a", "b"], target) for target in targets}
+    for target in targets:
+        assert first.owns(target, NOW + 2) == (owners[target] == "a")
+        assert second.owns(target, NOW + 2) == (owners[target] == "b")
+    assert not second.is_leader(NOW + 2)
+
+    # a dies without releasing: its leases block b until they expire.
+    taken = [target for target in targets if owners[target] == "a"]
+    second.heartbeat(NOW + 30)
+    assert second.live_workers == ["a", "b"]
+    second.heartbeat(NOW + 62)
+    assert second.live_workers == ["b"]
+    assert not second.owns(taken[0], NOW + 62)
+    assert second.owns(taken[0], NOW + 63)
+    assert second.is_leader(NOW + 63)
+    close_stores()
+
+
+def test_stopped_worker_releases_its_leases(tmp_path):
+    first = Coordinator(_config(tmp_path, "a"))
+    second = Coordinator(_config(tmp_path, "b"))
+    init_db(first.storage)
+    first.heartbeat(NOW)
+    assert first.owns("only", NOW)
+    first.stop()
+    assert second.heartbeat(NOW + 1) == ["b"]
+    assert second.owns("only", NOW + 1)
+    close_stores()
+
+
+def test_shared_limiter_holds_the_budget_across_workers(tmp_path):
+    config = deep_merge(_config(tmp_path, "a"), {"limits": {"max_checks_per_hour": 3}})
+    init_db(config["storage"])
+    limiters = [make_limiter(config, config["storage"], worker) for worker in ("a", "b")]
+    assert all(isinstance(limiter, SharedRateLimiter) for limiter in limiters)
+    granted = [limiters[index % 2].reserve(now=NOW + index) for index in range(5)]
+    assert granted[:3] == [0, 0, 0]
+    assert granted[3] == 3600 - 3
+    assert limiters[1].wait_seconds(now=NOW + 3600) == 0
+    assert limiters[0].reserve(now=NOW + 3600) == 0
+    rows = get_store(config["storage"]).fetchall("SELECT worker_id FROM rate_reservations ORDER BY reserved_epoch")
+    assert [row[0] for row in rows] == ["b", "a", "a"]
+    close_stores()
@@ -0,0 +1,61 @@
+import time
+
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.crawl import Crawl, crawl_settings, merge_pages, next_links
+
+
+def test_crawl_disabled_by_default():
+    assert crawl_settings(DEFAULT_CONFIG) is None
+    enabled = deep_merge(DEFAULT_CONFIG, {"target": {"crawl": {"enabled": True, "parallel": 0}}})
+    assert crawl_settings(enabled)["parallel"] == 1
+
+
+def test_next_links_keeps_unseen_same_origin_links():
+    seen = {"https://www.terminland.de/DAA/"}
+    links = next_links(
+        "https://www.terminland.de/DAA/",
+        [
+            "https://www.terminland.de/DAA/?woche=2#top",
+            "https://www.terminland.de/DAA/?woche=2",
+            "https://www.terminland.de/DAA/",
+            "https://evil.example.com/?woche=3",
+            "",
+        ],
+        seen,
+    )
+    assert links == ["https://www.terminland.de/DAA/?woche=2"]
+
+
+def test_merge_pages_unions_slots_and_promotes_status():
+    landing = [{"date": "2024-10-14", "time": "09:30"}]
+    status, slots = merge_pages(
+        "unavailable",
+        [],
+        [("unavailable", []), ("available", landing + landing)],
+    )
+    assert status == "available"
+    assert slots == landing
+
+
+def test_crawl_stops_at_horizon_and_records_pages():
+    base = "https://www.terminland.de/DAA/"
+    settings = crawl_settings(
+        deep_merge(DEFAULT_CONFIG, {"target": {"crawl": {"enabled": True, "horizon_pages": 3, "parallel": 2}}})
+    )
+    crawl = Crawl(base, settings, base)
+    crawl.add_links([f"{base}?woche=1", f"{base}?woche=2"])
+    started = time.perf_counter()
+
+    assert crawl.next_batch() == [f"{base}?woche=1", f"{base}?woche=2"]
+    crawl.page_done(f"{base}?woche=1", started, "available", [{"date": "2024-10-21", "time": "10:00"}])
+    crawl.page_failed(f"{base}?woche=2", started, TimeoutError("slow"))
+    crawl.add_links([f"{base}?woche=2", f"{base}?woche=3", f"{base}?woche=4"])
+    assert crawl.next_batch() == [f"{base}?woche=3"]
+    crawl.page_done(f"{base}?woche=3", started, "unavailable", [])
+    assert crawl.next_batch() == []
+
+    evidence = {"timings": {}}
+    status, slots = crawl.finish("unavailable", [], evidence)
+    assert status == "available" and len(slots) == 1
+    assert evidence["crawl"] == {"pages": 2, "failed": 1}
+    assert evidence["timings"]["crawl_pages"][1]["error"] == "slow"
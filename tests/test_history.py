@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import sys
+
+import pytest
+
+from src import main
+from src.history import export_rows, history_stats, latency_percentiles
+from src.store import Store
+
+DAY = 86400
+
+
+def _store(tmp_path):
+    store = Store({"sqlite_path": str(tmp_path / "state.db")})
+    store.init_db()
+    for hour in range(6):
+        status = "available" if hour in (1, 2) else "unavailable"
+        slots = json.dumps([{"date": "2024-10-20", "time": "09:30"}]) if status == "available" else "[]"
+        store.record_check(
+            f"2024-10-14T{hour:02d}:00:00+00:00", status, slots, status, "{}", None, {},
+            target="a", duration_ms=100 * (hour + 1),
+        )
+    store.record_check("2024-10-15T00:00:00+00:00", "error", "[]", "e", "{}", "timeout", {}, target="a")
+    return store
+
+
+def test_export_streams_ndjson_and_csv(tmp_path):
+    store = _store(tmp_path)
+    out = io.StringIO()
+    assert export_rows(store, out, target="a", until_epoch=1728864000 + 2 * 3600) == 2
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [record["status"] for record in records] == ["unavailable", "available"]
+    assert records[1]["slots"] == [{"date": "2024-10-20", "time": "09:30"}]
+    assert records[1]["duration_ms"] == 200
+
+    out = io.StringIO()
+    assert export_rows(store, out, source="slots", fmt="csv") == 1
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert rows[0]["slot_time"] == "09:30"
+    assert rows[0]["is_open"] == "0"
+    store.close()
+
+
+def test_stats_bucket_uptime_lifetime_and_latency(tmp_path):
+    store = _store(tmp_path)
+    rows = list(history_stats(store, DAY, target="a"))
+    assert [row["bucket"] for row in rows] == ["2024-10-14T00:00:00+00:00", "2024-10-15T00:00:00+00:00", "total"]
+    first, second, total = rows
+    assert (first["checks"], first["available"], first["failed"]) == (6, 2, 0)
+    assert first["available_uptime"] == round(2 / 6, 4)
+    assert first["slots_appeared"] == 1
+    assert first["mean_slot_lifetime_s"] == 3600
+    assert first["latency_p50_ms"] == 350
+    assert first["latency_p99_ms"] == 650
+    assert second["failed"] == 1
+    assert "latency_p50_ms" not in second
+    assert total["checks"] == 7
+    assert total["latency_p90_ms"] == 650
+
+    # Compacted spans keep counting with their check_count.
+    store.compact(raw_before=1728950400 + 1, spans_before=0)
+    compacted = list(history_stats(store, DAY, target="a"))
+    assert compacted[-1]["checks"] == 7
+    assert compacted[-1]["available"] == 2
+    store.close()
+
+
+def test_latency_percentiles_report_bin_upper_edge():
+    assert latency_percentiles([], 50) == {}
+    histogram = [(0, 50), (2, 40), (10, 10)]
+    assert latency_percentiles(histogram, 50) == {
+        "latency_p50_ms": 50,
+        "latency_p90_ms": 150,
+        "latency_p99_ms": 550,
+    }
+
+
+def test_history_rejects_unparseable_since(tmp_path, monkeypatch, capsys):
+    config = tmp_path / "config.yaml"
+    config.write_text(f"storage:\n  sqlite_path: {tmp_path / 'state.db'}\n")
+    argv = ["main", "--config", str(config), "history", "--since", "yesterday"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as exit_info:
+        main.main()
+    assert exit_info.value.code == 2
+    assert "--since: invalid ISO date/time 'yesterday'" in capsys.readouterr().err
+    assert not (tmp_path / "state.db").exists()
@@ -0,0 +1,58 @@
+import asyncio
+import contextlib
+import urllib.request
+
+from src import metrics
+from src.metrics import Registry, observe_check, serve_metrics, timed
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    registry.observe("daa_phase_duration_seconds", 0.2, phase="navigate", target="a")
+    registry.observe("daa_phase_duration_seconds", 3, phase="navigate", target="a")
+    registry.inc("daa_checks_total", status="available", target='say "hi"')
+    registry.set("daa_next_check_delay_seconds", 420, target="a")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE daa_phase_duration_seconds histogram" in lines
+    assert 'daa_phase_duration_seconds_bucket{phase="navigate",target="a",le="0.1"} 0' in lines
+    assert 'daa_phase_duration_seconds_bucket{phase="navigate",target="a",le="0.25"} 1' in lines
+    assert 'daa_phase_duration_seconds_bucket{phase="navigate",target="a",le="+Inf"} 2' in lines
+    assert 'daa_phase_duration_seconds_sum{phase="navigate",target="a"} 3.2' in lines
+    assert 'daa_phase_duration_seconds_count{phase="navigate",target="a"} 2' in lines
+    assert 'daa_checks_total{status="available",target="say \\"hi\\""} 1' in lines
+    assert 'daa_next_check_delay_seconds{target="a"} 420' in lines
+
+
+def test_helpers_are_no_ops_when_disabled():
+    metrics.disable_metrics()
+    assert isinstance(timed("check", "a"), contextlib.nullcontext)
+    observe_check({"status": "error", "evidence": {"timings": {"wait_ms": 5}}}, "a")
+    assert metrics.get_registry() is None
+
+
+def test_endpoint_serves_check_phases():
+    async def main():
+        server = await serve_metrics({"host": "127.0.0.1", "port": 0})
+        port = server.sockets[0].getsockname()[1]
+        try:
+            with timed("persist", "a"):
+                pass
+            observe_check(
+                {"status": "unavailable", "evidence": {"timings": {"navigate_ms": 1200, "parse_ms": 3}}},
+                "a",
+            )
+            url = f"http://127.0.0.1:{port}/metrics"
+            body = await asyncio.to_thread(lambda: urllib.request.urlopen(url, timeout=5).read().decode())
+        finally:
+            server.close()
+            await server.wait_closed()
+            metrics.disable_metrics()
+        return body
+
+    body = asyncio.run(main())
+    assert 'daa_checks_total{status="unavailable",target="a"} 1' in body
+    assert 'daa_phase_duration_seconds_count{phase="navigate",target="a"} 1' in body
+    assert 'daa_phase_duration_seconds_count{phase="parse",target="a"} 1' in body
+    assert 'daa_phase_duration_seconds_count{phase="persist",target="a"} 1' in body
@@ -0,0 +1,160 @@
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+import pytest
+
+from src import scheduler
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.outbox import OutboxWorker, start_outbox, wake_outbox
+from src.store import close_stores, get_store, init_db
+from src.util import iso_now
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("ascii").strip().split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-stand-in")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                server.logins += 1
+                self.reply("235 authenticated")
+            elif verb == "MAIL" and server.reject_mail:
+                server.reject_mail -= 1
+                self.reply("451 try again later")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b""):
+                        break
+                    data += chunk
+                server.messages.append(message_from_bytes(data))
+                self.reply("250 queued")
+                if server.drop_after_message:
+                    return
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.logins = 0
+    server.messages = []
+    server.reject_mail = 0
+    server.drop_after_message = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def config(tmp_path, smtp_server, monkeypatch):
+    monkeypatch.setenv("SMTP_USER", "watcher")
+    monkeypatch.setenv("SMTP_PASS", "secret")
+    config = deep_merge(
+        DEFAULT_CONFIG,
+        {
+            "target": {"name": "a"},
+            "storage": {"sqlite_path": str(tmp_path / "state.db"), "state_prefix": "a:"},
+            "notify": {
+                "email": {"smtp_host": "127.0.0.1", "smtp_port": smtp_server.server_address[1], "use_tls": False},
+                "outbox": {"poll_seconds": 0.05},
+            },
+        },
+    )
+    init_db(config["storage"])
+    yield config
+    close_stores()
+
+
+def _check(config, status, slot_time):
+    result = {
+        "status": status,
+        "slots": [{"date": "2024-10-14", "time": slot_time}] if status == "available" else [],
+        "checked_at": iso_now(),
+        "evidence": {"url": config["target"]["url"]},
+    }
+    scheduler._record_result(config, config["storage"], result)
+
+
+def _outbox(config):
+    rows = get_store(config["storage"]).fetchall("SELECT status, attempts, last_error FROM outbox ORDER BY id")
+    return [tuple(row) for row in rows]
+
+
+def test_checks_only_queue_and_one_session_sends_them(config, smtp_server):
+    config = deep_merge(config, {"notify": {"on_change": True}})
+    _check(config, "available", "09:00")
+    _check(config, "available", "10:00")
+    _check(config, "available", "10:00")
+
+    assert smtp_server.connections == 0
+    assert _outbox(config) == [("pending", 0, None), ("pending", 0, None)]
+
+    worker = OutboxWorker(config)
+    assert worker.drain() == 2
+    worker.session.close()
+
+    assert (smtp_server.connections, smtp_server.logins) == (1, 1)
+    assert [message["Subject"] for message in smtp_server.messages] == ["[Terminland Watcher] Appointments AVAILABLE"] * 2
+    assert "2024-10-14 10:00" in smtp_server.messages[1].get_payload()
+    assert _outbox(config) == [("sent", 1, None), ("sent", 1, None)]
+
+
+def test_failed_send_backs_off_and_is_retried(config, smtp_server):
+    smtp_server.reject_mail = 1
+    _check(config, "available", "09:00")
+    worker = OutboxWorker(config)
+    now = time.time()
+
+    assert worker.drain(now) == 0
+    [(status, attempts, error)] = _outbox(config)
+    assert (status, attempts) == ("pending", 1) and "451" in error
+    # Not due again before backoff_base_seconds.
+    assert worker.drain(now + 10) == 0
+    assert worker.drain(now + 31) == 1
+    worker.session.close()
+    assert _outbox(config) == [("sent", 2, None)]
+
+
+def test_background_worker_reconnects_after_a_dropped_session(config, smtp_server):
+    smtp_server.drop_after_message = True
+    worker = start_outbox(config)
+    try:
+        for sent, slot_time in enumerate(("09:00", "10:00"), start=1):
+            _check(config, "unavailable", slot_time)
+            _check(config, "available", slot_time)
+            wake_outbox()
+            deadline = time.time() + 5
+            while worker.sent < sent and time.time() < deadline:
+                time.sleep(0.01)
+    finally:
+        worker.stop()
+
+    assert worker.sent == 2 and worker.failed == 0
+    assert smtp_server.connections == 2
+    assert _outbox(config) == [("sent", 1, None), ("sent", 1, None)]
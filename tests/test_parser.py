@@ -1,4 +1,4 @@
-from src.parser import parse_availability
+from src.parser import extract_slots, extract_slots_html, parse_availability, parse_availability_html, scan_text
 from src.util import hash_json, normalize_slots
 
 
@@ -28,3 +28,68 @@ def test_available_with_times():
     status, slots, evidence = parse_availability(body, "http://example.com", ["keine freien termine"])
     assert status == "available"
     assert evidence["slot_time_count"] == 2
+
+
+def test_dom_extractor_pairs_times_with_date_cells():
+    html = (
+        "<table><tr>"
+        "<td><div>Mo 14.10.2024</div><a>09:30</a><a>10:15</a></td>"
+        "<td><div>Di 15.10.2024</div><a>11:00</a></td>"
+        "</tr></table>"
+        "<script>var example = '16.10.2024 12:00';</script>"
+    )
+    slots, time_count, date_count, _ = extract_slots_html(html)
+    assert slots == [
+        {"date": "2024-10-14", "time": "09:30"},
+        {"date": "2024-10-14", "time": "10:15"},
+        {"date": "2024-10-15", "time": "11:00"},
+    ]
+    assert (time_count, date_count) == (3, 2)
+
+
+def test_dom_extractor_heading_and_row_layouts():
+    headings = "<h3>14.10.2024</h3><ul><li>9:30</li></ul><h3>16.10.2024</h3><ul><li>13:00</li></ul>"
+    rows = "<table><tr><td>14.10.2024</td><td>09:30</td></tr><tr><td>15.10.2024</td><td>10:00</td></tr></table>"
+    assert extract_slots_html(headings)[0] == [
+        {"date": "2024-10-14", "time": "09:30"},
+        {"date": "2024-10-16", "time": "13:00"},
+    ]
+    assert extract_slots_html(rows)[0] == [
+        {"date": "2024-10-14", "time": "09:30"},
+        {"date": "2024-10-15", "time": "10:00"},
+    ]
+
+
+def test_multi_day_availability_yields_slots_with_html():
+    body = "14.10.2024 09:30 15.10.2024 10:00"
+    html = "<div><p>14.10.2024</p><b>09:30</b></div><div><p>15.10.2024</p><b>10:00</b></div>"
+    status, slots, evidence = parse_availability(body, "http://example.com", [])
+    assert status == "available" and slots == []
+
+    status, slots, evidence = parse_availability(body, "http://example.com", [], html=html)
+    assert status == "available"
+    assert len(slots) == 2
+    assert evidence["slot_source"] == "dom"
+
+
+def test_parse_availability_html_for_saved_dumps():
+    html = "<html><body><p>Leider keine freien Termine</p></body></html>"
+    status, slots, evidence = parse_availability_html(html, "dump.html", ["keine freien termine"])
+    assert status == "unavailable"
+    assert slots == []
+
+
+def test_scan_text_single_pass_verdicts_and_tokens():
+    text = "Robot check. KEINE FREIEN TERMINE am 14.10.2024 um 9:30, nicht x10:15 oder 24:00."
+    matches = scan_text(text, ["keine freien termine"])
+    assert matches.blocked and matches.unavailable
+    assert matches.dates == {"2024-10-14"}
+    assert matches.times == {"09:30"}
+    assert matches.positions["blocked"] == [0]
+    assert matches.positions["date"] == [text.index("14.10.2024")]
+
+
+def test_time_directly_followed_by_date_counts_both():
+    slots, time_count, date_count = extract_slots("Beginn 9:14.10.2024")
+    assert (time_count, date_count) == (1, 1)
+    assert slots == [{"date": "2024-10-14", "time": "09:14"}]
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from bench_parser import (
+    FIXTURE_DIR,
+    HUGE_WEEKS,
+    UNAVAILABLE,
+    compare,
+    huge_page,
+    load_baseline,
+    load_corpus,
+    measure,
+)
+from src.parser import detect_blocked, html_to_text, parse_availability, parse_availability_html
+
+with open(os.path.join(FIXTURE_DIR, "expected.json"), "r", encoding="utf-8") as handle:
+    EXPECTED = json.load(handle)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_fixture_verdicts(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as handle:
+        html = handle.read()
+    expected = EXPECTED[name]
+
+    status, slots, _ = parse_availability_html(html, name, UNAVAILABLE)
+    assert status == expected["status"]
+    if "slots" in expected:
+        assert slots == expected["slots"]
+
+    # The live path classifies blocks before parsing; mirror it on page text.
+    text = html_to_text(html)
+    if detect_blocked(text):
+        assert expected["status"] == "blocked"
+        return
+    status, slots, _ = parse_availability(text, name, UNAVAILABLE, html=html)
+    assert status == expected["status"]
+    assert slots == expected["slots"]
+
+
+def test_huge_page_pairs_every_slot():
+    html = huge_page()
+    status, slots, evidence = parse_availability_html(html, "huge", UNAVAILABLE)
+    assert status == "available"
+    assert len(slots) == HUGE_WEEKS * 5 * 2
+    assert evidence["date_count"] == HUGE_WEEKS * 5
+
+
+# Allocation peaks are stable for a given interpreter, so they are always
+# gated; throughput depends on the machine and only runs with PARSER_BENCH=1.
+def test_parser_benchmark_against_baseline():
+    baseline = load_baseline()
+    if not baseline:
+        pytest.skip("no parser baseline stored")
+    check_throughput = os.getenv("PARSER_BENCH") == "1"
+    results = measure(load_corpus(), min_seconds=0.5 if check_throughput else 0)
+    assert compare(results, baseline, check_throughput=check_throughput) == []
@@ -0,0 +1,37 @@
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.rate_limit import RateLimiter
+from src.store import close_stores, init_db, insert_check
+from src.util import iso_now
+
+
+def test_reserve_books_slots_until_the_window_is_full():
+    limiter = RateLimiter(2, window_seconds=3600)
+    assert limiter.reserve(now=1000) == 0
+    assert limiter.reserve(now=1100) == 0
+    assert limiter.reserve(now=1200) == 3400
+    assert limiter.wait_seconds(now=4600) == 0
+    assert limiter.reserve(now=4600) == 0
+    assert limiter.reserve(now=4650) == 50
+
+
+def test_disabled_limiter_never_waits():
+    limiter = RateLimiter(0)
+    assert all(limiter.reserve(now=1000) == 0 for _ in range(100))
+
+
+def test_from_store_seeds_recent_checks(tmp_path):
+    config = deep_merge(
+        DEFAULT_CONFIG,
+        {"storage": {"sqlite_path": str(tmp_path / "state.db")}, "limits": {"max_checks_per_hour": 2}},
+    )
+    storage = config["storage"]
+    init_db(storage)
+    insert_check(storage, "2020-01-01T00:00:00+00:00", "unavailable", "[]", "h", "{}", None)
+    limiter = RateLimiter.from_store(config, storage)
+    assert limiter.reserve() == 0
+
+    insert_check(storage, iso_now(), "unavailable", "[]", "h", "{}", None)
+    insert_check(storage, iso_now(), "unavailable", "[]", "h", "{}", None)
+    limiter = RateLimiter.from_store(config, storage)
+    assert 3500 < limiter.reserve() <= 3600
+    close_stores()
@@ -0,0 +1,171 @@
+import json
+import shutil
+import subprocess
+import time
+
+import pytest
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from src.checker_playwright import _wait_until_ready, check_with_playwright
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.readiness import READY_JS, idle_timeout, readiness_arg, readiness_wait
+
+NODE = shutil.which("node")
+
+
+def _config(readiness=None, **limits):
+    overrides = {"target": {"url": "https://www.terminland.de/DAA/"}, "limits": limits}
+    if readiness is not None:
+        overrides["matchers"] = {"readiness": readiness}
+    return deep_merge(DEFAULT_CONFIG, overrides)
+
+
+# Runs READY_JS under node against a stub document: `selectors` are the CSS
+# selectors that match, `body` is document.body.innerText.
+def _ready(arg, body="", selectors=()):
+    script = (
+        f"const selectors = {json.dumps(list(selectors))};\n"
+        f"globalThis.document = {{querySelector: (s) => selectors.includes(s) ? {{}} : null, "
+        f"body: {{innerText: {json.dumps(body)}}}}};\n"
+        f"console.log(JSON.stringify(({READY_JS})({json.dumps(arg)})));\n"
+    )
+    output = subprocess.run([NODE, "-e", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def test_readiness_arg_follows_predicate_flags():
+    arg = readiness_arg(_config({"selector": "#calendar"}))
+    assert arg["selector"] == "#calendar"
+    assert "keine freien termine" in arg["texts"]
+    assert arg["slotPattern"]
+
+    arg = readiness_arg(_config({"unavailable_text": False, "slot_pattern": False, "selector": "#c"}))
+    assert arg["texts"] == [] and arg["slotPattern"] is None
+
+    assert readiness_arg(_config({"unavailable_text": False, "slot_pattern": False})) is None
+    assert readiness_arg(_config({"enabled": False, "selector": "#c"})) is None
+
+
+@pytest.mark.skipif(NODE is None, reason="node is not installed")
+def test_each_predicate_decides_the_page():
+    arg = readiness_arg(_config({"selector": "#calendar"}))
+
+    assert _ready(arg, "", ["#calendar"]) == "selector"
+    assert _ready(arg, "Leider keine freien Termine verfügbar") == "unavailable_text"
+    assert _ready(arg, "Mo 14.10.2024  09:30  10:00") == "slot_pattern"
+    assert _ready(arg, "Bitte warten, Kalender wird geladen") is False
+    assert _ready(arg, "") is False
+
+    without_slots = readiness_arg(_config({"slot_pattern": False}))
+    assert _ready(without_slots, "Mo 14.10.2024  09:30") is False
+
+
+class FakeHandle:
+    def __init__(self, value):
+        self.value = value
+
+    def json_value(self):
+        return self.value
+
+
+class FakePage:
+    def __init__(self, reason=None, delay=0.0, idle=True):
+        self.reason = reason
+        self.delay = delay
+        self.idle = idle
+        self.calls = []
+
+    def wait_for_function(self, script, arg, timeout, polling):
+        self.calls.append(("function", timeout, polling))
+        time.sleep(self.delay)
+        if self.reason is None:
+            raise PlaywrightTimeoutError("timeout")
+        return FakeHandle(self.reason)
+
+    def wait_for_load_state(self, state, timeout):
+        self.calls.append((state, timeout))
+        if not self.idle:
+            raise PlaywrightTimeoutError("timeout")
+
+
+def test_matching_predicate_skips_networkidle():
+    page = FakePage("unavailable_text")
+    evidence = {}
+    _wait_until_ready(page, _config({"poll_ms": 100}, selector_timeout_ms=8000), evidence)
+    assert evidence == {"readiness": {"reason": "unavailable_text"}}
+    assert page.calls == [("function", 8000, 100)]
+
+
+def test_falls_back_to_networkidle_when_nothing_matches():
+    page = FakePage(None, idle=False)
+    evidence = {}
+    config = _config({}, selector_timeout_ms=8000, network_idle_fallback_ms=1500)
+    _wait_until_ready(page, config, evidence)
+    assert evidence == {"readiness": {"reason": "timeout"}, "network_idle_timeout": True}
+    assert page.calls[-1] == ("networkidle", 1500)
+
+
+def test_networkidle_only_without_predicates():
+    config = _config({"enabled": False}, selector_timeout_ms=8000)
+    assert readiness_wait(config) is None
+    assert idle_timeout(config, False) == 8000
+    page = FakePage("selector")
+    evidence = {}
+    _wait_until_ready(page, config, evidence)
+    assert evidence == {}
+    assert page.calls == [("networkidle", 8000)]
+
+
+class FakeResponse:
+    status = 200
+
+
+class FakeCheckPage(FakePage):
+    url = "https://www.terminland.de/DAA/"
+
+    def goto(self, url, wait_until, timeout):
+        return FakeResponse()
+
+    def inner_text(self, selector):
+        time.sleep(0.02)
+        return "Leider keine freien Termine"
+
+    def content(self):
+        return "<html><body>Leider keine freien Termine</body></html>"
+
+
+class FakeContext:
+    def __init__(self, page):
+        self.page = page
+
+    def route(self, pattern, handler):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    def new_page(self):
+        return self.page
+
+
+class FakeSession:
+    def __init__(self, page):
+        self.page = page
+
+    def new_context(self):
+        return FakeContext(self.page), {"launch_ms": 0, "reused": True}
+
+    def release(self, context):
+        pass
+
+
+def test_check_records_time_to_readiness_and_decision():
+    page = FakeCheckPage("unavailable_text", delay=0.05)
+    result = check_with_playwright(_config({}), FakeSession(page))
+
+    timings = result["evidence"]["timings"]
+    assert result["status"] == "unavailable"
+    assert result["evidence"]["readiness"] == {"reason": "unavailable_text"}
+    assert timings["ready_ms"] >= 50
+    assert timings["decision_ms"] >= timings["ready_ms"] + 20
+    assert timings["check_ms"] >= timings["decision_ms"]
@@ -0,0 +1,44 @@
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.resource_policy import RequestStats, ResourcePolicy
+
+
+def _policy(**policy_cfg):
+    config = deep_merge(DEFAULT_CONFIG, {"runtime": {"resource_policy": policy_cfg}})
+    return ResourcePolicy.from_config(config)
+
+
+def test_default_policy_blocks_types_and_analytics_hosts():
+    policy = _policy()
+    assert policy.block_reason("image", "https://www.terminland.de/logo.png") == "type"
+    assert policy.block_reason("script", "https://www.googletagmanager.com/gtm.js") == "host"
+    assert policy.block_reason("script", "https://www.terminland.de/app.js") is None
+    assert policy.block_reason("document", "https://www.google-analytics.com/") is None
+
+
+def test_allow_hosts_and_third_party_blocking():
+    policy = _policy(block_third_party=True, allow_hosts=["cdn.example.net"])
+    assert policy.block_reason("script", "https://static.terminland.de/a.js") is None
+    assert policy.block_reason("script", "https://other.example.org/a.js") == "third_party"
+    assert policy.block_reason("script", "https://cdn.example.net/a.js") is None
+
+
+def test_allow_types_is_an_allow_list():
+    policy = _policy(allow_types=["document", "script", "xhr", "fetch"])
+    assert policy.block_reason("stylesheet", "https://www.terminland.de/a.css") == "type"
+    assert policy.block_reason("xhr", "https://www.terminland.de/api") is None
+
+
+def test_request_stats_evidence():
+    stats = RequestStats(_policy())
+    stats.on_request("document", "https://www.terminland.de/")
+    stats.on_request("image", "https://www.terminland.de/a.png")
+    stats.on_response({"content-length": "1200"})
+    stats.on_response({"transfer-encoding": "chunked"})
+    assert stats.as_evidence() == {
+        "requests": 2,
+        "blocked": 1,
+        "blocked_by": {"type": 1},
+        "responses": 2,
+        "bytes": 1200,
+        "unknown_size": 1,
+    }
@@ -0,0 +1,19 @@
+from src.scheduler import _result_hash
+
+
+def _result(crawl):
+    return {
+        "status": "available",
+        "slots": [{"date": "2024-10-21", "time": "10:00"}],
+        "checked_at": "2024-10-14T09:00:00+00:00",
+        "evidence": {"url": "https://www.terminland.de/DAA/", "crawl": crawl, "timings": {"crawl_pages": []}},
+    }
+
+
+def test_crawl_failures_do_not_change_the_result_hash():
+    clean = _result({"pages": 3, "failed": 0})
+    one_tab_timed_out = _result({"pages": 2, "failed": 1})
+    assert _result_hash(clean) == _result_hash(one_tab_timed_out)
+
+    fewer_slots = {**clean, "slots": []}
+    assert _result_hash(fewer_slots) != _result_hash(clean)
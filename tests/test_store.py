@@ -0,0 +1,190 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from src.store import (
+    MIGRATIONS,
+    SQLITE_SCHEMA,
+    Store,
+    close_stores,
+    get_state,
+    get_store,
+    init_db,
+    insert_check,
+    load_state,
+    record_check,
+    set_state,
+    to_epoch,
+)
+
+
+def test_store_reuses_one_connection(tmp_path):
+    storage = {"sqlite_path": str(tmp_path / "state.db"), "postgres_url_env": "UNSET_TEST_DATABASE_URL"}
+    init_db(storage)
+    for index in range(5):
+        insert_check(storage, f"2024-10-14T09:0{index}:00+00:00", "unavailable", "[]", "h", "{}", None)
+        set_state(storage, "last_status", "unavailable")
+    assert get_state(storage, "last_status") == "unavailable"
+
+    store = get_store(storage)
+    assert store.connections_opened == 1
+    assert store.count_checks_since(to_epoch("2024-10-14T09:02:00+00:00")) == 3
+    assert store.fetchone("PRAGMA journal_mode")[0] == "wal"
+    close_stores()
+
+
+def test_state_prefix_shares_the_store(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = {"sqlite_path": path, "state_prefix": "a:"}
+    second = {"sqlite_path": path, "state_prefix": "b:"}
+    init_db(first)
+    set_state(first, "last_status", "available")
+    set_state(second, "last_status", "blocked")
+    assert get_store(first) is get_store(second)
+    assert get_state(first, "last_status") == "available"
+    assert get_state(second, "last_status") == "blocked"
+    close_stores()
+
+
+def test_store_is_usable_from_worker_threads(tmp_path):
+    store = Store({"sqlite_path": str(tmp_path / "state.db")})
+    store.init_db()
+
+    def write(index):
+        store.set_state(f"key{index}", str(index))
+
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [store.get_state(f"key{index}") for index in range(8)] == [str(index) for index in range(8)]
+    store.close()
+
+
+def test_record_check_writes_row_and_state_in_one_transaction(tmp_path, monkeypatch):
+    storage = {"sqlite_path": str(tmp_path / "state.db"), "state_prefix": "a:"}
+    init_db(storage)
+    state = {"last_status": "blocked", "consecutive_failures": "1"}
+    record_check(storage, "2024-10-14T09:00:00+00:00", "blocked", "[]", "h", "{}", None, state)
+    assert load_state(storage, ["last_status", "consecutive_failures", "missing"]) == {
+        "last_status": "blocked",
+        "consecutive_failures": "1",
+    }
+
+    monkeypatch.setattr("src.store._upsert_state_sql", lambda count: "INSERT INTO missing_table VALUES (?, ?)")
+    with pytest.raises(sqlite3.OperationalError):
+        state = {"last_status": "available"}
+        record_check(storage, "2024-10-14T09:05:00+00:00", "available", "[]", "h", "{}", None, state)
+    store = get_store(storage)
+    assert store.count_checks_since(0) == 1
+    assert load_state(storage, ["last_status"]) == {"last_status": "blocked"}
+    close_stores()
+
+
+def test_migrations_upgrade_legacy_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.executescript(SQLITE_SCHEMA)
+    legacy.executemany(
+        "INSERT INTO checks (checked_at, status, evidence_json) VALUES (?, ?, ?)",
+        [
+            # 09:30+02:00 is 07:30 UTC, earlier than 08:00+00:00 despite sorting later as text.
+            ("2024-10-14T08:00:00+00:00", "unavailable", '{"target": "a"}'),
+            ("2024-10-14T09:30:00+02:00", "available", '{"target": "b"}'),
+            ("not a date", "error", "{}"),
+        ],
+    )
+    legacy.commit()
+    legacy.close()
+
+    store = Store({"sqlite_path": path})
+    store.init_db()
+    assert store.schema_version() == MIGRATIONS[-1][0]
+    rows = store.fetchall("SELECT target, checked_at_epoch FROM checks ORDER BY id")
+    assert [tuple(row) for row in rows] == [
+        ("a", to_epoch("2024-10-14T08:00:00+00:00")),
+        ("b", to_epoch("2024-10-14T07:30:00+00:00")),
+        (None, None),
+    ]
+    assert store.oldest_check_since(0) == to_epoch("2024-10-14T07:30:00+00:00")
+    plan = store.fetchall("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM checks WHERE checked_at_epoch >= 0")
+    assert "checks_epoch_idx" in " ".join(row[3] for row in plan)
+    store.close()
+
+    # Re-running is a no-op.
+    store = Store({"sqlite_path": path})
+    store.init_db()
+    assert store.fetchone("SELECT COUNT(*) FROM schema_migrations")[0] == len(MIGRATIONS)
+    store.close()
+
+
+def test_compact_collapses_runs_and_continues_spans(tmp_path):
+    storage = {"sqlite_path": str(tmp_path / "state.db")}
+    store = get_store(storage)
+    store.init_db()
+    hour = 3600
+    statuses = ["unavailable"] * 5 + ["available"] * 2 + ["unavailable"] * 3
+    for index, status in enumerate(statuses):
+        checked_at = datetime.fromtimestamp(index * hour, timezone.utc).isoformat()
+        insert_check(storage, checked_at, status, "[]", status, "{}", None, target="a")
+    insert_check(storage, datetime.fromtimestamp(0, timezone.utc).isoformat(), "blocked", "[]", "x", "{}", None)
+
+    stats = store.compact(raw_before=8 * hour)
+    assert stats == {"checks_compacted": 9, "spans_written": 4, "spans_deleted": 0, "slots_deleted": 0}
+    assert store.fetchone("SELECT COUNT(*) FROM checks")[0] == 2
+    spans = store.fetchall(
+        "SELECT target, status, first_seen_epoch, last_seen_epoch, check_count FROM check_spans ORDER BY id"
+    )
+    assert [tuple(span) for span in spans] == [
+        (None, "blocked", 0, 0, 1),
+        ("a", "unavailable", 0, 4 * hour, 5),
+        ("a", "available", 5 * hour, 6 * hour, 2),
+        ("a", "unavailable", 7 * hour, 7 * hour, 1),
+    ]
+
+    # The next run continues the open span instead of starting a new one.
+    stats = store.compact(raw_before=10 * hour, spans_before=5 * hour)
+    assert stats == {"checks_compacted": 2, "spans_written": 0, "spans_deleted": 2, "slots_deleted": 0}
+    spans = store.fetchall("SELECT status, last_seen_epoch, check_count FROM check_spans ORDER BY id")
+    assert [tuple(span) for span in spans] == [("available", 6 * hour, 2), ("unavailable", 9 * hour, 3)]
+    close_stores()
+
+
+def _record(storage, hour, status, slots):
+    checked_at = datetime.fromtimestamp(hour * 3600, timezone.utc).isoformat()
+    slots_json = json.dumps([{"date": "2024-10-14", "time": time} for time in slots])
+    record_check(storage, checked_at, status, slots_json, status, "{}", None, {}, target="a")
+
+
+def test_slots_track_appearance_lifetime_and_churn(tmp_path):
+    storage = {"sqlite_path": str(tmp_path / "state.db")}
+    init_db(storage)
+    _record(storage, 0, "available", ["09:30", "10:15"])
+    _record(storage, 1, "available", ["09:30"])
+    _record(storage, 2, "blocked", [])
+    _record(storage, 3, "available", ["09:30", "10:15"])
+    _record(storage, 4, "unavailable", [])
+
+    lifetimes = {slot["time"]: slot for slot in get_store(storage).slot_lifetimes("a")}
+    assert lifetimes["09:30"]["seen_seconds"] == 3 * 3600
+    assert lifetimes["09:30"]["appearances"] == 1
+    assert lifetimes["10:15"]["appearances"] == 2
+    assert not any(slot["open"] for slot in lifetimes.values())
+
+    # A legacy database gets the same table from its history.
+    backfilled = Store({"sqlite_path": str(tmp_path / "copy.db")})
+    backfilled.init_db()
+    backfilled.execute("DELETE FROM schema_migrations WHERE version = 4")
+    backfilled.execute("DROP TABLE slots")
+    rows = get_store(storage).fetchall("SELECT checked_at, status, slots_json FROM checks")
+    for checked_at, status, slots_json in rows:
+        backfilled.insert_check(checked_at, status, slots_json, status, "{}", None, target="a")
+    backfilled._schema_ready = False
+    backfilled.init_db()
+    assert backfilled.slot_lifetimes("a") == get_store(storage).slot_lifetimes("a")
+    backfilled.close()
+    close_stores()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+from src import store_async
+from src.store import close_stores, get_store
+
+
+def _slots(*times):
+    return json.dumps([{"date": "2024-10-20", "time": time} for time in times])
+
+
+def test_concurrent_writes_are_group_committed(tmp_path):
+    storage = {"sqlite_path": str(tmp_path / "state.db")}
+
+    async def main():
+        await store_async.init_db(storage)
+        store = store_async.get_async_store(storage)
+        await asyncio.gather(
+            *(
+                store_async.record_check(
+                    {**storage, "state_prefix": f"t{index}:"},
+                    f"2024-10-14T09:{index:02d}:00+00:00",
+                    "available",
+                    _slots("09:30"),
+                    "h",
+                    "{}",
+                    None,
+                    {"last_status": "available"},
+                    target=f"t{index % 5}",
+                )
+                for index in range(50)
+            )
+        )
+        commits = store.commits
+        state = await store_async.load_state({**storage, "state_prefix": "t7:"}, ["last_status"])
+        await store_async.close_async_stores()
+        return commits, state
+
+    commits, state = asyncio.run(main())
+    assert commits < 10
+    assert state == {"last_status": "available"}
+    sync_store = get_store(storage)
+    assert sync_store.count_checks_since(0) == 50
+    assert len(sync_store.slot_lifetimes("t3")) == 1
+    close_stores()
+
+
+def test_failed_write_does_not_fail_its_batch(tmp_path):
+    storage = {"sqlite_path": str(tmp_path / "state.db")}
+
+    async def main():
+        await store_async.init_db(storage)
+        store = store_async.get_async_store(storage)
+        writes = [store_async.set_state(storage, f"key{index}", str(index)) for index in range(5)]
+        broken = store._write(store._execute_work("INSERT INTO missing_table VALUES (?)", (1,)))
+        results = await asyncio.gather(*writes, broken, return_exceptions=True)
+        values = await store_async.load_state(storage, [f"key{index}" for index in range(5)])
+        await store_async.close_async_stores()
+        return results, values
+
+    results, values = asyncio.run(main())
+    assert results[:5] == [None] * 5
+    assert isinstance(results[5], Exception)
+    assert values == {f"key{index}": str(index) for index in range(5)}
+    close_stores()
+
+
+def test_close_flushes_queued_writes(tmp_path):
+    storage = {"sqlite_path": str(tmp_path / "state.db")}
+
+    async def main():
+        await store_async.init_db(storage)
+        task = asyncio.create_task(store_async.set_state(storage, "last_status", "blocked"))
+        await asyncio.sleep(0)
+        await store_async.close_async_stores()
+        await task
+
+    asyncio.run(main())
+    assert get_store(storage).get_state("last_status") == "blocked"
+    with pytest.raises(KeyError):
+        store_async._async_stores[(None, storage["sqlite_path"])]
+    close_stores()
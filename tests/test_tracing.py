@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pstats
+import time
+
+from src import scheduler
+from src.checker_playwright import PageCheck
+from src.config import DEFAULT_CONFIG, deep_merge
+from src.store import close_stores, init_db
+from src.tracing import Trace, record_span, span, start_trace, tracing_settings
+from src.util import iso_now
+
+
+def _config(tmp_path, **tracing):
+    return deep_merge(
+        DEFAULT_CONFIG,
+        {
+            "target": {"name": "a"},
+            "storage": {"sqlite_path": str(tmp_path / "state.db"), "state_prefix": "a:"},
+            "runtime": {"tracing": {"enabled": True, "dir": str(tmp_path / "traces"), **tracing}},
+        },
+    )
+
+
+def test_spans_follow_the_check_into_threads_and_files(tmp_path):
+    settings = tracing_settings(_config(tmp_path))
+
+    def parse():
+        started = time.perf_counter()
+        record_span("parse", started, slots=2)
+
+    async def main():
+        with Trace(settings, "a") as trace:
+            with span("navigate"):
+                await asyncio.sleep(0.01)
+            await asyncio.to_thread(parse)
+        record_span("after", time.perf_counter())
+        return trace
+
+    trace = asyncio.run(main())
+    with open(trace.write(), encoding="utf-8") as handle:
+        records = [json.loads(line) for line in handle]
+
+    assert [record["name"] for record in records] == ["check", "navigate", "parse"]
+    assert records[0]["parent"] is None and records[1]["parent"] == "check"
+    assert records[1]["duration_ms"] >= 10
+    assert records[2]["attrs"] == {"slots": 2}
+
+    trace.settings = {**settings, "format": "chrome"}
+    with open(trace.write(), encoding="utf-8") as handle:
+        events = json.load(handle)["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["check", "navigate", "parse"]
+
+
+def test_page_phases_nest_under_the_browser_span(tmp_path):
+    config = _config(tmp_path)
+
+    with Trace(tracing_settings(config), "a") as trace:
+        check = PageCheck(config)
+        check.begin()
+        check.browser_ready({"launch_ms": 0, "reused": True})
+        check.navigating()
+        check.navigated(None)
+        check.ready()
+        check.extracted("Leider keine freien Termine", None)
+        check.finish()
+
+    parents = {record["name"]: record["parent"] for record in trace.records()}
+    assert parents == {
+        "check": None,
+        "browser": "check",
+        "context": "browser",
+        "navigate": "browser",
+        "wait": "browser",
+        "extract": "browser",
+        "parse": "check",
+    }
+    names = [record["name"] for record in trace.records()]
+    assert names.index("browser") < names.index("context")
+
+
+def test_sampling_threshold_and_profile(tmp_path):
+    assert start_trace(_config(tmp_path, sample_rate=0), "a").__enter__() is None
+
+    fast = start_trace(_config(tmp_path, min_duration_ms=60000), "a")
+    with fast:
+        pass
+    assert fast.write() is None
+
+    profiled = start_trace(_config(tmp_path, profile_sample_rate=1), "a")
+    with profiled:
+        sum(range(1000))
+    path = profiled.write()
+    stats = pstats.Stats(path.replace(".ndjson", ".prof"))
+    assert stats.total_calls > 0
+
+
+def test_scheduler_traces_the_bookkeeping(tmp_path, monkeypatch):
+    config = _config(tmp_path)
+    init_db(config["storage"])
+
+    async def fake_check(config, session, precheck, endpoints):
+        return {"status": "unavailable", "slots": [], "checked_at": iso_now(), "evidence": {}}
+
+    monkeypatch.setattr(scheduler, "run_once_async", fake_check)
+
+    async def main():
+        with start_trace(config, "a") as trace:
+            await scheduler._check_and_record(config, "a", None, None, None, asyncio.Semaphore(1))
+        await scheduler.store_async.close_async_stores()
+        return trace
+
+    trace = asyncio.run(main())
+    close_stores()
+    records = trace.records()
+    assert [record["name"] for record in records] == ["check", "queued", "load_state", "notify", "persist"]
+    assert records[3]["attrs"] == {"queued": 0}
+    assert trace.records()[0]["attrs"]["status"] == "unavailable"